@@ -0,0 +1,50 @@
+"""Benchmark rendering HTML tables with the Jinja and native table engines
+
+Run: python ci/bench_tables.py [--rows 1000 10000 100000]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from redmail import EmailSender
+from redmail.email.body import HTMLBody
+
+def create_frame(n_rows):
+    return pd.DataFrame(
+        {
+            "group": np.repeat(np.arange(n_rows // 100 + 1), 100)[:n_rows],
+            "item": np.arange(n_rows),
+            "value": np.random.rand(n_rows),
+            "label": np.random.choice(["a", "b", "c"], n_rows),
+        }
+    ).set_index(["group", "item"])
+
+def time_render(df, engine, theme):
+    email = EmailSender(host="localhost", port=0)
+    body = HTMLBody(
+        jinja_env=email.templates_html,
+        table_template=email.get_html_table_template(theme),
+        table_engine=engine,
+    )
+    start = time.perf_counter()
+    html = body.render_table(df)
+    return time.perf_counter() - start, html
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--theme", default="modest.html")
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'jinja (s)':>10} {'native (s)':>11} {'speedup':>8}")
+    for n_rows in args.rows:
+        df = create_frame(n_rows)
+        jinja_time, jinja_html = time_render(df, "jinja", args.theme)
+        native_time, native_html = time_render(df, "native", args.theme)
+        assert jinja_html == native_html, "Outputs differ"
+        print(f"{n_rows:>8} {jinja_time:>10.3f} {native_time:>11.3f} {jinja_time / native_time:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from .email import EmailSender, send_email, gmail, outlook
+from .email import EmailSender, AsyncEmailSender, send_email, gmail, outlook
 from .log import EmailHandler, MultiEmailHandler
 
 try:
@@ -1,4 +1,5 @@
 from .sender import EmailSender
+from .async_sender import AsyncEmailSender
 
 gmail = EmailSender(
     host="smtp.gmail.com",
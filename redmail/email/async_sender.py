@@ -0,0 +1,517 @@
+import time
+from collections import deque
+from email.message import EmailMessage
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Union
+import os
+
+from redmail.email.sender import EmailSender
+from redmail.email.pool import PooledConnection
+from redmail.email.result import SendResult
+from redmail.email.utils import aiosmtplib, asyncio, get_recipients
+
+if TYPE_CHECKING:
+    # These are never imported but just for linters
+    import pandas as pd
+    from PIL.Image import Image
+    import matplotlib.pyplot as plt
+
+class AsyncConnectionPool:
+    """Pool of asynchronous SMTP connections
+
+    Parameters
+    ----------
+    connect : callable
+        Coroutine function that opens a new connection
+        to the SMTP server (and logs in). Typically
+        :meth:`AsyncEmailSender.get_server`.
+    max_size : int
+        Maximum number of connections open at the
+        same time.
+    idle_timeout : float, optional
+        Seconds a connection may stay unused in the pool
+        before it is closed.
+    max_messages : int, optional
+        Maximum number of messages sent over one connection
+        before it is closed and replaced.
+    health_check : float, optional
+        Seconds a connection may stay unused before it is
+        probed with ``NOOP`` when acquired. If None, the
+        connections are not probed.
+    """
+
+    def __init__(self,
+                 connect:Callable[[], Awaitable[Any]],
+                 max_size:int=10,
+                 idle_timeout:Optional[float]=60,
+                 max_messages:Optional[int]=None,
+                 health_check:Optional[float]=5):
+        if max_size < 1:
+            raise ValueError("Pool must allow at least one connection")
+        self.connect = connect
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.max_messages = max_messages
+        self.health_check = health_check
+
+        self._idle: Deque[PooledConnection] = deque()
+        self._slots = None
+        self._n_open = 0
+        self._is_closed = False
+
+    @property
+    def size(self) -> int:
+        "int: Number of open connections (idle and in use)"
+        return self._n_open
+
+    @property
+    def n_idle(self) -> int:
+        "int: Number of idle connections in the pool"
+        return len(self._idle)
+
+    def _get_slots(self) -> 'asyncio.Semaphore':
+        # Created lazily so that the semaphore is bound to the running loop
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_size)
+        return self._slots
+
+    async def acquire(self) -> PooledConnection:
+        "Get a connection from the pool (waits if all are in use)"
+        if self._is_closed:
+            raise RuntimeError("Connection pool is closed")
+        slots = self._get_slots()
+        await slots.acquire()
+        try:
+            while self._idle:
+                conn = self._idle.pop()
+                if self._is_expired(conn) or not await self._is_healthy(conn):
+                    self._discard(conn)
+                    continue
+                return conn
+            conn = PooledConnection(await self.connect())
+            self._n_open += 1
+            return conn
+        except BaseException:
+            slots.release()
+            raise
+
+    async def release(self, conn:PooledConnection, discard:bool=False):
+        """Return a connection to the pool
+
+        Broken connections (``discard=True``) are closed
+        without waiting for the server."""
+        conn.last_used = time.monotonic()
+        is_exhausted = self.max_messages is not None and conn.n_messages >= self.max_messages
+        try:
+            if discard:
+                self._discard(conn)
+            elif is_exhausted or self._is_closed:
+                self._n_open -= 1
+                await _quit(conn.server)
+            else:
+                self._idle.append(conn)
+        finally:
+            self._get_slots().release()
+
+    def connection(self) -> '_PooledContext':
+        """Acquire a connection for the duration of the context
+
+        .. code-block:: python
+
+            async with pool.connection() as server:
+                await server.send_message(msg)
+
+        The connection is discarded if the context
+        raised an error or was cancelled."""
+        return _PooledContext(self)
+
+    async def close(self):
+        "Close the idle connections and the pool"
+        self._is_closed = True
+        while self._idle:
+            conn = self._idle.pop()
+            self._n_open -= 1
+            await _quit(conn.server)
+
+    def _discard(self, conn:PooledConnection):
+        self._n_open -= 1
+        conn.server.close()
+
+    def _is_expired(self, conn:PooledConnection) -> bool:
+        return self.idle_timeout is not None and conn.idle_time > self.idle_timeout
+
+    async def _is_healthy(self, conn:PooledConnection) -> bool:
+        if self.health_check is None or conn.idle_time < self.health_check:
+            return True
+        try:
+            resp = await conn.server.noop()
+        except (aiosmtplib.SMTPException, OSError):
+            return False
+        return resp.code == 250
+
+
+class _PooledContext:
+
+    def __init__(self, pool:AsyncConnectionPool):
+        self.pool = pool
+        self.conn = None
+
+    async def __aenter__(self):
+        self.conn = await self.pool.acquire()
+        return self.conn.server
+
+    async def __aexit__(self, exc_type, exc, tb):
+        conn = self.conn
+        if exc_type is None or _is_reusable(conn.server, exc):
+            conn.n_messages += 1
+            await self.pool.release(conn)
+        else:
+            await self.pool.release(conn, discard=True)
+
+
+def _is_reusable(server:'aiosmtplib.SMTP', exc:BaseException) -> bool:
+    "Check whether the connection can be used after the error"
+    # aiosmtplib resets the transaction after a refusal thus the
+    # connection is still usable unless the server closed it (421).
+    # Other errors and cancellations may leave the transaction
+    # half-finished.
+    return (
+        isinstance(exc, (aiosmtplib.SMTPRecipientsRefused, aiosmtplib.SMTPSenderRefused))
+        and not _is_closed(server, exc)
+    )
+
+
+def _is_closed(server:'aiosmtplib.SMTP', exc:'aiosmtplib.SMTPException') -> bool:
+    "Check whether the refusal closed the connection"
+    if not getattr(server, "is_connected", True):
+        return True
+    if isinstance(exc, aiosmtplib.SMTPRecipientsRefused):
+        return any(err.code == 421 for err in exc.recipients)
+    return exc.code == 421
+
+
+class AsyncEmailSender(EmailSender):
+    """Red Mail Email Sender for asyncio
+
+    The messages are created the same way as
+    in :class:`.EmailSender` but they are sent
+    using `aiosmtplib <https://aiosmtplib.readthedocs.io>`_.
+    Retrying, batches (``max_recipients``), relays,
+    the outbox, message templates, building in a
+    process pool and parallel sending are not
+    supported.
+
+    Parameters
+    ----------
+    host : str
+        SMTP host address.
+    port : int
+        Port to the SMTP server.
+    username : str, optional
+        User name to authenticate on the server.
+    password : str, optional
+        User password to authenticate on the server.
+    cls_smtp : aiosmtplib.SMTP, optional
+        SMTP class to use for connection. Defaults
+        to ``aiosmtplib.SMTP``.
+    use_starttls : bool
+        Whether to use `STARTTLS <https://en.wikipedia.org/wiki/Opportunistic_TLS>`_
+        when connecting to the SMTP server.
+    domain : str, optional
+        Portion of the generated IDs after "@". See :class:`.EmailSender`.
+    **kwargs : dict
+        Additional keyword arguments are passed to initiation in ``cls_smtp``.
+        These are stored as attribute ``kws_smtp``
+
+    Examples
+    --------
+    .. code-block:: python
+
+        email = AsyncEmailSender(host="smtp.mymail.com", port=123)
+        await email.send(
+            subject="Example Email",
+            sender="me@example.com",
+            receivers=["you@example.com"],
+        )
+    """
+
+    def __init__(self,
+                 host:str,
+                 port:int,
+                 username:str=None,
+                 password:str=None,
+                 cls_smtp:Optional[type]=None,
+                 use_starttls:bool=True,
+                 domain:Optional[str]=None,
+                 **kwargs):
+        super().__init__(
+            host=host, port=port,
+            username=username, password=password,
+            cls_smtp=cls_smtp,
+            use_starttls=use_starttls,
+            domain=domain,
+            **kwargs
+        )
+        self._lock = None
+
+    async def send(self,
+                   subject:Optional[str]=None,
+                   sender:Optional[str]=None,
+                   receivers:Union[List[str], str, None]=None,
+                   cc:Union[List[str], str, None]=None,
+                   bcc:Union[List[str], str, None]=None,
+                   headers:Optional[Dict[str, str]]=None,
+                   html:Optional[str]=None,
+                   text:Optional[str]=None,
+                   html_template:Optional[str]=None,
+                   text_template:Optional[str]=None,
+                   body_images:Optional[Dict[str, Union[str, bytes, 'plt.Figure', 'Image']]]=None,
+                   body_tables:Optional[Dict[str, 'pd.DataFrame']]=None,
+                   body_params:Optional[Dict[str, Any]]=None,
+                   attachments:Optional[Dict[str, Union[str, os.PathLike, 'pd.DataFrame', bytes]]]=None) -> EmailMessage:
+        """Send an email.
+
+        See :meth:`.EmailSender.send` for the parameters.
+
+        Returns
+        -------
+        EmailMessage
+            Email message.
+        """
+        msg = self.get_message(
+            subject=subject,
+            sender=sender,
+            receivers=receivers,
+            cc=cc,
+            bcc=bcc,
+            headers=headers,
+            html=html,
+            text=text,
+            html_template=html_template,
+            text_template=text_template,
+            body_images=body_images,
+            body_tables=body_tables,
+            body_params=body_params,
+            attachments=attachments,
+        )
+        await self.send_message(msg)
+        return msg
+
+    async def send_message(self, msg:EmailMessage):
+        "Send the created message"
+        await self._send_message(msg)
+
+    async def _send_message(self, msg:EmailMessage) -> Dict[str, tuple]:
+        if self.retry is not None or self.max_recipients is not None:
+            raise NotImplementedError("AsyncEmailSender does not support retry or max_recipients")
+        if self.rate_limit is not None:
+            await self.rate_limit.wait_async(len(get_recipients(msg)))
+        if self.is_alive:
+            # A single connection cannot carry concurrent transactions
+            async with self._get_lock():
+                server = self.connection
+                if server is None:
+                    raise aiosmtplib.SMTPServerDisconnected("Connection was closed by a failed send")
+                try:
+                    errors, _ = await server.send_message(msg)
+                except BaseException as exc:
+                    if not _is_reusable(server, exc):
+                        self.connection = None
+                        server.close()
+                    raise
+        elif self.pool is not None:
+            async with self.pool.connection() as server:
+                errors, _ = await server.send_message(msg)
+        else:
+            server = await self.get_server()
+            try:
+                errors, _ = await server.send_message(msg)
+            except BaseException:
+                server.close()
+                raise
+            await _quit(server)
+        return {rcpt: (resp.code, resp.message) for rcpt, resp in errors.items()}
+
+    async def send_many(self, messages:Iterable[Union[EmailMessage, Dict[str, Any]]], max_concurrency:Optional[int]=None) -> List[SendResult]:
+        """Send multiple emails concurrently
+
+        A failing email does not stop sending the
+        rest of the emails.
+
+        Parameters
+        ----------
+        messages : iterable of EmailMessage, iterable of dict
+            Emails to send. If item is a dict, it is passed
+            as keyword arguments to :meth:`get_message`.
+        max_concurrency : int, optional
+            Maximum number of emails in flight at the
+            same time. Defaults to the size of the pool
+            or 1 if there is no pool.
+
+        Returns
+        -------
+        list of SendResult
+            Result of each email in the same order.
+        """
+        if max_concurrency is None:
+            max_concurrency = self.pool.max_size if self.pool is not None and not self.is_alive else 1
+        results = {}
+        items = enumerate(messages)
+
+        async def worker():
+            # The workers share the iterator thus it is consumed lazily
+            for i, item in items:
+                results[i] = await self._send_item(item)
+
+        await asyncio.gather(*(worker() for _ in range(max_concurrency)))
+        return [results[i] for i in range(len(results))]
+
+    async def _send_item(self, item:Union[EmailMessage, Dict[str, Any]]) -> SendResult:
+        start = time.perf_counter()
+        msg_id = None
+        recipients = []
+        try:
+            msg = item if isinstance(item, EmailMessage) else self.get_message(**item)
+            msg_id = msg['Message-ID']
+            recipients = get_recipients(msg)
+            refused = await self._send_message(msg)
+        except Exception as exc:
+            refused = None
+            if isinstance(exc, aiosmtplib.SMTPRecipientsRefused):
+                refused = {err.recipient: (err.code, err.message) for err in exc.recipients}
+            return SendResult(
+                msg_id, recipients,
+                refused=refused,
+                code=getattr(exc, "code", None),
+                error=exc,
+                elapsed=time.perf_counter() - start,
+            )
+        return SendResult(
+            msg_id, recipients,
+            refused=refused,
+            elapsed=time.perf_counter() - start,
+        )
+
+    async def send_merge(self, template:Dict[str, Any], recipients:Union[Iterable[Dict[str, Any]], 'pd.DataFrame'],
+                         max_concurrency:Optional[int]=None) -> List[SendResult]:
+        """Send a personalized email to each recipient (mail merge)
+
+        See :meth:`.EmailSender.send_merge` for ``template``
+        and ``recipients`` and :meth:`send_many` for
+        ``max_concurrency``.
+        """
+        messages = self.get_merge_messages(template, recipients)
+        return await self.send_many(messages, max_concurrency=max_concurrency)
+
+    def get_message_template(self, **kwargs):
+        "Not supported: message templates are sent synchronously"
+        raise NotImplementedError("AsyncEmailSender does not support message templates")
+
+    def build_many(self, specs, **kwargs):
+        "Not supported: the built messages are sent synchronously"
+        raise NotImplementedError("AsyncEmailSender does not support building in a process pool")
+
+    def send_batches(self, msg:EmailMessage, batch_size:Optional[int]=None):
+        "Not supported: use :meth:`send_many` with an email for each batch"
+        raise NotImplementedError("AsyncEmailSender does not support sending in batches")
+
+    def send_parallel(self, messages, **kwargs):
+        "Not supported: use :meth:`send_many` with a pool"
+        raise NotImplementedError("AsyncEmailSender does not support parallel sending. Use send_many with a pool.")
+
+    def set_outbox(self, path, **kwargs):
+        "Not supported: the outbox is used only by :class:`.EmailSender`"
+        raise NotImplementedError("AsyncEmailSender does not support the outbox")
+
+    async def set_pool(self, max_size:int=10, **kwargs) -> AsyncConnectionPool:
+        """Send emails using a pool of connections
+
+        The previous pool (if any) is closed.
+
+        Parameters
+        ----------
+        max_size : int
+            Maximum number of open connections.
+        **kwargs : dict
+            Keyword arguments passed to :class:`.AsyncConnectionPool`
+            (``idle_timeout``, ``max_messages`` and ``health_check``).
+
+        Examples
+        --------
+        .. code-block:: python
+
+            await email.set_pool(max_size=4)
+        """
+        if self.pool is not None:
+            await self.pool.close()
+        self.pool = AsyncConnectionPool(self.get_server, max_size=max_size, **kwargs)
+        return self.pool
+
+    def set_relays(self, relays, **kwargs):
+        "Not supported: relays are not implemented for asyncio"
+        raise NotImplementedError("AsyncEmailSender does not support relays")
+
+    async def get_server(self):
+        "Connect and get the SMTP Server"
+        if self.relays is not None:
+            raise NotImplementedError("AsyncEmailSender does not support relays")
+        cls_smtp = aiosmtplib.SMTP if self.cls_smtp is None else self.cls_smtp
+        server = cls_smtp(
+            hostname=self.host,
+            port=self.port,
+            start_tls=self.use_starttls,
+            **self.kws_smtp
+        )
+        await server.connect()
+        try:
+            if self.username is not None or self.password is not None:
+                await server.login(self.username, self.password)
+        except BaseException:
+            server.close()
+            raise
+        return server
+
+    async def connect(self):
+        "Connect to the SMTP Server"
+        self.connection = await self.get_server()
+
+    async def close(self):
+        "Close (quit) the connection and the pool"
+        if self.connection:
+            conn = self.connection
+            self.connection = None
+            await _quit(conn)
+        if self.pool is not None:
+            await self.pool.close()
+
+    @property
+    def is_alive(self):
+        "bool: Check if there is a connection to the SMTP server"
+        return self.connection is not None
+
+    def _get_lock(self) -> 'asyncio.Lock':
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *args):
+        if self.connection:
+            conn = self.connection
+            self.connection = None
+            await _quit(conn)
+
+    def __enter__(self):
+        raise TypeError("Use 'async with' with AsyncEmailSender")
+
+    def __exit__(self, *args): # pragma: no cover
+        pass
+
+async def _quit(server):
+    try:
+        await server.quit()
+    except (aiosmtplib.SMTPException, OSError):
+        # Already disconnected
+        server.close()
@@ -1,16 +1,72 @@
 
+import base64
 from email.message import EmailMessage
 from email.mime.base import MIMEBase
+from email.mime.nonmultipart import MIMENonMultipart
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.application import MIMEApplication
 import io
 from pathlib import Path, PurePath
-from typing import Union
+from typing import Iterator, List, Union
 
 from .utils import PIL, plt, pd
 
 
+class FileAttachment(MIMENonMultipart):
+    """Attachment part that is read from a file only when needed
+
+    The file is not read when the message is created. When
+    the email is sent, the content is read and base64 encoded
+    in chunks so that large files are not held in memory.
+    Accessing the payload otherwise (ie. ``str(msg)``) reads 
+    the whole file.
+
+    Parameters
+    ----------
+    path : path-like
+        Path to the file.
+    """
+
+    # Multiple of 57 so that each chunk encodes to full 76 character lines
+    chunk_size = 57 * 1024
+
+    def __init__(self, path:Union[str, PurePath]):
+        super().__init__('application', 'octet-stream')
+        self.path = Path(path)
+        self['Content-Transfer-Encoding'] = 'base64'
+
+    def is_multipart(self) -> bool:
+        # Message.is_multipart inspects the payload which
+        # would read the file (ie. on every msg.walk())
+        return False
+
+    @property
+    def _payload(self):
+        payload = self.__dict__.get("_explicit_payload")
+        if payload is not None:
+            return payload
+        return base64.encodebytes(self.path.read_bytes()).decode('ascii')
+
+    @_payload.setter
+    def _payload(self, value):
+        self.__dict__["_explicit_payload"] = value
+
+    def iter_encoded(self, linesep:str="\r\n") -> Iterator[bytes]:
+        "Iterate the base64 encoded content in chunks"
+        payload = self.__dict__.get("_explicit_payload")
+        if payload is not None:
+            yield payload.replace("\n", linesep).encode('ascii')
+            return
+        linesep = linesep.encode('ascii')
+        with open(self.path, "rb") as fh:
+            while True:
+                chunk = fh.read(self.chunk_size)
+                if not chunk:
+                    break
+                yield base64.encodebytes(chunk).replace(b"\n", linesep)
+
+
 class Attachments:
 
     def __init__(self, attachments:Union[list, dict], encoding='UTF-8'):
@@ -21,6 +77,10 @@ class Attachments:
         for part in self._get_parts():
             msg.attach(part)
 
+    def get_parts(self) -> List[MIMEBase]:
+        "Create the MIME parts of the attachments (can be attached to multiple emails)"
+        return list(self._get_parts())
+
     def _get_parts(self):
         if isinstance(self.attachments, dict):
             for name, cont in self.attachments.items():
@@ -33,9 +93,13 @@ class Attachments:
             yield self._get_part(self.attachments)
 
     def _get_part(self, item) -> MIMEBase:
-        cont = self._get_bytes(item)
+        if isinstance(item, MIMEBase):
+            # Already created part
+            return item
+        self._validate_path(item)
         filename = self._get_filename(item)
-        part = MIMEApplication(cont)
+        # Files are read when the email is sent
+        part = FileAttachment(item)
         part.add_header(
             "Content-Disposition",
             "attachment", filename=filename
@@ -44,39 +108,34 @@ class Attachments:
         return part
 
     def _get_part_named(self, item, name) -> MIMEBase:
-        cont = self._get_bytes_named(item, name)
-
-        part = MIMEApplication(cont)
+        if isinstance(item, PurePath):
+            # Files are read when the email is sent
+            part = FileAttachment(item)
+        else:
+            cont = self._get_bytes_named(item, name)
+            part = MIMEApplication(cont)
         part.add_header(
             "Content-Disposition",
             "attachment", filename=name
         )
         return part
 
-    def _get_bytes(self, item) -> bytes:
+    def _validate_path(self, item):
         if isinstance(item, str):
             # Considered as path
-            if Path(item).is_file():
-                return Path(item).read_bytes()
-            else:
+            if not Path(item).is_file():
                 raise ValueError(f"Unknown attachment '{item}'. Perhaps a mistyped path?")
-        elif isinstance(item, PurePath):
-            return item.read_bytes()
-        else:
+        elif not isinstance(item, PurePath):
             raise TypeError(f"Unknown attachment {type(item)}")
 
     def _get_bytes_named(self, item, name:str) -> bytes:
 
-        has_pandas = pd is not None
-        has_pillow = PIL is not None
-        has_matplotlib = plt is not None
-
         if isinstance(item, str):
             # Considered as raw document
             return item
         elif isinstance(item, PurePath):
             return item.read_bytes()
-        elif has_pandas and isinstance(item, (pd.DataFrame, pd.Series)):
+        elif pd.owns(item) and isinstance(item, (pd.DataFrame, pd.Series)):
             buff = io.BytesIO()
             if name.endswith(".xlsx"):
                 item.to_excel(buff)
@@ -91,12 +150,12 @@ class Attachments:
                 raise ValueError(f"Unknown dataframe conversion for '{name}'")
         elif isinstance(item, (bytes, bytearray)):
             return item
-        elif has_pillow and isinstance(item, PIL.Image.Image):
+        elif PIL.owns(item) and isinstance(item, PIL.Image.Image):
             buf = io.BytesIO()
             item.save(buf, format='PNG')
             buf.seek(0)
             return buf.read()
-        elif has_matplotlib and isinstance(item, plt.Figure):
+        elif plt.owns(item) and isinstance(item, plt.Figure):
             buf = io.BytesIO()
             item.savefig(buf, format=Path(name).suffix[1:])
             buf.seek(0)
@@ -1,8 +1,10 @@
+from collections import OrderedDict
 from email.message import EmailMessage
 import mimetypes
+import threading
 from io import BytesIO
 from pathlib import Path
-from typing import TYPE_CHECKING, Dict, Union, ByteString
+from typing import TYPE_CHECKING, Callable, Dict, Union, ByteString
 from pathlib import Path
 
 from redmail.utils import is_bytes
@@ -14,8 +16,10 @@ from jinja2.environment import Template, Environment
 
 from markupsafe import Markup
 
-# We try to import matplotlib and PIL but if fails, they will be None
+# Matplotlib, PIL etc. are imported lazily (they are falsy if missing)
 from .utils import PIL, plt, pd, css_inline
+from .table import NativeTableRenderer
+from .envs import LazyContext, resolve_params
 
 if TYPE_CHECKING:
     # For type hinting
@@ -36,29 +40,87 @@ class BodyImage:
     def src(self):
         return f'cid:{ self.cid }'
 
+class TemplateCache:
+    """LRU cache of Jinja templates compiled from strings
+
+    Parameters
+    ----------
+    maxsize : int
+        Maximum number of templates kept in the cache.
+
+    Attributes
+    ----------
+    hits : int
+        Number of templates found from the cache.
+    misses : int
+        Number of templates compiled.
+    """
+
+    def __init__(self, maxsize:int=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._templates = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, jinja_env:Environment, source:str) -> Template:
+        "Get a compiled template (compile if not cached)"
+        # The source string caches its hash thus lookups are cheap
+        key = (jinja_env, source)
+        with self._lock:
+            template = self._templates.get(key)
+            if template is not None:
+                self._templates.move_to_end(key)
+                self.hits += 1
+                return template
+            self.misses += 1
+
+        template = jinja_env.from_string(source)
+        with self._lock:
+            self._templates[key] = template
+            if len(self._templates) > self.maxsize:
+                self._templates.popitem(last=False)
+        return template
+
+    def clear(self):
+        "Empty the cache and reset the counters"
+        with self._lock:
+            self._templates.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._templates)
+
 class Body:
 
-    def __init__(self, jinja_env:Environment, template:Template=None, table_template:Template=None, use_jinja=True):
+    def __init__(self, jinja_env:Environment, template:Template=None, table_template:Template=None, use_jinja=True, template_cache:TemplateCache=None):
         self.template = template
         self.table_template = table_template
         self.jinja_env = jinja_env
         self.use_jinja = use_jinja
+        self.template_cache = template_cache
 
     def render_body(self, body:str, jinja_params:dict):
         if body is not None and self.template is not None:
             raise ValueError("Either body or template must be specified but not both.")
             
-        if body is not None:
+        if body is not None and self.template_cache is not None:
+            template = self.template_cache.get(self.jinja_env, body)
+        elif body is not None:
             template = self.jinja_env.from_string(body)
         else:
             template = self.template
+        if not issubclass(template.environment.context_class, LazyContext):
+            # Environment cannot evaluate lazy parameters on use
+            jinja_params = resolve_params(jinja_params)
         return template.render(**jinja_params)
 
     def render_table(self, tbl, extra=None):
         # TODO: Nicer tables. 
         #   https://stackoverflow.com/a/55356741/13696660
         #   Email HTML (generally) does not support CSS
-        if pd is None:
+        if not pd:
             raise ImportError("Missing package 'pandas'. Prettifying tables requires Pandas.")
         
         from pandas.io.formats.style import Styler
@@ -68,7 +130,7 @@ class Body:
         # Allow for pandas styler object, convert to inline CSS for email client rendering
         # https://pandas.pydata.org/docs/reference/api/pandas.io.formats.style.Styler.html
         if isinstance(tbl, Styler):
-            if css_inline is None:
+            if not css_inline:
                 raise ImportError("Missing package 'css_inline'. Prettifying tables with Pandas styler requires css_inline.")
             inliner = css_inline.CSSInliner()
             return inliner.inline(tbl.to_html())
@@ -98,9 +160,22 @@ class TextBody(Body):
 
 class HTMLBody(Body):
 
-    def __init__(self, domain:str=None, **kwargs):
+    table_engines = ("jinja", "native")
+    native_renderer = NativeTableRenderer()
+
+    def __init__(self, domain:str=None, table_engine:str="jinja", id_generator:Callable[..., str]=None, **kwargs):
         super().__init__(**kwargs)
+        if table_engine not in self.table_engines:
+            raise ValueError(f"Invalid table engine {table_engine!r}. Options: {self.table_engines}")
         self.domain = domain
+        self.table_engine = table_engine
+        self.id_generator = id_generator if id_generator is not None else make_msgid
+
+    def render_table(self, tbl, extra=None):
+        if self.table_engine == "native" and pd and isinstance(tbl, (pd.DataFrame, list, dict)):
+            df = pd.DataFrame(tbl)
+            return Markup(self.native_renderer.render(df, self.table_template))
+        return super().render_table(tbl, extra=extra)
 
     def attach(self, 
                msg:EmailMessage, 
@@ -174,7 +249,7 @@ class HTMLBody(Body):
 
         # Define CIDs for images
         cids = {
-            name: make_msgid(domain=domain)
+            name: self.id_generator(domain=domain)
             for name in images
         }
         html_images = {
@@ -187,6 +262,75 @@ class HTMLBody(Body):
         html = super().render(html, tables=tables, jinja_params=jinja_params)
         return html, cids
 
+    @staticmethod
+    def load_image(img:Union[ByteString, str, Path, Dict[str, Union[ByteString, str]]]) -> Dict[str, Union[ByteString, str]]:
+        """Get the content and the MIME type of a body image
+        
+        Returns
+        -------
+        dict
+            The content (bytes) in key ``content`` and the
+            keyword arguments of ``add_related`` in the rest.
+        """
+        if is_bytes(img) or isinstance(img, BytesIO):
+            # We just assume the user meant PNG. If not, it should have been specified
+            img_content = img.read() if hasattr(img, "read") else img
+            kwds = {
+                'maintype': 'image',
+                'subtype': 'png',
+            }
+
+        elif isinstance(img, dict):
+            # Expecting dict explanation of bytes
+            # ie. {"maintype": "image", "subtype": "png", "content": b'...'}
+
+            # Setting defaults (the given dict is not modified)
+            img = {'maintype': 'image', **img}
+
+            # Validation
+            required_keys = ("content", "subtype")
+            if any(key not in img for key in required_keys):
+                missing_keys = tuple(key for key in required_keys if key not in img)
+                raise KeyError(f"Dict representation of an image missing keys: {missing_keys}")
+
+            img_content = img.pop("content")
+            kwds = img
+
+        elif isinstance(img, Path) or (isinstance(img, str) and Path(img).is_file()):
+            path = img
+            maintype, subtype = mimetypes.guess_type(str(path))[0].split('/')
+
+            with open(path, "rb") as img:
+                img_content = img.read()
+            kwds = {
+                'maintype': maintype,
+                'subtype': subtype,
+            }
+        elif plt.owns(img) and isinstance(img, plt.Figure):
+            buf = BytesIO()
+            img.savefig(buf, format='png')
+            buf.seek(0)
+            img_content = buf.read()
+            kwds = {
+                'maintype': 'image',
+                'subtype': 'png',
+            }
+        elif PIL.owns(img) and isinstance(img, PIL.Image.Image):
+            buf = BytesIO()
+            img.save(buf, format='PNG')
+            buf.seek(0)
+            img_content = buf.read()
+            kwds = {
+                'maintype': 'image',
+                'subtype': 'png',
+            }
+        else:
+            # Cannot be figured out
+            if isinstance(img, str):
+                raise ValueError(f"Unknown image string '{img}'. Maybe incorrect path?")
+            raise TypeError(f"Unknown image {repr(img)}")
+        return {'content': img_content, **kwds}
+
     def attach_imgs(self, msg_body:EmailMessage, imgs:Dict[str, Union[ByteString, str, Dict[str, Union[ByteString, str]]]]):
         """Attach CID images to Message Body
         
@@ -196,63 +340,8 @@ class HTMLBody(Body):
         """
 
         for cid, img in imgs.items():
-            if is_bytes(img) or isinstance(img, BytesIO):
-                # We just assume the user meant PNG. If not, it should have been specified
-                img_content = img.read() if hasattr(img, "read") else img
-                kwds = {
-                    'maintype': 'image',
-                    'subtype': 'png',
-                }
-
-            elif isinstance(img, dict):
-                # Expecting dict explanation of bytes
-                # ie. {"maintype": "image", "subtype": "png", "content": b'...'}
-
-                # Setting defaults
-                img['maintype'] = img.get('maintype', 'image')
-
-                # Validation
-                required_keys = ("content", "subtype")
-                if any(key not in img for key in required_keys):
-                    missing_keys = tuple(key for key in required_keys if key not in img)
-                    raise KeyError(f"Dict representation of an image missing keys: {missing_keys}")
-                
-                img_content = img.pop("content")
-                kwds = img
-
-            elif isinstance(img, Path) or (isinstance(img, str) and Path(img).is_file()):
-                path = img
-                maintype, subtype = mimetypes.guess_type(str(path))[0].split('/')
-                
-                with open(path, "rb") as img:
-                    img_content = img.read()
-                kwds = {
-                    'maintype': maintype,
-                    'subtype': subtype,
-                }
-            elif plt is not None and isinstance(img, plt.Figure):
-                buf = BytesIO()
-                img.savefig(buf, format='png')
-                buf.seek(0)
-                img_content = buf.read()
-                kwds = {
-                    'maintype': 'image',
-                    'subtype': 'png',
-                }
-            elif PIL is not None and isinstance(img, PIL.Image.Image):
-                buf = BytesIO()
-                img.save(buf, format='PNG')
-                buf.seek(0)
-                img_content = buf.read()
-                kwds = {
-                    'maintype': 'image',
-                    'subtype': 'png',
-                }
-            else:
-                # Cannot be figured out
-                if isinstance(img, str):
-                    raise ValueError(f"Unknown image string '{img}'. Maybe incorrect path?")
-                raise TypeError(f"Unknown image {repr(img)}")
+            kwds = self.load_image(img)
+            img_content = kwds.pop("content")
 
             msg_body.add_related(
                 img_content,
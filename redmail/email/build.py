@@ -0,0 +1,84 @@
+from collections import deque
+from email.message import EmailMessage
+import os
+from typing import TYPE_CHECKING, Any, Deque, Dict, Iterable, Iterator, Optional, Union
+
+from .streaming import SerializedMessage, get_envelope, is_ascii_envelope
+from .utils import futures
+
+if TYPE_CHECKING:
+    # For type hinting
+    from .sender import EmailSender
+
+# Sender of the worker process (set by the initializer)
+_builder: Optional['EmailSender'] = None
+
+
+def iter_built(sender:'EmailSender', specs:Iterable[Dict[str, Any]], max_workers:Optional[int]=None,
+               max_pending:Optional[int]=None) -> Iterator[Union[SerializedMessage, EmailMessage]]:
+    """Create the emails in worker processes
+
+    The emails are created with :meth:`.EmailSender.get_message`
+    and flattened to bytes in the workers thus rendering,
+    plotting and encoding the attachments use all cores.
+
+    Parameters
+    ----------
+    sender : EmailSender
+        Sender whose settings (templates, defaults etc.) are
+        used. It is pickled to the workers without the
+        connection, pool and password.
+    specs : iterable of dict
+        Keyword arguments of :meth:`.EmailSender.get_message`.
+        Must be picklable. Consumed lazily.
+    max_workers : int, optional
+        Number of processes. Defaults to the number of CPUs.
+    max_pending : int, optional
+        Maximum number of emails being created at a time.
+        Defaults to twice the number of processes.
+
+    Yields
+    ------
+    SerializedMessage, EmailMessage
+        Created emails in the order of the specs. Emails
+        with non-ASCII addresses are returned as messages.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    max_pending = 2 * max_workers if max_pending is None else max_pending
+    with futures.ProcessPoolExecutor(max_workers=max_workers, initializer=_init_builder, initargs=(_get_builder(sender),)) as executor:
+        pending: Deque['futures.Future'] = deque()
+        for spec in specs:
+            pending.append(executor.submit(_build, spec))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _get_builder(sender:'EmailSender') -> 'EmailSender':
+    "Copy the sender without the parts that are not needed (or picklable) for creating emails"
+    builder = sender.copy()
+    builder.connection = None
+    builder.pool = None
+    builder.outbox = None
+    builder.relays = None
+    builder.rate_limit = None
+    builder.retry = None
+    builder.password = None
+    builder.cls_smtp = None
+    builder.kws_smtp = {}
+    return builder
+
+
+def _init_builder(builder:'EmailSender'):
+    global _builder
+    _builder = builder
+
+
+def _build(spec:Dict[str, Any]) -> Union[SerializedMessage, EmailMessage]:
+    msg = _builder.get_message(**spec)
+    from_addr, to_addrs = get_envelope(msg)
+    if is_ascii_envelope(from_addr, to_addrs):
+        # Flattened here to encode the attachments in the worker
+        return SerializedMessage(msg)
+    return msg
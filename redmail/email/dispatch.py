@@ -0,0 +1,145 @@
+from email.message import EmailMessage
+import queue
+import smtplib
+import threading
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Union
+
+from .result import SendResult
+from .streaming import SerializedMessage
+from .utils import get_recipients
+
+if TYPE_CHECKING:
+    # For type hinting
+    from .sender import EmailSender
+
+class ParallelDispatcher:
+    """Send emails over multiple connections at the same time
+
+    Each worker thread sends over its own connection (or
+    over the pool of the sender if set) thus the round
+    trips of the SMTP transactions overlap. The messages
+    are consumed lazily and at most ``max_in_flight``
+    are waiting at a time.
+
+    Parameters
+    ----------
+    sender : EmailSender
+        Sender that creates and sends the emails. Workers
+        use copies of it sharing its pool, retry policy,
+        rate limit and relays.
+    n_connections : int
+        Number of worker threads (and connections).
+    max_in_flight : int, optional
+        Maximum number of emails consumed from the iterable
+        but not yet sent. Defaults to twice the number of
+        connections.
+    max_errors : int, optional
+        Maximum number of failed emails. After exceeding
+        it, the rest are not sent and the iterable is not
+        consumed further. By default, not limited.
+
+    Examples
+    --------
+    .. code-block:: python
+
+        dispatcher = ParallelDispatcher(email, n_connections=4, max_errors=10)
+        results = dispatcher.send(messages)
+    """
+
+    def __init__(self, sender:'EmailSender', n_connections:int=4, max_in_flight:Optional[int]=None, max_errors:Optional[int]=None):
+        if n_connections < 1:
+            raise ValueError("At least one connection is required")
+        self.sender = sender
+        self.n_connections = n_connections
+        self.max_in_flight = 2 * n_connections if max_in_flight is None else max_in_flight
+        self.max_errors = max_errors
+
+        self.n_errors = 0
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    @property
+    def is_stopped(self) -> bool:
+        "bool: Whether the error budget was exceeded"
+        return self._stopped.is_set()
+
+    def send(self, messages:Iterable[Union[EmailMessage, Dict[str, Any]]]) -> List[SendResult]:
+        """Send the emails
+
+        Parameters
+        ----------
+        messages : iterable of EmailMessage, iterable of dict
+            Emails to send. If item is a dict, it is passed
+            as keyword arguments to :meth:`.EmailSender.get_message`.
+
+        Returns
+        -------
+        list of SendResult
+            Result of each consumed email in the same order.
+            Emails skipped due to exceeding the error budget
+            have an error as well.
+        """
+        self.n_errors = 0
+        self._stopped.clear()
+        tasks = queue.Queue(maxsize=self.max_in_flight)
+        results = {}
+        workers = [
+            threading.Thread(target=self._run, args=(tasks, results), name=f"redmail-sender-{i}", daemon=True)
+            for i in range(self.n_connections)
+        ]
+        for worker in workers:
+            worker.start()
+
+        n_items = 0
+        try:
+            for i, item in enumerate(messages):
+                if self.is_stopped:
+                    break
+                # Blocks if the workers are behind
+                tasks.put((i, item))
+                n_items = i + 1
+        finally:
+            for _ in workers:
+                tasks.put(None)
+            for worker in workers:
+                worker.join()
+        return [results[i] for i in range(n_items)]
+
+    def _run(self, tasks:queue.Queue, results:Dict[int, SendResult]):
+        sender = self.sender.copy()
+        sender.connection = None
+        sender.outbox = None
+        try:
+            while True:
+                task = tasks.get()
+                if task is None:
+                    return
+                i, item = task
+                if self.is_stopped:
+                    results[i] = _get_skipped(item)
+                    continue
+                result = sender._send_item(item)
+                results[i] = result
+                if not result.ok:
+                    self._add_error()
+        finally:
+            try:
+                sender.close()
+            except (smtplib.SMTPException, OSError):
+                pass
+
+    def _add_error(self):
+        with self._lock:
+            self.n_errors += 1
+            if self.max_errors is not None and self.n_errors > self.max_errors:
+                self._stopped.set()
+
+
+def _get_skipped(item:Union[EmailMessage, SerializedMessage, Dict[str, Any]]) -> SendResult:
+    "Get result of an email that was not sent"
+    error = RuntimeError("Error budget exceeded")
+    if isinstance(item, EmailMessage):
+        return SendResult(item['Message-ID'], get_recipients(item), error=error)
+    if isinstance(item, SerializedMessage):
+        return SendResult(item.message_id, item.to_addrs, error=error)
+    return SendResult(None, [], error=error)
@@ -1,6 +1,14 @@
 
 from jinja2 import Environment, FileSystemLoader
+from jinja2.runtime import Context
 from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Tuple
+
+from .utils import pd, np
+
+if TYPE_CHECKING:
+    # For type hinting
+    from pandas import DataFrame, Index
 
 def get_span(l:list, loc:int, width=None) -> int:
     "Get span of each value in index/column"
@@ -56,3 +64,119 @@ def is_last_group_row(n, index:list, level=None):
     # ie. ("blue", "car"), ("green", "car") --> True
     # ("blue", "car"), ("blue", "red") --> False
     return curr[0] != next[0]
+
+class TableLayout:
+    """Spans and group boundaries of the index and columns of a dataframe
+
+    Computed once per dataframe so that the table templates
+    can look them up instead of scanning the axes for each cell.
+    The nested lists are indexed as ``[level][position]``.
+
+    Attributes
+    ----------
+    index_spans : list of list of int
+        Rowspans of the index values. 0 means the value
+        is covered by a previous row.
+    column_spans : list of list of int
+        Colspans of the column values.
+    index_last_group : list of list of bool
+        Whether the index value is the last of its group.
+        Same as ``is_last_group_row(row, df.index, level=level)``.
+    column_last_group : list of list of bool
+        Whether the column value is the last of its group.
+    index_last_row : list of bool
+        Whether the row is the last of its outermost group.
+        Same as ``is_last_group_row(row, df.index)``.
+    column_last_column : list of bool
+        Whether the column is the last of its outermost group.
+    """
+
+    def __init__(self, df:'DataFrame'):
+        self.index_spans, self.index_last_group, self.index_last_row = _get_axis_layout(df.index)
+        self.column_spans, self.column_last_group, self.column_last_column = _get_axis_layout(df.columns)
+
+def get_table_layout(df:'DataFrame') -> TableLayout:
+    "Get spans and group boundaries of a dataframe"
+    return TableLayout(df)
+
+def _get_axis_layout(axis:'Index') -> Tuple[List[List[int]], List[List[bool]], List[bool]]:
+    n = len(axis)
+    is_multi = axis.nlevels > 1
+    if is_multi:
+        level_codes = [np.asarray(codes) for codes in axis.codes]
+    else:
+        level_codes = [pd.factorize(axis)[0]]
+
+    spans = []
+    last_group = []
+    # Whether a group of the levels so far starts at the position
+    is_start = np.zeros(n, dtype=bool)
+    is_start[:1] = True
+    outer_starts = None
+    for codes in level_codes:
+        is_start[1:] |= codes[1:] != codes[:-1]
+        if not is_multi:
+            # Missing values (code -1) of a flat axis are not
+            # equal thus each starts a group. In the tuples of
+            # a MultiIndex they are the same object thus equal.
+            is_start[1:] |= codes[1:] == -1
+        starts = np.flatnonzero(is_start)
+        ends = np.append(starts[1:], n)
+
+        level_spans = np.zeros(n, dtype=int)
+        level_spans[starts] = ends - starts
+        spans.append(level_spans.tolist())
+
+        if outer_starts is None:
+            # Padded with the end of the axis
+            outer_starts = np.append(is_start, True)
+        if is_multi:
+            # The group is the last if the outermost level
+            # changes right after the group ends
+            group_ends = ends[np.cumsum(is_start) - 1]
+            last_group.append(outer_starts[group_ends].tolist())
+        else:
+            last_group.append([False] * n)
+
+    last_position = outer_starts[1:].tolist() if is_multi else [False] * n
+    return spans, last_group, last_position
+
+
+class LazyParam:
+    """Jinja parameter that is evaluated only if a template uses it
+
+    The value is computed once by calling ``func(*args, **kwargs)``.
+    Requires the Jinja environment to use :class:`LazyContext`.
+    """
+
+    _missing = object()
+
+    def __init__(self, func:Callable, *args, **kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self._value = self._missing
+
+    def get(self) -> Any:
+        "Evaluate the value (once)"
+        if self._value is self._missing:
+            self._value = self.func(*self.args, **self.kwargs)
+        return self._value
+
+
+class LazyContext(Context):
+    "Jinja context that evaluates the lazy parameters when looked up"
+
+    def resolve_or_missing(self, key:str) -> Any:
+        value = super().resolve_or_missing(key)
+        if isinstance(value, LazyParam):
+            return value.get()
+        return value
+
+
+def resolve_params(params:Dict[str, Any]) -> Dict[str, Any]:
+    "Evaluate the lazy parameters"
+    return {
+        key: value.get() if isinstance(value, LazyParam) else value
+        for key, value in params.items()
+    }
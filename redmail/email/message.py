@@ -0,0 +1,147 @@
+from copy import copy
+from email.generator import BytesGenerator
+from email.message import EmailMessage
+from email.utils import formatdate
+from io import BytesIO
+from typing import TYPE_CHECKING, List, Optional, Tuple, Union
+
+from .streaming import SerializedMessage, get_envelope, has_file_parts, is_ascii_envelope
+
+if TYPE_CHECKING:
+    # For type hinting
+    from .sender import EmailSender
+
+class MessageTemplate:
+    """Email created once and sent many times
+
+    The bodies, images and attachments are created and
+    encoded only once. Each send gets its own recipients,
+    subject, Message-ID and Date while the rest of the
+    email is reused as flattened bytes.
+
+    Parameters
+    ----------
+    sender : EmailSender
+        Sender used for creating the IDs and sending.
+    msg : EmailMessage
+        Email to use as the template. Its headers other
+        than the ones set per send are kept.
+
+    Examples
+    --------
+    .. code-block:: python
+
+        template = email.get_message_template(subject="Alert", html=html, attachments=attachments)
+        for team in teams:
+            template.send(receivers=team.members)
+    """
+
+    # Headers that are set for each email
+    variable_headers = ("To", "Cc", "Bcc", "Subject", "Message-ID", "Date")
+
+    def __init__(self, sender:'EmailSender', msg:EmailMessage):
+        self.sender = sender
+        self.defaults = {
+            name: msg[name]
+            for name in ("To", "Cc", "Bcc", "Subject")
+            if name in msg
+        }
+
+        skeleton = copy(msg)
+        for name in self.variable_headers:
+            del skeleton[name]
+        self._skeleton = skeleton
+
+        self._data = None
+        if not has_file_parts(msg):
+            # Files are streamed when sending instead of kept in memory
+            buffer = BytesIO()
+            BytesGenerator(buffer).flatten(skeleton, linesep="\r\n")
+            self._data = buffer.getvalue()
+
+    def get_message(self, receivers:Union[List[str], str, None]=None, cc:Union[List[str], str, None]=None,
+                    bcc:Union[List[str], str, None]=None, subject:Optional[str]=None) -> EmailMessage:
+        """Create an email from the template
+
+        The email shares the parts with the template
+        thus they should not be modified.
+
+        Parameters
+        ----------
+        receivers : list of str, str, optional
+            Receivers of the email. Defaults to the template's.
+        cc : list of str, str, optional
+            Cc of the email. Defaults to the template's.
+        bcc : list of str, str, optional
+            Bcc of the email. Defaults to the template's.
+        subject : str, optional
+            Subject of the email. Defaults to the template's.
+        """
+        _, msg = self._create(receivers, cc, bcc, subject)
+        return msg
+
+    def serialize(self, receivers:Union[List[str], str, None]=None, cc:Union[List[str], str, None]=None,
+                  bcc:Union[List[str], str, None]=None, subject:Optional[str]=None) -> Union[SerializedMessage, EmailMessage]:
+        """Create an email from the template as bytes ready to send
+
+        Only the headers set per send are flattened. If
+        the email has streamed file attachments or needs
+        SMTPUTF8, the email is returned as a message. See
+        :meth:`get_message` for the parameters.
+        """
+        head, msg = self._create(receivers, cc, bcc, subject)
+        from_addr, to_addrs = get_envelope(msg)
+        if self._data is None or not is_ascii_envelope(from_addr, to_addrs):
+            return msg
+
+        del head['Bcc']
+        buffer = BytesIO()
+        BytesGenerator(buffer).flatten(head, linesep="\r\n")
+        # Header-only message ends with an empty line
+        data = buffer.getvalue()[:-2] + self._data
+        return SerializedMessage.from_data(data, from_addr, to_addrs, message_id=msg['Message-ID'])
+
+    def send(self, receivers:Union[List[str], str, None]=None, cc:Union[List[str], str, None]=None,
+             bcc:Union[List[str], str, None]=None, subject:Optional[str]=None) -> Union[SerializedMessage, EmailMessage]:
+        """Send an email created from the template
+
+        Uses the connection, outbox, retry policy etc. of the
+        sender the same way as :meth:`.EmailSender.send`. See
+        :meth:`get_message` for the parameters.
+
+        Returns
+        -------
+        SerializedMessage, EmailMessage
+            Sent email.
+        """
+        sender = self.sender
+        if sender.outbox is not None:
+            # Sent in the background
+            msg = self.get_message(receivers, cc, bcc, subject)
+            sender.outbox.put(msg)
+            return msg
+        msg = self.serialize(receivers, cc, bcc, subject)
+        sender._send_all(msg, keep_open=sender.connection is not None)
+        return msg
+
+    def _create(self, receivers, cc, bcc, subject) -> Tuple[EmailMessage, EmailMessage]:
+        "Create the headers set per send and the email"
+        skeleton = self._skeleton
+        values = {
+            "To": receivers,
+            "Cc": cc,
+            "Bcc": bcc,
+            "Subject": subject,
+        }
+        head = EmailMessage(skeleton.policy)
+        for name, value in values.items():
+            value = value or self.defaults.get(name)
+            if value:
+                head[name] = value
+        head["Message-ID"] = self.sender.create_message_id()
+        head["Date"] = formatdate()
+
+        msg = copy(skeleton)
+        # The header list is not shared with the template
+        msg._headers = head._headers + skeleton._headers
+        return head, msg
@@ -0,0 +1,209 @@
+import email.policy
+from email.message import EmailMessage
+from email.parser import BytesParser
+from pathlib import Path
+import threading
+import time
+import warnings
+from typing import TYPE_CHECKING, Iterator, List, Optional, Tuple, Union
+
+from .result import SendResult
+from .retry import RetryPolicy
+from .utils import is_disconnect, sqlite3
+
+if TYPE_CHECKING:
+    # For type hinting
+    from .sender import EmailSender
+
+class Outbox:
+    """Persistent queue of emails stored in an SQLite database
+
+    The emails are stored on the disk before sending and
+    removed when the SMTP server has accepted them. Emails
+    that failed due to temporary errors are retried with
+    exponential backoff. The emails survive restarts of
+    the process thus an email may be sent more than once
+    if the process is killed during sending.
+
+    Parameters
+    ----------
+    path : path-like
+        Path to the SQLite database. Created if missing.
+    retry : RetryPolicy, optional
+        Which errors are retried, how many times and
+        how long to wait in between. After the attempts
+        are exhausted or on a permanent error, the email
+        is marked as failed. Defaults to 10 attempts
+        starting with 30 seconds delay up to an hour.
+
+    Examples
+    --------
+    .. code-block:: python
+
+        outbox = Outbox("outbox.db")
+        outbox.put(email.get_message(...))
+        results = outbox.drain(email)
+    """
+
+    def __init__(self, path:Union[str, Path], retry:Optional[RetryPolicy]=None):
+        self.path = Path(path)
+        self.retry = RetryPolicy(max_attempts=10, delay=30, max_delay=3600) if retry is None else retry
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "message BLOB NOT NULL, "
+            "status TEXT NOT NULL DEFAULT 'pending', "
+            "attempts INTEGER NOT NULL DEFAULT 0, "
+            "next_attempt REAL NOT NULL, "
+            "last_error TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_pending ON messages (status, next_attempt)")
+
+        self._thread = None
+        self._wake = threading.Event()
+        self._stopping = False
+
+    def put(self, msg:EmailMessage) -> int:
+        "Store an email to be sent and return its ID in the outbox"
+        data = msg.as_bytes(policy=msg.policy)
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO messages (message, next_attempt) VALUES (?, ?)",
+                (data, time.time())
+            )
+        self._wake.set()
+        return cur.lastrowid
+
+    def __len__(self) -> int:
+        "Number of emails waiting to be sent"
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM messages WHERE status = 'pending'").fetchone()[0]
+
+    def get_failed(self) -> List[Tuple[EmailMessage, str]]:
+        "Get the emails that could not be sent and their errors"
+        with self._lock:
+            rows = self._conn.execute("SELECT message, last_error FROM messages WHERE status = 'failed' ORDER BY id").fetchall()
+        return [(self._parse(data), error) for data, error in rows]
+
+    def drain(self, sender:'EmailSender') -> List[SendResult]:
+        """Send the emails that are due
+
+        Parameters
+        ----------
+        sender : EmailSender
+            Sender used for sending. Its connection is
+            opened if needed and closed afterwards unless
+            it was already open.
+
+        Returns
+        -------
+        list of SendResult
+            Result of each sending attempt.
+        """
+        is_own_connection = sender.connection is None and sender.pool is None
+        results = []
+        try:
+            for id_, msg in self._iter_due():
+                result = sender._send_item(msg)
+                self._update(id_, result)
+                results.append(result)
+                if not result.ok and is_disconnect(result.error):
+                    # Server is unreachable, the rest are tried later
+                    break
+        finally:
+            if is_own_connection:
+                sender.close()
+        return results
+
+    def start(self, sender:'EmailSender', interval:float=10):
+        """Send the emails in a background thread
+
+        Parameters
+        ----------
+        sender : EmailSender
+            Sender used for sending. It is copied on each
+            round thus its later changes (ie. ``retry``,
+            ``pool`` or ``rate_limit``) are used but its
+            connection is not shared.
+        interval : float
+            Seconds between checking the due retries.
+            New emails are sent immediately.
+        """
+        self.stop()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, args=(sender, interval), name="redmail-outbox", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        "Stop the background thread (the unsent emails remain in the outbox)"
+        if self._thread is not None:
+            self._stopping = True
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+            self._stopping = False
+
+    def close(self):
+        "Stop sending and close the database"
+        self.stop()
+        with self._lock:
+            self._conn.close()
+
+    def _run(self, sender:'EmailSender', interval:float):
+        while not self._stopping:
+            self._wake.clear()
+            try:
+                self.drain(_copy_sender(sender))
+            except Exception as exc:
+                # The emails are retried on the next round
+                warnings.warn(f"Sending emails from the outbox failed: {exc!r}", RuntimeWarning)
+            self._wake.wait(interval)
+
+    def _iter_due(self, batch_size:int=100) -> Iterator[Tuple[int, EmailMessage]]:
+        "Iterate the due emails in batches (without loading all to memory)"
+        last_id = 0
+        start = time.time()
+        while not self._stopping:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT id, message FROM messages "
+                    "WHERE status = 'pending' AND next_attempt <= ? AND id > ? "
+                    "ORDER BY id LIMIT ?",
+                    (start, last_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for id_, data in rows:
+                last_id = id_
+                yield id_, self._parse(data)
+
+    def _update(self, id_:int, result:SendResult):
+        with self._lock:
+            if result.ok:
+                self._conn.execute("DELETE FROM messages WHERE id = ?", (id_,))
+                return
+            attempts = self._conn.execute("SELECT attempts FROM messages WHERE id = ?", (id_,)).fetchone()[0] + 1
+            is_failed = not self.retry.should_retry(result.error, attempts)
+            delay = self.retry.get_delay(attempts)
+            self._conn.execute(
+                "UPDATE messages SET status = ?, attempts = ?, next_attempt = ?, last_error = ? WHERE id = ?",
+                ('failed' if is_failed else 'pending', attempts, time.time() + delay, repr(result.error), id_)
+            )
+
+    @staticmethod
+    def _parse(data:bytes) -> EmailMessage:
+        policy = email.policy.default.clone(linesep="\r\n")
+        return BytesParser(policy=policy).parsebytes(data)
+
+
+def _copy_sender(sender:'EmailSender') -> 'EmailSender':
+    "Copy the sender with its current settings but without its connection"
+    sender = sender.copy()
+    sender.outbox = None
+    sender.connection = None
+    return sender
@@ -0,0 +1,244 @@
+import smtplib
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Optional
+
+from .utils import is_disconnect
+
+class PooledConnection:
+    "Utility class to represent a connection in a pool"
+
+    def __init__(self, server:smtplib.SMTP):
+        self.server = server
+        self.created = time.monotonic()
+        self.last_used = self.created
+        self.n_messages = 0
+
+    @property
+    def idle_time(self) -> float:
+        "float: Seconds since the connection was last used"
+        return time.monotonic() - self.last_used
+
+
+class ConnectionPool:
+    """Thread-safe pool of SMTP connections
+
+    Parameters
+    ----------
+    connect : callable
+        Function that opens a new connection to the
+        SMTP server (and logs in). Typically
+        :meth:`EmailSender.get_server`.
+    max_size : int
+        Maximum number of connections open at the
+        same time. If all are in use, acquiring waits
+        until one is released.
+    idle_timeout : float, optional
+        Seconds a connection may stay unused in the pool
+        before it is closed. Servers typically close idle
+        connections after some minutes.
+    max_messages : int, optional
+        Maximum number of messages sent over one connection
+        before it is closed and replaced.
+    health_check : float, optional
+        Seconds a connection may stay unused before it is
+        probed with ``NOOP`` when acquired. If None, the
+        connections are not probed.
+    timeout : float, optional
+        Seconds to wait for a free connection before
+        raising ``TimeoutError``. Waits indefinitely
+        by default.
+    on_close : callable, optional
+        Function called with each connection the
+        pool has closed.
+
+    Examples
+    --------
+    .. code-block:: python
+
+        pool = ConnectionPool(email.get_server, max_size=4)
+        with pool.connection() as server:
+            server.send_message(msg)
+    """
+
+    def __init__(self,
+                 connect:Callable[[], smtplib.SMTP],
+                 max_size:int=10,
+                 idle_timeout:Optional[float]=60,
+                 max_messages:Optional[int]=None,
+                 health_check:Optional[float]=5,
+                 timeout:Optional[float]=None,
+                 on_close:Optional[Callable[[smtplib.SMTP], None]]=None):
+        if max_size < 1:
+            raise ValueError("Pool must allow at least one connection")
+        self.connect = connect
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.max_messages = max_messages
+        self.health_check = health_check
+        self.timeout = timeout
+        self.on_close = on_close
+
+        self._idle: Deque[PooledConnection] = deque()
+        self._cond = threading.Condition()
+        self._n_open = 0
+        self._is_closed = False
+
+    @property
+    def size(self) -> int:
+        "int: Number of open connections (idle and in use)"
+        return self._n_open
+
+    @property
+    def n_idle(self) -> int:
+        "int: Number of idle connections in the pool"
+        return len(self._idle)
+
+    def acquire(self) -> PooledConnection:
+        """Get a connection from the pool
+
+        Reuses an idle connection if possible, opens a new one
+        if the pool is not full and otherwise waits for a
+        connection to be released."""
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while True:
+            expired = []
+            conn = None
+            create = False
+            with self._cond:
+                while True:
+                    if self._is_closed:
+                        raise RuntimeError("Connection pool is closed")
+                    while self._idle:
+                        candidate = self._idle.pop()
+                        if self._is_expired(candidate):
+                            self._n_open -= 1
+                            expired.append(candidate)
+                        else:
+                            conn = candidate
+                            break
+                    if conn is not None:
+                        break
+                    if self._n_open < self.max_size:
+                        self._n_open += 1
+                        create = True
+                        break
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError("Timed out waiting for a free SMTP connection")
+                    self._cond.wait(remaining)
+                if expired:
+                    # Freed slots for others
+                    self._cond.notify(len(expired))
+
+            for candidate in expired:
+                self._quit(candidate)
+
+            if create:
+                try:
+                    return PooledConnection(self.connect())
+                except BaseException:
+                    self._forget()
+                    raise
+
+            if self._is_healthy(conn):
+                return conn
+            self._quit(conn)
+            self._forget()
+
+    def release(self, conn:PooledConnection, discard:bool=False):
+        """Return a connection to the pool
+
+        Parameters
+        ----------
+        conn : PooledConnection
+            Connection acquired from the pool.
+        discard : bool
+            Close the connection instead of reusing it.
+            Should be set if the connection is broken.
+        """
+        conn.last_used = time.monotonic()
+        is_exhausted = self.max_messages is not None and conn.n_messages >= self.max_messages
+        with self._cond:
+            if not (discard or is_exhausted or self._is_closed):
+                self._idle.append(conn)
+                self._cond.notify()
+                return
+        self._quit(conn)
+        self._forget()
+
+    @contextmanager
+    def connection(self):
+        """Acquire a connection for the duration of the context
+
+        A message is counted for each use. The connection
+        is discarded if it was broken by an error."""
+        conn = self.acquire()
+        try:
+            yield conn.server
+        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused) as exc:
+            # smtplib resets the transaction thus the connection is still
+            # usable unless the server closed it (421)
+            conn.n_messages += 1
+            self.release(conn, discard=is_disconnect(exc) or getattr(conn.server, "sock", True) is None)
+            raise
+        except BaseException:
+            self.release(conn, discard=True)
+            raise
+        else:
+            conn.n_messages += 1
+            self.release(conn)
+
+    def prune(self):
+        "Close idle connections that have expired"
+        with self._cond:
+            expired = [conn for conn in self._idle if self._is_expired(conn)]
+            for conn in expired:
+                self._idle.remove(conn)
+            self._n_open -= len(expired)
+            self._cond.notify(len(expired))
+        for conn in expired:
+            self._quit(conn)
+
+    def close(self):
+        """Close the idle connections and the pool
+
+        Connections in use are closed when released."""
+        with self._cond:
+            self._is_closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._n_open -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            self._quit(conn)
+
+    def _forget(self):
+        with self._cond:
+            self._n_open -= 1
+            self._cond.notify()
+
+    def _is_expired(self, conn:PooledConnection) -> bool:
+        if self.idle_timeout is not None and conn.idle_time > self.idle_timeout:
+            return True
+        return False
+
+    def _is_healthy(self, conn:PooledConnection) -> bool:
+        if self.health_check is None or conn.idle_time < self.health_check:
+            return True
+        try:
+            code, _ = conn.server.noop()
+        except (smtplib.SMTPException, OSError):
+            return False
+        return code == 250
+
+    def _quit(self, conn:PooledConnection):
+        try:
+            conn.server.quit()
+        except (smtplib.SMTPException, OSError):
+            # Already disconnected
+            pass
+        if self.on_close is not None:
+            self.on_close(conn.server)
@@ -0,0 +1,105 @@
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from .utils import asyncio
+
+
+class TokenBucket:
+    """Thread-safe token bucket
+
+    Tokens are added at ``rate`` per second up to ``burst``.
+    Taking tokens reserves them immediately (the bucket may
+    go to debt) and returns how long the caller should wait
+    thus the waiting can be done either blocking or in
+    an event loop.
+
+    Parameters
+    ----------
+    rate : float
+        Tokens added per second.
+    burst : float, optional
+        Maximum number of tokens. Defaults to ``rate``
+        (but at least 1).
+    """
+
+    def __init__(self, rate:float, burst:Optional[float]=None):
+        self._lock = threading.Lock()
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1)
+        self.tokens = self.burst
+        self._updated = time.monotonic()
+
+    def reserve(self, n:float=1) -> float:
+        "Take tokens and get seconds to wait until they are available"
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self.tokens -= n
+            return max(0.0, -self.tokens / self.rate)
+
+
+class RateLimit:
+    """Client side limits for sending to an SMTP server
+
+    Parameters
+    ----------
+    messages_per_second : float, optional
+        Maximum rate of sent emails.
+    recipients_per_second : float, optional
+        Maximum rate of envelope recipients (To, Cc and Bcc).
+    burst : float, optional
+        Number of emails (and recipients) that can be sent
+        without waiting after a quiet period. Defaults to
+        one second's worth.
+    """
+
+    def __init__(self, messages_per_second:Optional[float]=None, recipients_per_second:Optional[float]=None, burst:Optional[float]=None):
+        self.configure(messages_per_second, recipients_per_second, burst)
+
+    def configure(self, messages_per_second:Optional[float]=None, recipients_per_second:Optional[float]=None, burst:Optional[float]=None):
+        "Set the limits"
+        self.messages = TokenBucket(messages_per_second, burst) if messages_per_second is not None else None
+        self.recipients = TokenBucket(recipients_per_second, burst) if recipients_per_second is not None else None
+        self._params = (messages_per_second, recipients_per_second, burst)
+
+    @classmethod
+    def shared(cls, host:str, username:Optional[str], messages_per_second:Optional[float]=None, 
+               recipients_per_second:Optional[float]=None, burst:Optional[float]=None) -> 'RateLimit':
+        """Get the limit shared by the senders of the same host and user
+
+        Created if missing and reconfigured if the limits differ."""
+        key = (host, username)
+        params = (messages_per_second, recipients_per_second, burst)
+        with _shared_lock:
+            limit = _shared.get(key)
+            if limit is None:
+                limit = _shared[key] = cls(*params)
+            elif limit._params != params:
+                limit.configure(*params)
+            return limit
+
+    def reserve(self, n_recipients:int=1) -> float:
+        "Reserve sending an email and get seconds to wait"
+        wait = 0.0
+        if self.messages is not None:
+            wait = max(wait, self.messages.reserve(1))
+        if self.recipients is not None:
+            wait = max(wait, self.recipients.reserve(n_recipients))
+        return wait
+
+    def wait(self, n_recipients:int=1):
+        "Block until an email to given number of recipients can be sent"
+        wait = self.reserve(n_recipients)
+        if wait:
+            time.sleep(wait)
+
+    async def wait_async(self, n_recipients:int=1):
+        "Wait (without blocking the event loop) until an email can be sent"
+        wait = self.reserve(n_recipients)
+        if wait:
+            await asyncio.sleep(wait)
+
+_shared: Dict[Tuple[str, Optional[str]], RateLimit] = {}
+_shared_lock = threading.Lock()
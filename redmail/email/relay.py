@@ -0,0 +1,216 @@
+from contextlib import contextmanager
+import smtplib
+import threading
+import time
+import weakref
+from typing import Any, Collection, Dict, Iterable, List, Optional, Union
+
+from .utils import is_disconnect
+
+
+class Relay:
+    """SMTP server in a :class:`RelayGroup`
+
+    Parameters
+    ----------
+    host : str
+        Address of the SMTP server.
+    port : int
+        Port of the SMTP server.
+    weight : float
+        Share of the load relative to the other
+        relays of the same priority.
+    priority : int
+        Relays with lower priority are used only if
+        none of the higher ones (smaller number) are
+        healthy, like with MX records.
+    username : str, optional
+        User name to log in. Defaults to the sender's.
+    password : str, optional
+        Password to log in. Defaults to the sender's.
+    """
+
+    def __init__(self, host:str, port:int, weight:float=1, priority:int=0,
+                 username:Optional[str]=None, password:Optional[str]=None):
+        if weight <= 0:
+            raise ValueError("Weight must be positive")
+        self.host = host
+        self.port = port
+        self.weight = weight
+        self.priority = priority
+        self.username = username
+        self.password = password
+
+        self.n_failures = 0
+        self.n_active = 0
+        self.n_connections = 0
+        self.opened_at = None
+        self.is_probing = False
+        self._current_weight = 0
+
+    @property
+    def is_open(self) -> bool:
+        "bool: Whether the circuit is open (the relay is ejected)"
+        return self.opened_at is not None
+
+    def __repr__(self):
+        return f"Relay(host={self.host!r}, port={self.port!r}, weight={self.weight!r}, priority={self.priority!r})"
+
+
+class RelayGroup:
+    """Set of SMTP servers with failover and load balancing
+
+    Connections are opened to the healthy relays of
+    the highest priority. A relay is ejected (its
+    circuit is opened) after ``failure_threshold``
+    consecutive failures and it is tried again after
+    ``recovery_timeout`` seconds with a single probe.
+    A successful probe brings the relay back.
+
+    Parameters
+    ----------
+    relays : iterable of Relay, iterable of dict
+        SMTP servers. Dicts are passed to :class:`Relay`.
+    strategy : {'round_robin', 'least_loaded'}
+        How to spread the connections: weighted round
+        robin or to the relay with fewest open
+        connections relative to its weight.
+    failure_threshold : int
+        Number of consecutive failures to eject a relay.
+    recovery_timeout : float
+        Seconds until an ejected relay is probed.
+
+    Examples
+    --------
+    .. code-block:: python
+
+        relays = RelayGroup([
+            {"host": "smtp1.example.com", "port": 587, "weight": 2},
+            {"host": "smtp2.example.com", "port": 587},
+            {"host": "backup.example.com", "port": 587, "priority": 1},
+        ])
+    """
+
+    strategies = ("round_robin", "least_loaded")
+
+    def __init__(self, relays:Iterable[Union[Relay, Dict[str, Any]]], strategy:str="round_robin",
+                 failure_threshold:int=3, recovery_timeout:float=30):
+        if strategy not in self.strategies:
+            raise ValueError(f"Invalid strategy: {strategy!r}. Options: {self.strategies}")
+        self.relays: List[Relay] = [
+            relay if isinstance(relay, Relay) else Relay(**relay)
+            for relay in relays
+        ]
+        if not self.relays:
+            raise ValueError("At least one relay is required")
+        self.strategy = strategy
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+
+        self._lock = threading.Lock()
+        self._connections = weakref.WeakKeyDictionary()
+
+    def choose(self, exclude:Collection[Relay]=()) -> Optional[Relay]:
+        "Pick a relay to connect to (None if none is available)"
+        with self._lock:
+            now = time.monotonic()
+            candidates = [
+                relay for relay in self.relays
+                if relay not in exclude and self._is_available(relay, now)
+            ]
+            if not candidates:
+                return None
+            priority = min(relay.priority for relay in candidates)
+            candidates = [relay for relay in candidates if relay.priority == priority]
+
+            # An ejected relay is probed when its time has come
+            probes = [relay for relay in candidates if relay.is_open]
+            if probes:
+                relay = probes[0]
+                relay.is_probing = True
+                return relay
+
+            if self.strategy == "least_loaded":
+                return min(candidates, key=lambda relay: relay.n_connections / relay.weight)
+            # Smooth weighted round robin
+            total = sum(relay.weight for relay in candidates)
+            for relay in candidates:
+                relay._current_weight += relay.weight
+            relay = max(candidates, key=lambda relay: relay._current_weight)
+            relay._current_weight -= total
+            return relay
+
+    def _is_available(self, relay:Relay, now:float) -> bool:
+        if not relay.is_open:
+            return True
+        return not relay.is_probing and now - relay.opened_at >= self.recovery_timeout
+
+    def record(self, relay:Relay, exc:Optional[BaseException]=None):
+        "Mark the outcome of using the relay"
+        if exc is not None and not isinstance(exc, Exception):
+            # Interrupted (ie. KeyboardInterrupt) thus no outcome
+            self.cancel_probe(relay)
+        elif exc is not None and is_disconnect(exc):
+            self.record_failure(relay)
+        else:
+            # The server responded thus it is up
+            self.record_success(relay)
+
+    @contextmanager
+    def sending(self, relay:Relay):
+        "Track a send in progress and its outcome"
+        with self._lock:
+            relay.n_active += 1
+        try:
+            yield
+        except BaseException as exc:
+            self.record(relay, exc)
+            raise
+        else:
+            self.record(relay)
+        finally:
+            with self._lock:
+                relay.n_active -= 1
+
+    def record_success(self, relay:Relay):
+        "Mark that the relay worked (closes its circuit)"
+        with self._lock:
+            relay.n_failures = 0
+            relay.opened_at = None
+            relay.is_probing = False
+
+    def record_failure(self, relay:Relay):
+        "Mark that the relay failed (may open its circuit)"
+        with self._lock:
+            relay.n_failures += 1
+            if relay.is_probing or relay.n_failures >= self.failure_threshold:
+                relay.opened_at = time.monotonic()
+            relay.is_probing = False
+
+    def cancel_probe(self, relay:Relay):
+        "Mark that using the relay was interrupted (it may be probed again)"
+        with self._lock:
+            relay.is_probing = False
+
+    def get_relay(self, server:smtplib.SMTP) -> Optional[Relay]:
+        "Get the relay of an open connection"
+        return self._connections.get(server)
+
+    def register(self, server:smtplib.SMTP, relay:Relay):
+        "Bind an open connection to its relay"
+        with self._lock:
+            if server not in self._connections:
+                relay.n_connections += 1
+            self._connections[server] = relay
+
+    def unregister(self, server:smtplib.SMTP):
+        "Unbind a closed connection from its relay"
+        with self._lock:
+            relay = self._connections.pop(server, None)
+            if relay is not None:
+                relay.n_connections -= 1
+
+    @property
+    def healthy(self) -> List[Relay]:
+        "list of Relay: Relays that are not ejected"
+        return [relay for relay in self.relays if not relay.is_open]
@@ -0,0 +1,55 @@
+from typing import Dict, List, Optional, Tuple
+
+class SendResult:
+    """Result of sending an email
+
+    Parameters
+    ----------
+    message_id : str, optional
+        Message-ID of the email. None if the
+        message could not be created.
+    recipients : list of str
+        Envelope recipients of the email.
+    refused : dict
+        Recipients refused by the server. The values
+        are tuples of the SMTP code and the response.
+    code : int, optional
+        SMTP code of the reply that failed the email.
+        None if the email was sent (the code of the
+        final reply is not exposed by smtplib) or if
+        the error was not an SMTP reply.
+    error : Exception, optional
+        Error raised when sending the email.
+    elapsed : float
+        Seconds spent on creating and sending the email.
+    """
+
+    def __init__(self, 
+                 message_id:Optional[str], 
+                 recipients:List[str], 
+                 refused:Optional[Dict[str, Tuple[int, bytes]]]=None, 
+                 code:Optional[int]=None, 
+                 error:Optional[Exception]=None, 
+                 elapsed:float=0.0):
+        self.message_id = message_id
+        self.recipients = recipients
+        self.refused = {} if refused is None else refused
+        self.code = code
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def ok(self) -> bool:
+        "bool: Whether the email was sent (to at least some of the recipients)"
+        return self.error is None
+
+    @property
+    def accepted(self) -> List[str]:
+        "list of str: Recipients accepted by the server"
+        if not self.ok:
+            return []
+        return [rcpt for rcpt in self.recipients if rcpt not in self.refused]
+
+    def __repr__(self):
+        status = "ok" if self.ok else type(self.error).__name__
+        return f"SendResult(message_id={self.message_id!r}, code={self.code!r}, status={status})"
@@ -0,0 +1,68 @@
+import random
+import smtplib
+import socket
+import time
+from typing import Callable, Collection, Tuple, Type
+
+from .utils import get_reply_codes
+
+
+class RetryPolicy:
+    """Policy for retrying failed sends
+
+    The connection is opened again (if it was dropped)
+    and the same message is resent after a delay that
+    grows exponentially.
+
+    Parameters
+    ----------
+    max_attempts : int
+        Maximum number of attempts (including the first).
+    delay : float
+        Seconds to wait before the first retry.
+    backoff_factor : float
+        Multiplier of the delay after each failed attempt.
+    max_delay : float
+        Maximum seconds to wait between the attempts.
+    jitter : float
+        Random variation of the delays as a fraction of
+        the delay (ie. 0.1 varies the delays by ±10%).
+    retry_codes : collection of int
+        SMTP reply codes that are retried.
+    retry_exceptions : tuple of exception types
+        Exceptions that are retried regardless of the code.
+
+    Examples
+    --------
+    .. code-block:: python
+
+        email.retry = RetryPolicy(max_attempts=5, delay=2)
+    """
+
+    def __init__(self, max_attempts:int=3, delay:float=1, backoff_factor:float=2, max_delay:float=60, jitter:float=0.1,
+                 retry_codes:Collection[int]=(421, 450, 451, 452),
+                 retry_exceptions:Tuple[Type[BaseException], ...]=(smtplib.SMTPServerDisconnected, ConnectionError, socket.timeout)):
+        self.max_attempts = max_attempts
+        self.delay = delay
+        self.backoff_factor = backoff_factor
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.retry_codes = retry_codes
+        self.retry_exceptions = retry_exceptions
+        self.sleep: Callable[[float], None] = time.sleep
+
+    def is_retryable(self, exc:BaseException) -> bool:
+        "Check whether the error is worth retrying"
+        if isinstance(exc, self.retry_exceptions):
+            return True
+        codes = get_reply_codes(exc)
+        return bool(codes) and all(code in self.retry_codes for code in codes)
+
+    def should_retry(self, exc:BaseException, attempt:int) -> bool:
+        "Check whether to retry after the given (1-based) attempt failed"
+        return attempt < self.max_attempts and self.is_retryable(exc)
+
+    def get_delay(self, attempt:int) -> float:
+        "Get seconds to wait after the given (1-based) attempt failed"
+        delay = min(self.delay * self.backoff_factor ** (attempt - 1), self.max_delay)
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
@@ -2,16 +2,27 @@
 from copy import copy
 import email.policy
 from email.message import EmailMessage
-from email.utils import make_msgid, formatdate
-from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Union
+from email.utils import formatdate
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, Optional, Union
+import time
 import warnings
 
 import jinja2
 from redmail.email.attachment import Attachments
 
-from redmail.email.body import HTMLBody, TextBody
+from redmail.email.body import HTMLBody, TextBody, TemplateCache
+from redmail.email.build import iter_built
+from redmail.email.dispatch import ParallelDispatcher
+from redmail.email.message import MessageTemplate
+from redmail.email.outbox import Outbox
+from redmail.email.pool import ConnectionPool
+from redmail.email.ratelimit import RateLimit
+from redmail.email.relay import Relay, RelayGroup
+from redmail.email.result import SendResult
+from redmail.email.streaming import SerializedMessage, get_envelope, has_file_parts, send_streaming
+from redmail.email.utils import IDGenerator, get_recipients, is_disconnect, pd
 from redmail.models import EmailAddress, Error
-from .envs import get_span, is_last_group_row
+from .envs import LazyContext, LazyParam, get_span, is_last_group_row, get_table_layout
 
 import smtplib
 
@@ -108,6 +119,16 @@ class EmailSender:
     templates_text_table : jinja2.Environment
         Jinja environment used for loading templates
         for table styling for text bodies.
+    table_engine : str
+        How tables are rendered to HTML bodies. Either
+        ``"jinja"`` (renders the theme template) or ``"native"``
+        (faster, same output for the themes extending ``custom.html``
+        such as ``modest.html`` and ``notebook-like.html``).
+        Defaults to ``"jinja"``.
+    template_cache : TemplateCache, None
+        Cache of compiled ``html`` and ``text`` bodies.
+        Shared by all senders by default. Set to None
+        to compile the bodies on every send.
     headers : dict
         Additional email headers. Will also override
         the other generated email headers such as
@@ -119,6 +140,36 @@ class EmailSender:
         Connection to the SMTP server. Created and closed
         before and after sending each email unless there 
         is an existing connection.
+    pool : ConnectionPool, None
+        Pool of connections to the SMTP server. If set,
+        emails sent outside the context manager use 
+        connections from the pool. See :meth:`set_pool`.
+    noop_interval : float, None
+        Seconds after which an idle connection is checked
+        with ``NOOP`` before it is used. A dropped connection 
+        is opened again. If None, not checked.
+    max_recipients : int, None
+        Maximum number of recipients in one SMTP transaction.
+        Emails with more recipients are sent in batches (see
+        :meth:`send_batches`). By default, not limited.
+    relays : RelayGroup, None
+        SMTP servers used instead of ``host`` and ``port``
+        with failover and load balancing. See :meth:`set_relays`.
+    rate_limit : RateLimit, None
+        Limits of the sending rate. See :meth:`set_rate_limit`.
+    retry : RetryPolicy, None
+        Policy for retrying the sends that failed due to
+        temporary errors (ie. ``421`` or dropped connection).
+        By default, not retried.
+    outbox : Outbox, None
+        Persistent queue of emails. If set, :meth:`send`
+        stores the emails to it and they are sent in
+        the background. See :meth:`set_outbox`.
+    id_generator : IDGenerator
+        Generator of the Message-IDs and Content-IDs. The
+        domain name is looked up only once by default. Set
+        ``id_generator.refresh_interval`` (seconds) to look it
+        up periodically.
 
     Examples
     --------
@@ -134,6 +185,7 @@ class EmailSender:
     
     default_html_theme = "modest.html"
     default_text_theme = "pandas.txt"
+    table_engine = "jinja"
 
     templates_html = jinja2.Environment(loader=jinja2.FileSystemLoader(str(Path(__file__).parent / "templates/html")))
     templates_html_table = jinja2.Environment(loader=jinja2.FileSystemLoader(str(Path(__file__).parent / "templates/html/table")))
@@ -141,6 +193,10 @@ class EmailSender:
     templates_text = jinja2.Environment(loader=jinja2.FileSystemLoader(str(Path(__file__).parent / "templates/text")))
     templates_text_table = jinja2.Environment(loader=jinja2.FileSystemLoader(str(Path(__file__).parent / "templates/text/table")))
 
+    # Parameters such as "now" and "error" are evaluated only if used
+    templates_html.context_class = LazyContext
+    templates_text.context_class = LazyContext
+
     # Set globals
     templates_html_table.globals["get_span"] = get_span
     templates_text_table.globals["get_span"] = get_span
@@ -148,6 +204,11 @@ class EmailSender:
     templates_html_table.globals["is_last_group_row"] = is_last_group_row
     templates_text_table.globals["is_last_group_row"] = is_last_group_row
 
+    templates_html_table.globals["get_table_layout"] = get_table_layout
+    templates_text_table.globals["get_table_layout"] = get_table_layout
+
+    template_cache = TemplateCache(maxsize=128)
+
     attachment_encoding = 'UTF-8'
 
     def __init__(self,
@@ -184,12 +245,22 @@ class EmailSender:
         self.text_template = None
         self.use_jinja = True
         self.domain = domain
+        self.id_generator = IDGenerator()
+        self._system_params = None
 
         self.use_starttls = use_starttls
         self.cls_smtp = cls_smtp
         self.kws_smtp = kwargs
         
         self.connection = None
+        self.pool = None
+        self.outbox = None
+        self.retry = None
+        self.rate_limit = None
+        self.max_recipients = None
+        self.relays = None
+        self.noop_interval = 30
+        self._last_activity = None
 
     def send(self,
              subject:Optional[str]=None,
@@ -315,7 +386,11 @@ class EmailSender:
             body_params=body_params,
             attachments=attachments,
         )
-        self.send_message(msg)
+        if self.outbox is not None:
+            # Sent in the background
+            self.outbox.put(msg)
+        else:
+            self.send_message(msg)
         return msg
         
     def get_message(self, 
@@ -369,7 +444,8 @@ class EmailSender:
                 template=self.get_text_template(text_template),
                 table_template=self.get_text_table_template(),
                 jinja_env=self.templates_text,
-                use_jinja=use_jinja
+                use_jinja=use_jinja,
+                template_cache=self.template_cache,
             )
             body.attach(
                 msg, 
@@ -384,7 +460,10 @@ class EmailSender:
                 table_template=self.get_html_table_template(),
                 jinja_env=self.templates_html,
                 use_jinja=use_jinja,
-                domain=self.domain
+                domain=self.domain,
+                id_generator=self.id_generator,
+                template_cache=self.template_cache,
+                table_engine=self.table_engine,
             )
             body.attach(
                 msg,
@@ -406,6 +485,33 @@ class EmailSender:
             att.attach(msg)
         return msg
 
+    def get_message_template(self, **kwargs) -> MessageTemplate:
+        """Create an email once to send it many times
+
+        Useful if the same email is sent repeatedly 
+        with only the recipients or the subject changing.
+        The bodies and attachments are not created nor
+        encoded again for each send.
+
+        Parameters
+        ----------
+        **kwargs : dict
+            Keyword arguments passed to :meth:`get_message`.
+
+        Examples
+        --------
+        .. code-block:: python
+
+            template = email.get_message_template(
+                subject="Disk almost full",
+                html="<h1>Disk almost full</h1>{{ usage }}",
+                body_tables={"usage": df},
+            )
+            template.send(receivers=["ops@example.com"])
+            template.send(receivers=["dev@example.com"], subject="FYI: Disk almost full")
+        """
+        return MessageTemplate(self, self.get_message(**kwargs))
+
     def get_receivers(self, receivers:Union[list, str, None]) -> Union[List[str], None]:
         """Get receivers of the email"""
         return receivers or self.receivers
@@ -427,7 +533,7 @@ class EmailSender:
         return sender or self.sender or self.username
 
     def create_message_id(self) -> str:
-        return make_msgid(domain=self.domain)
+        return self.id_generator(domain=self.domain)
 
     def _create_body(self, subject, sender, receivers=None, cc=None, bcc=None, headers=None) -> EmailMessage:
         # Python's default email policy follows the Internet mail standards (RFC 5322) EXCEPT for line endings.
@@ -478,14 +584,356 @@ class EmailSender:
 
     def send_message(self, msg:EmailMessage):
         "Send the created message"
-        if self.is_alive:
-            self.connection.send_message(msg)
+        # Within "with email:" the connection is reopened if needed
+        self._send_all(msg, keep_open=self.connection is not None)
+
+    def send_batches(self, msg:EmailMessage, batch_size:Optional[int]=None) -> List[SendResult]:
+        """Send a message to its recipients in batches
+
+        The message is flattened once (without Bcc) and
+        the same bytes are sent in separate SMTP transactions
+        each having at most ``batch_size`` recipients. 
+        A failing batch does not stop sending the rest.
+
+        Parameters
+        ----------
+        msg : EmailMessage
+            Email to send.
+        batch_size : int, optional
+            Maximum number of recipients per transaction.
+            Defaults to ``max_recipients``.
+
+        Returns
+        -------
+        list of SendResult
+            Result of each batch in the order of the 
+            recipients (To, Bcc and Cc).
+
+        Examples
+        --------
+        .. code-block:: python
+
+            msg = email.get_message(subject="Newsletter", bcc=subscribers, ...)
+            results = email.send_batches(msg, batch_size=100)
+            failed = [rcpt for res in results if not res.ok for rcpt in res.recipients]
+        """
+        batch_size = self.max_recipients if batch_size is None else batch_size
+        if batch_size is None or batch_size < 1:
+            raise ValueError("Batch size must be at least 1")
+        is_own_connection = self.connection is None and self.pool is None
+        try:
+            return list(self._iter_batches(msg, batch_size, keep_open=self.connection is not None or self.pool is None))
+        finally:
+            if is_own_connection:
+                self.close()
+
+    def _iter_batches(self, msg:Union[EmailMessage, SerializedMessage], batch_size:int, keep_open:bool) -> Iterator[SendResult]:
+        "Send the message in batches of recipients and yield the results"
+        if isinstance(msg, SerializedMessage):
+            content = msg
+            msg_id, to_addrs = msg.message_id, msg.to_addrs
         else:
-            # The connection was opened for this message
-            # thus it is also closed with this message
-            with self:
-                self.connection.send_message(msg)
+            content = SerializedMessage(msg) if SerializedMessage.can_serialize(msg) else msg
+            msg_id, (_, to_addrs) = msg['Message-ID'], get_envelope(msg)
+        for i in range(0, len(to_addrs), batch_size):
+            batch = to_addrs[i:i + batch_size]
+            start = time.perf_counter()
+            try:
+                refused = self._send_retrying(content, keep_open=keep_open, to_addrs=batch)
+            except Exception as exc:
+                yield _get_result(msg_id, batch, start, error=exc)
+            else:
+                yield _get_result(msg_id, batch, start, refused=refused)
+
+    def _send_all(self, msg:Union[EmailMessage, SerializedMessage], keep_open:bool) -> Dict[str, tuple]:
+        """Send the message to all of its recipients, in batches
+        if there are more than ``max_recipients``, and return the 
+        refused recipients"""
+        if self.max_recipients is None or len(_get_recipients(msg)) <= self.max_recipients:
+            return self._send_retrying(msg, keep_open=keep_open)
+        is_own_connection = not keep_open and self.pool is None
+        try:
+            results = list(self._iter_batches(msg, self.max_recipients, keep_open=keep_open or self.pool is None))
+        finally:
+            if is_own_connection:
+                self.close()
+        for result in results:
+            if not result.ok:
+                # Raised only after all of the batches were tried
+                raise result.error
+        return {rcpt: resp for result in results for rcpt, resp in result.refused.items()}
+
+    def _send_retrying(self, msg:Union[EmailMessage, SerializedMessage], keep_open:bool, 
+                       to_addrs:Optional[List[str]]=None) -> Dict[str, tuple]:
+        "Send the message retrying according to the retry policy"
+        content = msg
+        attempt = 1
+        if self.rate_limit is not None:
+            n_recipients = len(to_addrs if to_addrs is not None else _get_recipients(msg))
+        while True:
+            if self.rate_limit is not None:
+                self.rate_limit.wait(n_recipients)
+            try:
+                return self._send_once(content, keep_open=keep_open, to_addrs=to_addrs)
+            except Exception as exc:
+                if self.retry is None or not self.retry.should_retry(exc, attempt):
+                    raise
+            if isinstance(content, EmailMessage) and SerializedMessage.can_serialize(content):
+                # Resent as is without flattening again
+                content = SerializedMessage(msg)
+            self.retry.sleep(self.retry.get_delay(attempt))
+            attempt += 1
+
+    def _send_once(self, msg:Union[EmailMessage, SerializedMessage], keep_open:bool, 
+                   to_addrs:Optional[List[str]]=None) -> Dict[str, tuple]:
+        "Send the message once and return the refused recipients"
+        if keep_open or self.pool is None:
+            if not self.is_alive:
+                self.connect()
+            try:
+                refused = self._send_to(self.connection, msg, to_addrs=to_addrs)
+                self._last_activity = time.monotonic()
+                return refused
+            except Exception as exc:
+                if is_disconnect(exc) or getattr(self.connection, "sock", True) is None:
+                    # Stale connection is not reused
+                    self._discard_connection()
+                raise
+            finally:
+                if not keep_open:
+                    # The connection was opened for this message
+                    # thus it is also closed with this message
+                    self.close()
+        with self.pool.connection() as server:
+            return self._send_to(server, msg, to_addrs=to_addrs)
+
+    def _send_to(self, server:smtplib.SMTP, msg:Union[EmailMessage, SerializedMessage], 
+                 to_addrs:Optional[List[str]]=None) -> Dict[str, tuple]:
+        "Send the message over given connection and return the refused recipients"
+        relay = self.relays.get_relay(server) if self.relays is not None else None
+        if relay is not None:
+            with self.relays.sending(relay):
+                return self._transmit(server, msg, to_addrs=to_addrs)
+        return self._transmit(server, msg, to_addrs=to_addrs)
+
+    def _transmit(self, server:smtplib.SMTP, msg:Union[EmailMessage, SerializedMessage], 
+                  to_addrs:Optional[List[str]]=None) -> Dict[str, tuple]:
+        if isinstance(msg, SerializedMessage):
+            return msg.send(server, to_addrs=to_addrs)
+        if has_file_parts(msg):
+            # Attachment files are read and encoded while sending
+            return send_streaming(server, msg, to_addrs=to_addrs)
+        if to_addrs is not None:
+            return server.send_message(msg, to_addrs=to_addrs)
+        return server.send_message(msg)
     
+    def send_many(self, messages:Iterable[Union[EmailMessage, Dict[str, Any]]]) -> List[SendResult]:
+        """Send multiple emails
+
+        The emails are sent over the same connection 
+        (or over the pool if set). A failing email does 
+        not stop sending the rest of the emails.
+
+        Parameters
+        ----------
+        messages : iterable of EmailMessage, iterable of dict
+            Emails to send. If item is a dict, it is passed
+            as keyword arguments to :meth:`get_message`.
+            The iterable is consumed lazily. The items can
+            also be created by :meth:`build_many`.
+
+        Returns
+        -------
+        list of SendResult
+            Result of each email in the same order.
+
+        Examples
+        --------
+        .. code-block:: python
+
+            results = email.send_many(
+                {"subject": "Report", "receivers": [rcpt], "text": "Hi"}
+                for rcpt in ["you@example.com", "he@example.com"]
+            )
+            failed = [res for res in results if not res.ok]
+        """
+        is_own_connection = self.connection is None and self.pool is None
+        try:
+            return [self._send_item(item) for item in messages]
+        finally:
+            if is_own_connection:
+                self.close()
+
+    def send_merge(self, template:Dict[str, Any], recipients:Union[Iterable[Dict[str, Any]], 'pd.DataFrame'],
+                   n_connections:Optional[int]=None) -> List[SendResult]:
+        """Send a personalized email to each recipient (mail merge)
+
+        Parameters
+        ----------
+        template : dict
+            Keyword arguments of :meth:`get_message` shared by
+            all of the emails (ie. ``subject``, ``html``, 
+            ``attachments`` and ``body_images``).
+        recipients : iterable of dict, pd.DataFrame
+            Row for each email. The values are passed as Jinja
+            parameters to the bodies. Keys ``receivers``, ``cc``, 
+            ``bcc``, ``subject``, ``sender`` and ``headers``
+            override the ones in the template. Consumed lazily.
+        n_connections : int, optional
+            If given, the emails are sent in parallel over
+            this many connections (see :meth:`send_parallel`).
+
+        Returns
+        -------
+        list of SendResult
+            Result of each email in the same order.
+
+        Examples
+        --------
+        .. code-block:: python
+
+            results = email.send_merge(
+                {
+                    "subject": "Your invoice",
+                    "html": "<p>Hi {{ name }}, you owe {{ amount }} euros.</p>",
+                    "attachments": {"terms.pdf": Path("terms.pdf")},
+                },
+                [
+                    {"receivers": "you@example.com", "name": "You", "amount": 10},
+                    {"receivers": "they@example.com", "name": "They", "amount": 20},
+                ]
+            )
+        """
+        messages = self.get_merge_messages(template, recipients)
+        if n_connections is not None:
+            return self.send_parallel(messages, n_connections=n_connections)
+        return self.send_many(messages)
+
+    def get_merge_messages(self, template:Dict[str, Any], recipients:Union[Iterable[Dict[str, Any]], 'pd.DataFrame']) -> Iterator[EmailMessage]:
+        """Create a personalized email for each recipient
+
+        The attachments and the body images of the template
+        are created once and shared by the emails. The emails
+        are created lazily. See :meth:`send_merge` for the
+        parameters.
+        """
+        template = dict(template)
+        if template.get("attachments"):
+            template["attachments"] = Attachments(template["attachments"], encoding=self.attachment_encoding).get_parts()
+        if template.get("body_images"):
+            template["body_images"] = {
+                name: HTMLBody.load_image(img)
+                for name, img in template["body_images"].items()
+            }
+        body_params = template.pop("body_params", None) or {}
+
+        for row in _iter_rows(recipients):
+            fields = {key: row[key] for key in _MERGE_FIELDS if key in row}
+            yield self.get_message(
+                **{**template, **fields},
+                body_params={**body_params, **row},
+            )
+
+    def build_many(self, specs:Iterable[Dict[str, Any]], max_workers:Optional[int]=None,
+                   max_pending:Optional[int]=None) -> Iterator[Union[SerializedMessage, EmailMessage]]:
+        """Create emails in parallel processes
+
+        Useful if creating the emails is CPU heavy, ie.
+        they have large tables, plots or attachments. The
+        emails are flattened to bytes in the processes and
+        can be passed to :meth:`send_many` or :meth:`send_parallel`.
+
+        Parameters
+        ----------
+        specs : iterable of dict
+            Keyword arguments passed to :meth:`get_message`.
+            Must be picklable. Consumed lazily.
+        max_workers : int, optional
+            Number of processes. Defaults to the number of CPUs.
+        max_pending : int, optional
+            Maximum number of emails being created at a time.
+            Defaults to twice the number of processes.
+
+        Returns
+        -------
+        iterator of SerializedMessage, iterator of EmailMessage
+            Created emails in the same order.
+
+        Examples
+        --------
+        .. code-block:: python
+
+            specs = (
+                {"subject": "Report", "receivers": [rcpt], "body_tables": {"table": df}}
+                for rcpt, df in reports.items()
+            )
+            results = email.send_parallel(email.build_many(specs, max_workers=8))
+        """
+        return iter_built(self, specs, max_workers=max_workers, max_pending=max_pending)
+
+    def send_parallel(self, messages:Iterable[Union[EmailMessage, Dict[str, Any]]], n_connections:int=4, 
+                      max_in_flight:Optional[int]=None, max_errors:Optional[int]=None) -> List[SendResult]:
+        """Send multiple emails over multiple connections 
+        at the same time
+
+        Parameters
+        ----------
+        messages : iterable of EmailMessage, iterable of dict
+            Emails to send. If item is a dict, it is passed
+            as keyword arguments to :meth:`get_message`.
+            The iterable is consumed lazily. The items can
+            also be created by :meth:`build_many`.
+        n_connections : int
+            Number of connections (and threads) used for sending.
+        max_in_flight : int, optional
+            Maximum number of consumed emails waiting to be sent.
+            Defaults to twice the number of connections.
+        max_errors : int, optional
+            Stop sending after more emails have failed.
+
+        Returns
+        -------
+        list of SendResult
+            Result of each email in the same order.
+
+        Examples
+        --------
+        .. code-block:: python
+
+            results = email.send_parallel(
+                ({"subject": "Newsletter", "receivers": [rcpt], "text": "Hi"} for rcpt in subscribers),
+                n_connections=8,
+                max_errors=100,
+            )
+        """
+        dispatcher = ParallelDispatcher(self, n_connections=n_connections, max_in_flight=max_in_flight, max_errors=max_errors)
+        return dispatcher.send(messages)
+
+    def _send_item(self, item:Union[EmailMessage, SerializedMessage, Dict[str, Any]]) -> SendResult:
+        "Create and send a message capturing the outcome"
+        start = time.perf_counter()
+        msg_id = None
+        recipients = []
+        try:
+            msg = item if isinstance(item, (EmailMessage, SerializedMessage)) else self.get_message(**item)
+            msg_id = msg.message_id if isinstance(msg, SerializedMessage) else msg['Message-ID']
+            recipients = _get_recipients(msg)
+            # The connection is kept open until the end of send_many
+            refused = self._send_all(msg, keep_open=self.connection is not None or self.pool is None)
+        except Exception as exc:
+            return _get_result(msg_id, recipients, start, error=exc)
+        return _get_result(msg_id, recipients, start, refused=refused)
+
+    def _discard_connection(self):
+        "Drop a broken connection"
+        conn = self.connection
+        self.connection = None
+        try:
+            conn.close()
+        except (smtplib.SMTPException, OSError):
+            pass
+        self._forget_server(conn)
+
     def __enter__(self):
         self.connect()
 
@@ -495,46 +943,244 @@ class EmailSender:
     def connect(self):
         "Connect to the SMTP Server"
         self.connection = self.get_server()
+        self._last_activity = time.monotonic()
 
     def close(self):
         "Close (quit) the connection"
         if self.connection:
             self.connection.quit()
+            self._forget_server(self.connection)
             self.connection = None
 
+    def _forget_server(self, server:smtplib.SMTP):
+        "Unbind a closed connection from its relay"
+        if self.relays is not None:
+            self.relays.unregister(server)
+
     def get_server(self) -> smtplib.SMTP:
         "Connect and get the SMTP Server"
-        user = self.username
-        password = self.password
-        
-        server = self.cls_smtp(self.host, self.port, **self.kws_smtp)
-        if self.use_starttls:
-            server.starttls()
-
-        if user is not None or password is not None:
-            server.login(user, password)
+        if self.relays is not None:
+            return self._connect_relay()
+        return self._connect(self.host, self.port, self.username, self.password)
+
+    def _connect(self, host:str, port:int, user:Optional[str], password:Optional[str]) -> smtplib.SMTP:
+        server = self.cls_smtp(host, port, **self.kws_smtp)
+        try:
+            if self.use_starttls:
+                server.starttls()
+
+            if user is not None or password is not None:
+                server.login(user, password)
+        except BaseException:
+            server.close()
+            raise
         return server
 
+    def _connect_relay(self) -> smtplib.SMTP:
+        "Connect to a healthy relay failing over to the next ones"
+        tried = []
+        error = None
+        while True:
+            relay = self.relays.choose(exclude=tried)
+            if relay is None:
+                break
+            tried.append(relay)
+            user = self.username if relay.username is None else relay.username
+            password = self.password if relay.password is None else relay.password
+            try:
+                server = self._connect(relay.host, relay.port, user, password)
+            except Exception as exc:
+                # Also failed logins count as the relay is unusable
+                self.relays.record_failure(relay)
+                error = exc
+                continue
+            except BaseException:
+                self.relays.cancel_probe(relay)
+                raise
+            self.relays.record_success(relay)
+            self.relays.register(server, relay)
+            return server
+        if error is not None:
+            raise error
+        raise ConnectionError("No healthy SMTP relays available")
+
+    def set_relays(self, relays:Iterable[Union[Relay, Dict[str, Any]]], **kwargs) -> RelayGroup:
+        """Send via multiple SMTP servers
+
+        The connections are spread across the healthy
+        relays and the failing relays are ejected until 
+        they recover. If connecting to a relay fails, 
+        the next one is tried. ``host`` and ``port`` of
+        the sender are not used for connecting.
+
+        Parameters
+        ----------
+        relays : iterable of Relay, iterable of dict
+            SMTP servers. Dicts are passed to :class:`.Relay`
+            (``host``, ``port``, ``weight``, ``priority``,
+            ``username`` and ``password``).
+        **kwargs : dict
+            Keyword arguments passed to :class:`.RelayGroup`
+            (``strategy``, ``failure_threshold`` and 
+            ``recovery_timeout``).
+
+        Examples
+        --------
+        .. code-block:: python
+
+            email.set_relays([
+                {"host": "smtp1.example.com", "port": 587, "weight": 2},
+                {"host": "smtp2.example.com", "port": 587},
+                {"host": "backup.example.com", "port": 587, "priority": 1},
+            ], strategy="least_loaded")
+        """
+        self.relays = RelayGroup(relays, **kwargs)
+        return self.relays
+
+    def set_outbox(self, path:Union[str, Path], interval:float=10, **kwargs) -> Outbox:
+        """Store the emails on the disk before sending
+
+        The emails created by :meth:`send` are stored to an
+        SQLite database and sent in a background thread. 
+        Emails failing due to temporary errors (ie. the 
+        server is down) are retried with backoff. Unsent
+        emails are sent when the outbox is set again after
+        a restart. The thread uses the current settings
+        of the sender (ie. ``retry`` and ``pool``) but
+        not its connection.
+
+        Parameters
+        ----------
+        path : path-like
+            Path to the SQLite database.
+        interval : float
+            Seconds between checking the due retries.
+        **kwargs : dict
+            Keyword arguments passed to :class:`.Outbox`
+            (``retry``).
+
+        Examples
+        --------
+        .. code-block:: python
+
+            email.set_outbox("outbox.db")
+            email.send(...)  # Stored and sent in the background
+        """
+        if self.outbox is not None:
+            self.outbox.close()
+        self.outbox = Outbox(path, **kwargs)
+        self.outbox.start(self, interval=interval)
+        return self.outbox
+
+    def set_rate_limit(self, messages_per_second:Optional[float]=None, recipients_per_second:Optional[float]=None,
+                       burst:Optional[float]=None) -> RateLimit:
+        """Limit the rate of sending
+
+        The limit is shared by all senders (including
+        :class:`.AsyncEmailSender`) with the same host and 
+        username thus they together stay under the quota
+        of the SMTP server.
+
+        Parameters
+        ----------
+        messages_per_second : float, optional
+            Maximum number of emails per second.
+        recipients_per_second : float, optional
+            Maximum number of recipients (To, Cc and Bcc) 
+            per second.
+        burst : float, optional
+            Number of emails (and recipients) that can be 
+            sent without waiting after a quiet period.
+
+        Examples
+        --------
+        .. code-block:: python
+
+            email.set_rate_limit(messages_per_second=5, recipients_per_second=20)
+        """
+        self.rate_limit = RateLimit.shared(
+            self.host, self.username,
+            messages_per_second=messages_per_second,
+            recipients_per_second=recipients_per_second,
+            burst=burst,
+        )
+        return self.rate_limit
+
+    def set_pool(self, max_size:int=10, **kwargs) -> ConnectionPool:
+        """Send emails using a pool of connections
+
+        The connections are opened when needed and
+        reused across sends. Sending is thread-safe
+        when the pool is used.
+
+        Parameters
+        ----------
+        max_size : int
+            Maximum number of open connections.
+        **kwargs : dict
+            Keyword arguments passed to :class:`.ConnectionPool`
+            (``idle_timeout``, ``max_messages``, ``health_check``
+            and ``timeout``).
+
+        Examples
+        --------
+        .. code-block:: python
+
+            email.set_pool(max_size=4, idle_timeout=60)
+            email.send(...)  # Opens a connection to the pool
+            email.send(...)  # Reuses the connection
+            email.pool.close()
+        """
+        if self.pool is not None:
+            self.pool.close()
+        self.pool = ConnectionPool(self.get_server, max_size=max_size, on_close=self._forget_server, **kwargs)
+        return self.pool
+
     @property
     def is_alive(self):
-        "bool: Check if there is a connection to the SMTP server"
-        return self.connection is not None
+        """bool: Check if there is a working connection to the SMTP server
+
+        If the connection has been idle longer than ``noop_interval``
+        seconds, it is probed with ``NOOP`` and dropped if the 
+        server does not respond."""
+        if self.connection is None:
+            return False
+        idle = time.monotonic() - (self._last_activity or 0)
+        if self.noop_interval is not None and idle > self.noop_interval:
+            try:
+                code, _ = self.connection.noop()
+            except (smtplib.SMTPException, OSError):
+                code = None
+            if code != 250:
+                self._discard_connection()
+                return False
+            self._last_activity = time.monotonic()
+        return True
 
     def get_params(self, sender:str) -> Dict[str, Any]:
-        "Get Jinja parametes passed to both text and html bodies"
+        """Get Jinja parametes passed to both text and html bodies
+
+        Values that are not constant are wrapped in 
+        :class:`.envs.LazyParam` and evaluated only
+        if the template uses them."""
         # TODO: Add receivers to params
+        if self._system_params is None:
+            # These do not change during the lifetime of the sender
+            self._system_params = {
+                "node": node(),
+                "user": getuser(),
+            }
         return {
-            "node": node(),
-            "user": getuser(),
-            "now": datetime.datetime.now(),
-            "sender": EmailAddress(sender),
+            **self._system_params,
+            "now": LazyParam(datetime.datetime.now),
+            "sender": LazyParam(EmailAddress, sender),
         }
 
     def get_html_params(self, extra:Optional[dict]=None, **kwargs) -> Dict[str, Any]:
         "Get Jinja parameters passed to HTML body"
         params = self.get_params(**kwargs)
         params.update({
-            "error": Error(content_type='html-inline')
+            "error": LazyParam(Error, content_type='html-inline')
         })
         if extra:
             params.update(extra)
@@ -544,7 +1190,7 @@ class EmailSender:
         "Get Jinja parameters passed to text body"
         params = self.get_params(**kwargs)
         params.update({
-            "error": Error(content_type='text')
+            "error": LazyParam(Error, content_type='text')
         })
         if extra:
             params.update(extra)
@@ -615,3 +1261,34 @@ class EmailSender:
     def user_name(self, user):
         warnings.warn("Attribute user_name was renamed as username. Please use username instead.", FutureWarning)
         self.username = user
+
+_MERGE_FIELDS = ("receivers", "cc", "bcc", "subject", "sender", "headers")
+
+def _iter_rows(rows:Union[Iterable[Dict[str, Any]], 'pd.DataFrame']) -> Iterator[Dict[str, Any]]:
+    "Iterate rows as dicts (DataFrames without copying them to dicts first)"
+    if pd.owns(rows) and isinstance(rows, pd.DataFrame):
+        columns = list(rows.columns)
+        for values in rows.itertuples(index=False, name=None):
+            yield dict(zip(columns, values))
+    else:
+        yield from rows
+
+def _get_recipients(msg:Union[EmailMessage, SerializedMessage]) -> List[str]:
+    return msg.to_addrs if isinstance(msg, SerializedMessage) else get_recipients(msg)
+
+def _get_result(msg_id:Optional[str], recipients:List[str], start:float, 
+                refused:Optional[Dict[str, tuple]]=None, error:Optional[Exception]=None) -> SendResult:
+    "Create the result of a send that started at given time"
+    if error is not None:
+        return SendResult(
+            msg_id, recipients,
+            refused=getattr(error, "recipients", None),
+            code=getattr(error, "smtp_code", None),
+            error=error,
+            elapsed=time.perf_counter() - start,
+        )
+    return SendResult(
+        msg_id, recipients,
+        refused=refused,
+        elapsed=time.perf_counter() - start,
+    )
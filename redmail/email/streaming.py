@@ -0,0 +1,190 @@
+import copy
+import re
+from email.generator import BytesGenerator
+from email.message import EmailMessage
+from email.utils import getaddresses
+from io import BytesIO
+from smtplib import SMTP, SMTPDataError, SMTPRecipientsRefused, SMTPSenderRefused, SMTPServerDisconnected
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .attachment import FileAttachment
+
+_MARKER = "\0redmail-file:{}\0"
+_MARKER_PATTERN = re.compile(b"\0redmail-file:([0-9]+)\0")
+
+
+class _MarkerGenerator(BytesGenerator):
+    "Generator that writes a marker in place of the file attachments"
+
+    def _dispatch(self, msg):
+        if isinstance(msg, FileAttachment):
+            self.write(_MARKER.format(id(msg)))
+        else:
+            super()._dispatch(msg)
+
+
+def has_file_parts(msg:EmailMessage) -> bool:
+    "Check whether the message has attachments read lazily from files"
+    return any(isinstance(part, FileAttachment) for part in msg.walk())
+
+
+def iter_message_bytes(msg:EmailMessage, linesep:str="\r\n") -> Iterator[bytes]:
+    """Iterate the flattened message in chunks
+
+    The result is the same as flattening the message with
+    ``email.generator.BytesGenerator`` but the file
+    attachments are read and encoded a chunk at a time.
+    """
+    parts = {
+        id(part): part
+        for part in msg.walk()
+        if isinstance(part, FileAttachment)
+    }
+    buffer = BytesIO()
+    _MarkerGenerator(buffer).flatten(msg, linesep=linesep)
+    pieces = _MARKER_PATTERN.split(buffer.getvalue())
+    for i, piece in enumerate(pieces):
+        if i % 2 == 0:
+            if piece:
+                yield piece
+        else:
+            yield from parts[int(piece)].iter_encoded(linesep)
+
+
+class SerializedMessage:
+    """Message flattened once to bytes for resending
+
+    Flattened the same way as ``smtplib.SMTP.send_message``
+    (without Bcc). Use :meth:`can_serialize` to check whether 
+    the message can be sent this way. The object can be 
+    pickled (ie. from a worker process).
+    """
+
+    def __init__(self, msg:EmailMessage):
+        self.message_id = msg['Message-ID']
+        self.from_addr, self.to_addrs = get_envelope(msg)
+        msg_copy = copy.copy(msg)
+        del msg_copy['Bcc']
+        del msg_copy['Resent-Bcc']
+        buffer = BytesIO()
+        BytesGenerator(buffer).flatten(msg_copy, linesep="\r\n")
+        self.data = buffer.getvalue()
+
+    @classmethod
+    def from_data(cls, data:bytes, from_addr:str, to_addrs:List[str], message_id:Optional[str]=None) -> 'SerializedMessage':
+        "Create from already flattened message"
+        obj = cls.__new__(cls)
+        obj.message_id = message_id
+        obj.from_addr = from_addr
+        obj.to_addrs = to_addrs
+        obj.data = data
+        return obj
+
+    @staticmethod
+    def can_serialize(msg:EmailMessage) -> bool:
+        "Check the message has no streamed files and needs no SMTPUTF8"
+        if has_file_parts(msg):
+            return False
+        from_addr, to_addrs = get_envelope(msg)
+        return is_ascii_envelope(from_addr, to_addrs)
+
+    def send(self, server:SMTP, to_addrs:Optional[List[str]]=None) -> Dict[str, Tuple[int, bytes]]:
+        "Send the message (to given recipients) and return the refused recipients"
+        to_addrs = self.to_addrs if to_addrs is None else to_addrs
+        return server.sendmail(self.from_addr, to_addrs, self.data)
+
+
+def get_envelope(msg:EmailMessage) -> Tuple[str, List[str]]:
+    "Get sender and recipients the same way as smtplib.SMTP.send_message"
+    resent = msg.get_all('Resent-Date')
+    if resent is None:
+        prefix = ''
+    elif len(resent) == 1:
+        prefix = 'Resent-'
+    else:
+        raise ValueError("message has more than one 'Resent-' header block")
+    sender = msg[prefix + 'Sender'] if prefix + 'Sender' in msg else msg[prefix + 'From']
+    from_addr = getaddresses([sender])[0][1]
+    fields = (msg[prefix + field] for field in ('To', 'Bcc', 'Cc'))
+    to_addrs = [addr for _, addr in getaddresses([f for f in fields if f is not None])]
+    return from_addr, to_addrs
+
+
+def is_ascii_envelope(from_addr:str, to_addrs:List[str]) -> bool:
+    "Check whether the addresses can be sent without SMTPUTF8"
+    # str.isascii requires Python 3.7
+    return all(ord(char) < 128 for addr in [from_addr, *to_addrs] for char in addr)
+
+
+def send_streaming(server:SMTP, msg:EmailMessage,
+                   from_addr:Optional[str]=None, to_addrs:Optional[List[str]]=None) -> Dict[str, Tuple[int, bytes]]:
+    """Send a message over an SMTP connection without
+    flattening it to memory first
+
+    Behaves like ``smtplib.SMTP.send_message``: returns
+    the refused recipients and raises the same exceptions.
+    """
+    default_from, default_to = get_envelope(msg)
+    from_addr = from_addr if from_addr is not None else default_from
+    to_addrs = to_addrs if to_addrs is not None else default_to
+    if not is_ascii_envelope(from_addr, to_addrs):
+        # Requires SMTPUTF8, let smtplib handle it
+        return server.send_message(msg, from_addr, to_addrs)
+
+    msg_copy = copy.copy(msg)
+    del msg_copy['Bcc']
+    del msg_copy['Resent-Bcc']
+
+    server.ehlo_or_helo_if_needed()
+    code, resp = server.mail(from_addr)
+    if code != 250:
+        _abort(server, code)
+        raise SMTPSenderRefused(code, resp, from_addr)
+
+    refused = {}
+    for addr in to_addrs:
+        code, resp = server.rcpt(addr)
+        if code not in (250, 251):
+            refused[addr] = (code, resp)
+        if code == 421:
+            server.close()
+            raise SMTPRecipientsRefused(refused)
+    if len(refused) == len(to_addrs):
+        _rset(server)
+        raise SMTPRecipientsRefused(refused)
+
+    server.putcmd("data")
+    code, resp = server.getreply()
+    if code != 354:
+        raise SMTPDataError(code, resp)
+
+    at_line_start = True
+    tail = b""
+    for chunk in iter_message_bytes(msg_copy):
+        # Escape lines starting with a period (RFC 5321, 4.5.2)
+        if at_line_start and chunk.startswith(b"."):
+            chunk = b"." + chunk
+        chunk = chunk.replace(b"\n.", b"\n..")
+        server.send(chunk)
+        at_line_start = chunk.endswith(b"\n")
+        tail = (tail + chunk)[-2:]
+    server.send(b".\r\n" if tail == b"\r\n" else b"\r\n.\r\n")
+
+    code, resp = server.getreply()
+    if code != 250:
+        _abort(server, code)
+        raise SMTPDataError(code, resp)
+    return refused
+
+
+def _abort(server:SMTP, code:int):
+    if code == 421:
+        server.close()
+    else:
+        _rset(server)
+
+def _rset(server:SMTP):
+    try:
+        server.rset()
+    except SMTPServerDisconnected:
+        pass
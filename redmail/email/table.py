@@ -0,0 +1,172 @@
+from typing import TYPE_CHECKING, Dict, List
+
+from jinja2 import Template
+
+from .envs import get_table_layout
+from .utils import pd, np
+
+if TYPE_CHECKING:
+    # For type hinting
+    from pandas import DataFrame
+
+class NativeTableRenderer:
+    """Renders dataframes to HTML tables without Jinja
+
+    Produces the same output as the table themes extending
+    ``custom.html`` (ie. ``modest.html`` and ``notebook-like.html``)
+    but formats the values column-wise instead of
+    rendering the template cell by cell. The styles
+    are read from the theme template.
+    """
+
+    def __init__(self):
+        self._themes = {}
+
+    def render(self, df:'DataFrame', template:Template) -> str:
+        "Render a dataframe to HTML using the styles of the theme template"
+        theme = self.get_theme(template)
+        return theme["prefix"] + "".join(self._iter_table(df, theme))
+
+    def get_theme(self, template:Template) -> Dict[str, str]:
+        "Get the styles (and the leading whitespace) of a theme template"
+        theme = self._themes.get(template)
+        if theme is None:
+            # Rendering an empty frame exports the variables set in the theme
+            module = template.make_module({"df": pd.DataFrame()})
+            theme = {
+                name: getattr(module, name, '')
+                for name in self._style_names
+            }
+            output = str(module)
+            theme["prefix"] = output[:output.index("<table")]
+            self._themes[template] = theme
+        return theme
+
+    _style_names = (
+        "style_table", "style_thead", "style_tbody",
+        "style_column_name", "style_column_value", "style_column_value_last_column_group",
+        "style_index_name", "style_index_name_last",
+        "style_index_value", "style_index_value_last", "style_index_value_last_index_group",
+        "style_value", "style_value_last_index_group", "style_value_last_column_group",
+        "style_row_odd", "style_row_even", "style_row_value_odd", "style_row_value_even",
+    )
+
+    def _iter_table(self, df:'DataFrame', theme:Dict[str, str]):
+        # NOTE: the whitespace follows the output of custom.html exactly
+        layout = get_table_layout(df)
+        yield f'<table style="border-collapse: collapse; {theme["style_table"]}">\n    <thead style="{theme["style_thead"]}">'
+
+        # Column levels
+        n_indexes = len(df.index.names)
+        for n_level in range(df.columns.nlevels):
+            level = df.columns.get_level_values(n_level)
+            name = level.name if level.name is not None else ''
+            yield "\n            <tr>\n                " + "<th></th>\n                " * (n_indexes - 1)
+            yield f'<th style="{theme["style_column_name"]}">{name}</th>\n                '
+            spans = layout.column_spans[n_level]
+            last_groups = layout.column_last_group[n_level]
+            for header, span, is_last_group in zip(level, spans, last_groups):
+                if span > 0:
+                    group_style = theme["style_column_value_last_column_group"] if is_last_group else ''
+                    yield (
+                        f'\n                        <th style="{theme["style_column_value"]}'
+                        f'\n                                   {group_style}" colspan="{span}">{header}</th>'
+                    )
+            yield "\n                \n            </tr>\n        "
+
+        # Index names
+        yield "\n        <tr>\n            "
+        for i, name in enumerate(df.index.names, start=1):
+            last_style = theme["style_index_name_last"] if i == n_indexes else ''
+            name = name if name is not None else ''
+            yield f'<th style="{theme["style_index_name"]}{last_style}">{name}</th>\n            '
+        for is_last_group in layout.column_last_column:
+            group_style = theme["style_column_value_last_column_group"] if is_last_group else ''
+            yield f'<th style="{theme["style_index_name"]}\n                           {group_style}"></th>\n            '
+        yield f'\n        </tr>\n    </thead>\n\n   <tbody style="{theme["style_tbody"]}">'
+
+        # Rows
+        yield from self._iter_rows(df, layout, theme)
+        yield "\n    </tbody>\n</table>"
+
+    def _iter_rows(self, df:'DataFrame', layout, theme:Dict[str, str]):
+        n_rows = len(df.index)
+        row_styles = (theme["style_row_odd"], theme["style_row_even"])
+        row_value_styles = (theme["style_row_value_odd"], theme["style_row_value_even"])
+
+        columns = self._format_columns(df)
+
+        # Opening tags of the cells only depend on the row parity,
+        # on the index group and on the column group
+        col_styles = [
+            theme["style_value_last_column_group"] if is_last_group else ''
+            for is_last_group in layout.column_last_column
+        ]
+        cell_opens = {
+            (parity, is_last_group): [
+                f'<td style="{theme["style_value"]}'
+                f'\n                               {row_value_styles[parity]}'
+                f'\n                               {theme["style_value_last_index_group"] if is_last_group else ""}'
+                f'\n                               {col_style}">'
+                for col_style in col_styles
+            ]
+            for parity in (0, 1)
+            for is_last_group in (False, True)
+        }
+
+        index_headers = self._format_index(df, layout, theme, row_value_styles)
+        rows = zip(*columns) if columns else ((),) * n_rows
+        for n_row, (index_header, row) in enumerate(zip(index_headers, rows)):
+            parity = n_row % 2
+            opens = cell_opens[(parity, layout.index_last_row[n_row])]
+            cells = "".join([
+                f"{cell_open}{value}</td>\n                "
+                for cell_open, value in zip(opens, row)
+            ])
+            yield (
+                f'<tr style="{row_styles[parity]}">\n                {index_header}'
+                f'{cells}\n            </tr>\n        '
+            )
+
+    def _format_columns(self, df:'DataFrame') -> List[List[str]]:
+        "Format the values column by column (same conversions as iterating df.iterrows())"
+        values = df.values
+        columns = [
+            [str(value) for value in pd.Series(values[:, i], dtype=values.dtype)]
+            for i in range(values.shape[1])
+        ]
+        if values.dtype == object:
+            # Pandas infers the dtype of each row of mixed frames in iterrows
+            # thus missing values and date-likes depend on the rest of the row
+            plain_types = (str, int, float, bool, np.number, np.bool_)
+            for n_row, row in enumerate(values):
+                if all(isinstance(value, plain_types) for value in row):
+                    continue
+                for column, value in zip(columns, pd.Series(row)):
+                    column[n_row] = str(value)
+        return columns
+
+    def _format_index(self, df:'DataFrame', layout, theme:Dict[str, str], row_value_styles) -> List[str]:
+        "Format the index cells of each row"
+        n_levels = df.index.nlevels
+        index = list(df.index)
+        if n_levels == 1:
+            index = [[idx] for idx in index]
+
+        headers = []
+        for n_row, idx in enumerate(index):
+            cells = []
+            for n_level, value in enumerate(idx):
+                span = layout.index_spans[n_level][n_row]
+                if span > 0:
+                    last_style = theme["style_index_value_last"] if n_level == n_levels - 1 else ''
+                    group_style = theme["style_index_value_last_index_group"] if layout.index_last_group[n_level][n_row] else ''
+                    cells.append(
+                        f'\n                        <th style="{theme["style_index_value"]}'
+                        f'\n                                {last_style}'
+                        f'\n                                {row_value_styles[n_row % 2]}'
+                        f'\n                                {group_style}" '
+                        f'\n                                rowspan="{span}">{value}</th>'
+                    )
+            headers.append("".join(cells))
+        return headers
@@ -1,14 +1,132 @@
-
-from typing import TYPE_CHECKING
-from redmail.utils import import_from_string
+import itertools
+import os
+import random
+import smtplib
+import socket
+import threading
+import time
+from email.message import EmailMessage
+from email.utils import getaddresses
+from typing import TYPE_CHECKING, List, Optional
+from redmail.utils import LazyModule
 
 if TYPE_CHECKING:
     import matplotlib.pyplot as plt_lib
     import PIL as PIL_lib
     import pandas as pandas_lib
+    import numpy as numpy_lib
     import css_inline as css_inline_lib
+    import aiosmtplib as aiosmtplib_lib
+    import asyncio as asyncio_lib
+    import sqlite3 as sqlite3_lib
+    import concurrent.futures as futures_lib
+
+# These are imported on first use (and are falsy if missing)
+plt: 'plt_lib' = LazyModule("matplotlib.pyplot")
+PIL: 'PIL_lib' = LazyModule("PIL")
+pd: 'pandas_lib' = LazyModule("pandas")
+np: 'numpy_lib' = LazyModule("numpy")
+css_inline: 'css_inline_lib' = LazyModule("css_inline")
+aiosmtplib: 'aiosmtplib_lib' = LazyModule("aiosmtplib")
+
+# Standard library modules used only by some features
+# (asyncio sender, outbox and building in processes)
+asyncio: 'asyncio_lib' = LazyModule("asyncio")
+sqlite3: 'sqlite3_lib' = LazyModule("sqlite3")
+futures: 'futures_lib' = LazyModule("concurrent.futures")
+
+def get_recipients(msg:EmailMessage) -> List[str]:
+    "Get the envelope recipients (To, Cc and Bcc) of a message"
+    fields = msg.get_all('To', []) + msg.get_all('Cc', []) + msg.get_all('Bcc', [])
+    return [addr for _, addr in getaddresses(fields)]
+
+def get_reply_codes(exc:BaseException) -> List[int]:
+    "Get the SMTP reply codes of an error (empty if the error is not a reply)"
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return [code for code, _ in exc.recipients.values()]
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return [exc.smtp_code]
+    return []
+
+def is_disconnect(exc:BaseException) -> bool:
+    """Check whether the error means the connection is no longer usable
+
+    Connection problems and ``421`` (service not available, 
+    smtplib closes the connection) tell that the server 
+    is down instead of a problem with the email. Other 
+    SMTP replies do not."""
+    if isinstance(exc, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(exc, smtplib.SMTPException):
+        # NOTE: SMTPException is a subclass of OSError
+        return 421 in get_reply_codes(exc)
+    return isinstance(exc, OSError)
+
+class IDGenerator:
+    """Generator of unique IDs for Message-ID and Content-ID headers
+
+    Drop-in replacement for ``email.utils.make_msgid``. The fully
+    qualified domain name is looked up once (and again after
+    ``refresh_interval`` seconds if set) instead of on every ID
+    and the IDs are made unique with a per process random token
+    and a counter instead of new random numbers.
+
+    Parameters
+    ----------
+    refresh_interval : float, optional
+        Seconds after which the domain name is looked up again.
+        By default, looked up only once.
+    """
+
+    def __init__(self, refresh_interval:Optional[float]=None):
+        self.refresh_interval = refresh_interval
+        self._fqdn = None
+        self._resolved = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Locks cannot be pickled (ie. to worker processes)
+        return {"refresh_interval": self.refresh_interval, "_fqdn": self._fqdn, "_resolved": self._resolved}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def fqdn(self) -> str:
+        "Cached fully qualified domain name of the host"
+        resolved = self._resolved
+        is_expired = (
+            resolved is not None 
+            and self.refresh_interval is not None 
+            and time.monotonic() - resolved > self.refresh_interval
+        )
+        if resolved is None or is_expired:
+            with self._lock:
+                if self._resolved is resolved:
+                    self._fqdn = socket.getfqdn()
+                    self._resolved = time.monotonic()
+        return self._fqdn
+
+    def __call__(self, idstring:Optional[str]=None, domain:Optional[str]=None) -> str:
+        "Create an ID in the form <timestamp.pid.token.counter[.idstring]@domain>"
+        if domain is None:
+            domain = self.fqdn
+        idstring = '' if idstring is None else '.' + idstring
+        return f"<{int(time.time() * 100)}.{_process_id.pid}.{_process_id.token}.{next(_process_id.counter)}{idstring}@{domain}>"
+
+
+class _ProcessID:
+    "Process specific part of the generated IDs (reset in forked processes)"
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.pid = os.getpid()
+        self.token = random.SystemRandom().randrange(10**12, 10**13)
+        self.counter = itertools.count()
 
-plt: 'plt_lib' = import_from_string("matplotlib.pyplot", if_missing="ignore")
-PIL: 'PIL_lib' = import_from_string("PIL", if_missing="ignore")
-pd: 'pandas_lib' = import_from_string("pandas", if_missing="ignore")
-css_inline: 'css_inline_lib' = import_from_string("css_inline", if_missing="ignore")
\ No newline at end of file
+_process_id = _ProcessID()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_process_id.reset)
@@ -1,16 +1,301 @@
 
+import atexit
+from collections import deque
 import logging
 from logging import Handler, LogRecord
 from logging.handlers import SMTPHandler, BufferingHandler
+import queue
 from textwrap import dedent
-from typing import List, Optional
+import threading
+import time
+import traceback
+from typing import Any, Dict, List, Optional, Tuple, Union
 import warnings
+import weakref
 
 from redmail.email.sender import EmailSender
 
+class EmailDispatcher:
+    """Background thread sending the emails of a log handler
+
+    The emails are put to a bounded queue and sent by a 
+    worker thread over a persistent connection. The 
+    connection is closed when the queue has been empty
+    for ``idle_timeout`` seconds.
+
+    Parameters
+    ----------
+    handler : EmailHandler, MultiEmailHandler
+        Handler whose emails are sent.
+    queue_size : int
+        Maximum number of emails waiting to be sent.
+    overflow : {'drop_oldest', 'drop_newest', 'block'}
+        What to do when the queue is full: discard the
+        oldest queued email, discard the new email or
+        wait for space in the queue.
+    idle_timeout : float
+        Seconds to keep the connection open without
+        emails to send.
+    exit_timeout : float, optional
+        Seconds to wait for the queued emails to be
+        sent at interpreter exit. If None, waits until
+        all are sent.
+    """
+
+    overflow_policies = ("drop_oldest", "drop_newest", "block")
+
+    _stop = object()
+
+    def __init__(self, handler:'_EmailHandlerMixin', queue_size:int=1000, overflow:str="drop_oldest", idle_timeout:float=30,
+                 exit_timeout:Optional[float]=10):
+        if overflow not in self.overflow_policies:
+            raise ValueError(f"Invalid overflow {overflow!r}. Options: {self.overflow_policies}")
+        self.handler = handler
+        self.queue = queue.Queue(queue_size)
+        self.overflow = overflow
+        self.idle_timeout = idle_timeout
+        self.exit_timeout = exit_timeout
+        self.n_dropped = 0
+
+        self._thread = None
+        self._is_sending = False
+        self._lock = threading.Lock()
+
+    def put(self, records:Union[LogRecord, List[LogRecord]], kwargs:Dict[str, Any]):
+        "Queue an email to be sent"
+        self._ensure_running()
+        item = (records, kwargs)
+        if self.overflow == "block":
+            self.queue.put(item)
+            return
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                return
+            except queue.Full:
+                if self.overflow == "drop_newest":
+                    self.n_dropped += 1
+                    return
+            # Drop the oldest and try again
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                continue
+            self.queue.task_done()
+            self.n_dropped += 1
+
+    def join(self):
+        "Wait until the queued emails are sent"
+        self.queue.join()
+
+    def close(self, timeout:Optional[float]=None):
+        """Send the queued emails and stop the worker
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Seconds to wait for the emails to be sent. The
+            emails not sent in time are reported with a
+            warning. If None, waits until all are sent.
+        """
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            deadline = None if timeout is None else time.monotonic() + timeout
+            try:
+                self.queue.put(self._stop, timeout=timeout)
+                is_stopping = True
+            except queue.Full:
+                is_stopping = False
+            thread.join(None if deadline is None else max(deadline - time.monotonic(), 0))
+            if thread.is_alive():
+                n_unsent = self.queue.qsize() - is_stopping + self._is_sending
+                warnings.warn(f"{n_unsent} log emails were not sent in {timeout} seconds", RuntimeWarning)
+        _dispatchers.discard(self)
+
+    def _ensure_running(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    # Started lazily, also after a fork
+                    self._thread = threading.Thread(
+                        target=self._run, 
+                        name=f"redmail-{type(self.handler).__name__}", 
+                        daemon=True,
+                    )
+                    self._thread.start()
+                    _dispatchers.add(self)
+
+    def _run(self):
+        email = self.handler.email
+        while True:
+            try:
+                item = self.queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                self._close_connection(email)
+                continue
+            try:
+                if item is self._stop:
+                    break
+                self._is_sending = True
+                self._send(email, *item)
+            finally:
+                self._is_sending = False
+                self.queue.task_done()
+        self._close_connection(email)
+
+    def _send(self, email:EmailSender, records, kwargs):
+        try:
+            if not email.is_alive:
+                email.connect()
+            email.send(**kwargs)
+        except Exception:
+            # Next email opens a new connection
+            self._close_connection(email)
+            record = records[-1] if isinstance(records, list) else records
+            self.handler.handleError(record)
+
+    @staticmethod
+    def _close_connection(email:EmailSender):
+        try:
+            email.close()
+        except Exception:
+            pass
+        email.connection = None
+
+_dispatchers = weakref.WeakSet()
+
+@atexit.register
+def _close_dispatchers():
+    "Send the remaining emails at exit"
+    for dispatcher in list(_dispatchers):
+        # A stalled server must not block the exit
+        dispatcher.close(timeout=dispatcher.exit_timeout)
+
+class _Repeats:
+    "Suppressed repeats of a log record"
+
+    def __init__(self, expires:float, record:LogRecord, count:int=0):
+        self.expires = expires
+        self.record = record
+        self.count = count
+
+class RecordThrottle:
+    """Suppresses repeated log records and limits the rate of emails
+
+    Records with the same fingerprint (logger, level, 
+    unformatted message, exception type and location) 
+    are sent only once per window. The suppressed 
+    records are counted and reported later in a summary.
+
+    Parameters
+    ----------
+    window : float, optional
+        Seconds during which the repeats of a sent
+        record are suppressed.
+    max_per_minute : int, optional
+        Maximum number of emails (including the 
+        summaries) sent in 60 seconds. Records 
+        exceeding this are suppressed.
+    """
+
+    def __init__(self, window:Optional[float]=None, max_per_minute:Optional[int]=None):
+        self.window = window
+        self.max_per_minute = max_per_minute
+        self._repeats = {}
+        self._expired = {}
+        self._sent = deque()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(record:LogRecord) -> tuple:
+        "Get the key identifying the repeats of a record"
+        exc_type = None
+        location = (record.pathname, record.lineno)
+        if record.exc_info and record.exc_info[0] is not None:
+            exc_type = record.exc_info[0].__name__
+            tb = record.exc_info[2]
+            if tb is not None:
+                # Where the exception was raised
+                frame = traceback.extract_tb(tb)[-1]
+                location = (frame.filename, frame.lineno)
+        return (record.name, record.levelno, str(record.msg), exc_type, location)
+
+    def allow(self, record:LogRecord) -> bool:
+        "Check whether the record should be sent (otherwise it is suppressed)"
+        key = self.fingerprint(record)
+        with self._lock:
+            now = time.monotonic()
+            repeats = self._repeats.get(key)
+            if repeats is not None and now >= repeats.expires:
+                self._expire(key)
+                repeats = None
+            if repeats is not None or not self._reserve(now):
+                if repeats is None:
+                    repeats = self._repeats[key] = _Repeats(now, record)
+                repeats.count += 1
+                repeats.record = record
+                return False
+            if self.window is not None:
+                self._repeats[key] = _Repeats(now + self.window, record)
+            return True
+
+    def pop_summary(self, force:bool=False) -> List[Tuple[LogRecord, int]]:
+        """Get the suppressed records whose window has ended
+        (and their counts) if an email can be sent
+
+        If force, all suppressed records are returned."""
+        with self._lock:
+            now = time.monotonic()
+            for key, repeats in list(self._repeats.items()):
+                if force or now >= repeats.expires:
+                    self._expire(key)
+            if not self._expired or not (force or self._reserve(now)):
+                return []
+            summary = [(repeats.record, repeats.count) for repeats in self._expired.values()]
+            self._expired = {}
+            return summary
+
+    def next_summary(self) -> Optional[float]:
+        "Seconds until a summary may be available (None if nothing is suppressed)"
+        with self._lock:
+            now = time.monotonic()
+            expires = [repeats.expires for repeats in self._repeats.values() if repeats.count]
+            if self._expired:
+                expires.append(now)
+            if not expires:
+                return None
+            wait = min(expires) - now
+            if self.max_per_minute is not None and len(self._sent) >= self.max_per_minute:
+                wait = max(wait, self._sent[0] + 60 - now)
+            return max(wait, 0)
+
+    def _expire(self, key):
+        repeats = self._repeats.pop(key)
+        if repeats.count:
+            expired = self._expired.get(key)
+            if expired is not None:
+                repeats.count += expired.count
+            self._expired[key] = repeats
+
+    def _reserve(self, now:float) -> bool:
+        "Reserve an email from the rate limit"
+        if self.max_per_minute is None:
+            return True
+        while self._sent and now - self._sent[0] >= 60:
+            self._sent.popleft()
+        if len(self._sent) >= self.max_per_minute:
+            return False
+        self._sent.append(now)
+        return True
+
 class _EmailHandlerMixin:
 
+    dispatcher: Optional[EmailDispatcher] = None
+
     def __init__(self, email, kwargs):
+        self._send_lock = threading.Lock()
         if email is not None:
             # Using copy to prevent modifying the sender
             # if it is used somewhere else
@@ -36,6 +321,31 @@ class _EmailHandlerMixin:
         
         self._set_email_kwargs(kwargs)
 
+    def set_async(self, queue_size:int=1000, overflow:str="drop_oldest", idle_timeout:float=30,
+                  exit_timeout:Optional[float]=10):
+        """Send the emails in a background thread
+
+        See :class:`EmailDispatcher` for the parameters."""
+        if self.dispatcher is not None:
+            self.dispatcher.close()
+        self.dispatcher = EmailDispatcher(
+            self, queue_size=queue_size, overflow=overflow, 
+            idle_timeout=idle_timeout, exit_timeout=exit_timeout,
+        )
+
+    def send_email(self, records:Union[LogRecord, List[LogRecord]], **kwargs):
+        "Send an email (or queue it if asynchronous)"
+        if self.dispatcher is not None:
+            self.dispatcher.put(records, kwargs)
+        else:
+            # Handlers may send from multiple threads
+            with self._send_lock:
+                self.email.send(**kwargs)
+
+    def _close_dispatcher(self):
+        if self.dispatcher is not None:
+            self.dispatcher.close()
+
     def get_subject(self, record):
         "Format subject of the email sender"
         return self.email.subject.format(
@@ -79,6 +389,18 @@ class EmailHandler(_EmailHandlerMixin, Handler):
     email : EmailSender
         Sender instance to be used for sending
         the log records.
+    asynchronous : bool
+        Whether to send the emails in a background
+        thread instead of blocking the logging call.
+        See :meth:`set_async` for more options.
+    dedup_window : float, optional
+        Seconds during which repeats of a sent record
+        are not sent. The repeats are reported in a 
+        summary email after the window.
+    max_per_minute : int, optional
+        Maximum number of emails sent per minute.
+        The exceeding records are reported in a 
+        summary email later.
     kwargs : dict
         Keyword arguments for creating the 
         sender if ``email`` was not passed.
@@ -127,15 +449,26 @@ class EmailHandler(_EmailHandlerMixin, Handler):
 
     default_text = "{{ msg }}"
 
-    def __init__(self, level:int=logging.NOTSET, email:EmailSender=None, **kwargs):
+    throttle: Optional[RecordThrottle] = None
+
+    def __init__(self, level:int=logging.NOTSET, email:EmailSender=None, asynchronous:bool=False,
+                 dedup_window:Optional[float]=None, max_per_minute:Optional[int]=None, **kwargs):
         _EmailHandlerMixin.__init__(self, email=email, kwargs=kwargs)
         Handler.__init__(self, level)
-
+        self._timer = None
+        if asynchronous:
+            self.set_async()
+        if dedup_window is not None or max_per_minute is not None:
+            self.throttle = RecordThrottle(window=dedup_window, max_per_minute=max_per_minute)
 
     def emit(self, record:logging.LogRecord):
         "Emit a record (send email)"
+        if self.throttle is not None and not self.throttle.allow(record):
+            self._schedule_summary()
+            return
 
-        self.email.send(
+        self.send_email(
+            record,
             subject=self.get_subject(record),
             body_params={
                 "record": record,
@@ -144,6 +477,66 @@ class EmailHandler(_EmailHandlerMixin, Handler):
             }
         )
 
+    def send_summary(self, force:bool=False):
+        "Send a summary of the suppressed records (if any)"
+        summary = self.throttle.pop_summary(force=force) if self.throttle is not None else []
+        if not summary:
+            return
+        records = [record for record, _ in summary]
+        counts = [count for _, count in summary]
+        lines = [
+            f"[{count}x] {self.format(record)}" 
+            for record, count in summary
+        ]
+        record = max(records, key=lambda rec: rec.levelno)
+        self.send_email(
+            records,
+            subject=self.get_subject(record),
+            body_params={
+                "record": record,
+                "msg": "Suppressed log records:\n" + "\n".join(lines),
+                "handler": self,
+                "records": records,
+                "counts": counts,
+            }
+        )
+
+    def _schedule_summary(self):
+        if self._timer is not None:
+            return
+        wait = self.throttle.next_summary()
+        if wait is not None:
+            self._timer = threading.Timer(wait, self._send_summary_on_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _send_summary_on_timer(self):
+        self.acquire()
+        try:
+            self._timer = None
+        finally:
+            self.release()
+        try:
+            self.send_summary()
+        except Exception:
+            self.handleError(logging.makeLogRecord({"msg": "Failed to send the summary of suppressed log records"}))
+        self.acquire()
+        try:
+            self._schedule_summary()
+        finally:
+            self.release()
+
+    def close(self):
+        "Send the suppressed and queued emails and close the handler"
+        try:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self.send_summary(force=True)
+            self._close_dispatcher()
+        finally:
+            Handler.close(self)
+
 
 class MultiEmailHandler(_EmailHandlerMixin, BufferingHandler):
     """Logging handler for sending multiple log records as an email
@@ -155,6 +548,19 @@ class MultiEmailHandler(_EmailHandlerMixin, BufferingHandler):
     email : EmailSender
         Sender instance to be used for sending
         the log records.
+    flush_interval : float, optional
+        Seconds to wait after the first buffered
+        record before flushing. The records 
+        logged meanwhile are sent in the same 
+        email. Flushed earlier if the capacity
+        is reached.
+    flush_level : int, optional
+        Log level at or above which a record flushes
+        the buffer (including the record) immediately.
+    asynchronous : bool
+        Whether to send the emails in a background
+        thread instead of blocking the logging call.
+        See :meth:`set_async` for more options.
     kwargs : dict
         Keyword arguments for creating the 
         sender if ``email`` was not passed.
@@ -206,39 +612,137 @@ class MultiEmailHandler(_EmailHandlerMixin, BufferingHandler):
     {{ handler.format(record) }}
     {% endfor %}""")[1:]
 
-    def __init__(self, capacity:Optional[int]=None, email:EmailSender=None, **kwargs):
+    def __init__(self, capacity:Optional[int]=None, email:EmailSender=None, flush_interval:Optional[float]=None,
+                 flush_level:Optional[int]=None, asynchronous:bool=False, **kwargs):
         _EmailHandlerMixin.__init__(self, email=email, kwargs=kwargs)
         BufferingHandler.__init__(self, capacity)
+        self.flush_interval = flush_interval
+        self.flush_level = flush_level
+        self._timer = None
+        # Records to send after releasing the lock
+        self._ready = deque()
+        if asynchronous:
+            self.set_async()
+
+    def handle(self, record:LogRecord):
+        """Buffer the record and flush if needed
+
+        The record is buffered under the handler lock but
+        the automatic flush (capacity or ``flush_level``)
+        sends after the lock is released."""
+        rv = super().handle(record)
+        self._send_ready()
+        return rv
+
+    def emit(self, record:LogRecord):
+        """Buffer the record
+
+        If flush is needed, the buffer is sent by :meth:`handle`
+        (or by the next :meth:`flush` if ``emit`` was called
+        directly)."""
+        self.buffer.append(record)
+        if self.shouldFlush(record):
+            self._cancel_timer()
+            self._ready.append(self.buffer)
+            self.buffer = []
+        elif self.flush_interval is not None and self._timer is None:
+            # Flushed later with the records logged meanwhile
+            self._timer = threading.Timer(self.flush_interval, self._flush_on_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_on_timer(self):
+        self.acquire()
+        try:
+            if self._timer is not threading.current_thread():
+                # Flushed already
+                return
+            self._timer = None
+            records, self.buffer = self.buffer, []
+        finally:
+            self.release()
+        if not records:
+            return
+        try:
+            self._send_records(records)
+        except Exception:
+            self.handleError(records[-1])
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
 
     def flush(self):
-        "Flush the records (send an email)"
+        """Flush the records (send an email)
+
+        The buffer is swapped under the handler lock
+        but the email is rendered and sent outside of it
+        so that logging is not blocked by the SMTP server."""
         self.acquire()
+        try:
+            self._cancel_timer()
+            if self.buffer or not self._ready:
+                self._ready.append(self.buffer)
+                self.buffer = []
+        finally:
+            self.release()
+        self._send_ready()
+
+    def _send_ready(self):
+        "Send the buffers marked for flushing"
+        while self._ready:
+            try:
+                records = self._ready.popleft()
+            except IndexError:
+                # Sent by another thread
+                break
+            self._send_records(records)
+
+    def _send_records(self, records:List[LogRecord]):
+        "Send the records (not holding the handler lock)"
         try:
             msgs = []
-            for rec in self.buffer:
+            for rec in records:
                 # This creates msg, exc_text etc. to the LogRecords
                 msgs.append(self.format(rec))
                 # For some reason logging does not create this attr unless having asctime in the format string
                 if self.formatter is None:
                     rec.asctime = logging.Formatter().formatTime(rec)
 
-            self.email.send(
-                subject=self.get_subject(self.buffer),
+            self.send_email(
+                records,
+                subject=self.get_subject(records),
                 body_params={
-                    "records": self.buffer,
+                    "records": records,
                     "msgs": msgs,
                     "handler": self
                 }
             )
-            self.buffer = []
+        except Exception:
+            # Keep the records for the next flush
+            self.acquire()
+            try:
+                self.buffer[:0] = records
+            finally:
+                self.release()
+            raise
+
+    def close(self):
+        "Flush the records, send the queued emails (if asynchronous) and close the handler"
+        try:
+            BufferingHandler.close(self)
         finally:
-            self.release()
+            self._close_dispatcher()
 
     def shouldFlush(self, record):
         """Should the handler flush its buffer?
 
-        Returns true if the buffer is up to capacity. This method can be overridden to implement custom flushing strategies.
+        Returns true if the buffer is up to capacity or if the record
+        is at or above ``flush_level``. This method can be overridden to implement custom flushing strategies.
         """
+        if self.flush_level is not None and record.levelno >= self.flush_level:
+            return True
         if self.capacity is None:
             # Only manual flushing
             return False
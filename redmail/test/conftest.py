@@ -6,6 +6,10 @@ import os, sys
 # add helpers to path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'helpers'))
 
+from mock_server import MockServer
+
+from redmail import EmailSender
+
 def copy_file_to_tmpdir(tmpdir, source_file, target_path=None):
     "Utility to copy file from test_files to temporary directory"
     source_path = Path(os.path.dirname(__file__)) / "test_files" / source_file
@@ -17,4 +21,15 @@ def copy_file_to_tmpdir(tmpdir, source_file, target_path=None):
 
 @pytest.fixture
 def dummy_png(tmpdir):
-    return copy_file_to_tmpdir(tmpdir, source_file="dummy.png")
\ No newline at end of file
+    return copy_file_to_tmpdir(tmpdir, source_file="dummy.png")
+
+@pytest.fixture(autouse=True)
+def reset_mock_server():
+    MockServer.reset()
+
+@pytest.fixture
+def email():
+    "Email sender using the mock server"
+    email = EmailSender(host="localhost", port=0, cls_smtp=MockServer)
+    email.sender = "me@example.com"
+    return email
@@ -0,0 +1,203 @@
+import asyncio
+from email.message import EmailMessage
+
+import pytest
+
+from redmail import AsyncEmailSender
+
+from aio_server import AsyncSMTPServer
+
+aiosmtplib = pytest.importorskip("aiosmtplib")
+
+def run_with_server(func, **kwargs):
+    "Run coroutine function with a local SMTP server"
+    async def main():
+        server = AsyncSMTPServer(**kwargs)
+        port = await server.start()
+        try:
+            email = AsyncEmailSender(host="127.0.0.1", port=port, use_starttls=False)
+            await func(email, server)
+        finally:
+            await server.stop()
+        return server
+    return asyncio.run(main())
+
+def test_send():
+    async def func(email, server):
+        msg = await email.send(
+            subject="An example",
+            sender="me@example.com",
+            receivers=["you@example.com"],
+            text="Hi, this is an email.",
+        )
+        assert isinstance(msg, EmailMessage)
+        assert email.connection is None
+
+    server = run_with_server(func)
+    assert server.n_connections == 1
+    assert len(server.messages) == 1
+    assert server.messages[0]["from"] == "me@example.com"
+    assert server.messages[0]["rcpt"] == ["you@example.com"]
+    assert b"Hi, this is an email." in server.messages[0]["data"]
+
+def test_send_with_user():
+    async def func(email, server):
+        email.username = "me@example.com"
+        email.password = "1234"
+        await email.send(subject="An example", receivers=["you@example.com"])
+
+    server = run_with_server(func)
+    assert server.logins == [("me@example.com", "1234")]
+
+def test_send_multi():
+    async def func(email, server):
+        async with email:
+            assert email.is_alive
+            for _ in range(3):
+                await email.send(subject="An example", sender="me@example.com", receivers=["you@example.com"])
+        assert not email.is_alive
+
+    server = run_with_server(func)
+    assert server.n_connections == 1
+    assert len(server.messages) == 3
+
+def test_sync_context_not_allowed():
+    email = AsyncEmailSender(host="localhost", port=0)
+    with pytest.raises(TypeError):
+        with email:
+            pass
+
+@pytest.mark.parametrize("method,args", [
+    ("set_relays", ([{"host": "localhost", "port": 0}],)),
+    ("get_message_template", ()),
+    ("build_many", ([],)),
+    ("send_batches", (EmailMessage(),)),
+    ("send_parallel", ([],)),
+    ("set_outbox", ("outbox.db",)),
+])
+def test_not_supported(method, args):
+    email = AsyncEmailSender(host="localhost", port=0)
+    with pytest.raises(NotImplementedError):
+        getattr(email, method)(*args)
+
+@pytest.mark.parametrize("attr,value", [("retry", object()), ("max_recipients", 10)])
+def test_send_options_not_supported(attr, value):
+    async def func(email, server):
+        setattr(email, attr, value)
+        with pytest.raises(NotImplementedError):
+            await email.send(subject="An example", sender="me@example.com", receivers=["you@example.com"])
+
+    server = run_with_server(func)
+    assert server.n_connections == 0
+
+def test_send_merge():
+    async def func(email, server):
+        results = await email.send_merge(
+            {"subject": "Hi {{ name }}", "sender": "me@example.com", "text": "Hi {{ name }}"},
+            [{"receivers": "you@example.com", "name": "You"}, {"receivers": "he@example.com", "name": "He"}],
+        )
+        assert [res.ok for res in results] == [True, True]
+
+    server = run_with_server(func)
+    assert [msg["rcpt"] for msg in server.messages] == [["you@example.com"], ["he@example.com"]]
+
+def test_send_concurrent_pool():
+    async def func(email, server):
+        await email.set_pool(max_size=3)
+        await asyncio.gather(*(
+            email.send(subject="slow", sender="me@example.com", receivers=["you@example.com"])
+            for _ in range(9)
+        ))
+        assert email.pool.size == 3
+        assert email.pool.n_idle == 3
+        await email.close()
+        assert email.pool.size == 0
+
+    server = run_with_server(func, delay=0.05)
+    assert len(server.messages) == 9
+    assert server.n_connections == 3
+    assert server.max_active == 3
+
+def test_send_many():
+    async def func(email, server):
+        await email.set_pool(max_size=2)
+        results = await email.send_many(
+            {"subject": "An example", "sender": "me@example.com", "receivers": [rcpt]}
+            for rcpt in ["you@example.com", "refused@example.com", "he@example.com"]
+        )
+        assert [res.ok for res in results] == [True, False, True]
+        assert results[0].code is None
+        assert results[0].accepted == ["you@example.com"]
+        assert results[1].refused == {"refused@example.com": (550, "No such user")}
+        await email.close()
+
+    server = run_with_server(func)
+    assert [msg["rcpt"] for msg in server.messages] == [["you@example.com"], ["he@example.com"]]
+    assert server.n_connections == 2
+
+def test_pool_closed_connection():
+    async def func(email, server):
+        await email.set_pool(max_size=1)
+        with pytest.raises(aiosmtplib.SMTPRecipientsRefused):
+            await email.send(subject="An example", sender="me@example.com", receivers=["closing@example.com"])
+        # The closed connection is not reused
+        assert email.pool.size == 0
+        await email.send(subject="An example", sender="me@example.com", receivers=["you@example.com"])
+        await email.close()
+
+    server = run_with_server(func)
+    assert server.n_connections == 2
+
+def test_cancel():
+    async def func(email, server):
+        await email.set_pool(max_size=1)
+        task = asyncio.ensure_future(
+            email.send(subject="slow", sender="me@example.com", receivers=["you@example.com"])
+        )
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        # The interrupted connection is not reused
+        assert email.pool.size == 0
+        await email.send(subject="An example", sender="me@example.com", receivers=["you@example.com"])
+        await email.close()
+
+    server = run_with_server(func, delay=1)
+    assert server.n_connections == 2
+
+def test_cancel_connection():
+    async def func(email, server):
+        async with email:
+            task = asyncio.ensure_future(
+                email.send(subject="slow", sender="me@example.com", receivers=["you@example.com"])
+            )
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+            # The interrupted connection is dropped
+            assert not email.is_alive
+            await asyncio.wait_for(
+                email.send(subject="An example", sender="me@example.com", receivers=["you@example.com"]),
+                timeout=0.5,
+            )
+
+    server = run_with_server(func, delay=1)
+    assert server.n_connections == 2
+
+def test_set_pool_closes_previous():
+    async def func(email, server):
+        old = await email.set_pool(max_size=2)
+        await email.send(subject="An example", sender="me@example.com", receivers=["you@example.com"])
+        assert old.n_idle == 1
+
+        await email.set_pool(max_size=2)
+        assert old.size == 0
+        with pytest.raises(RuntimeError):
+            await old.acquire()
+        await email.close()
+
+    run_with_server(func)
@@ -0,0 +1,68 @@
+import smtplib
+
+import pytest
+
+from mock_server import MockServer
+
+def get_message(email):
+    return email.get_message(
+        subject="Newsletter",
+        receivers=["first@example.com", "second@example.com"],
+        bcc=[f"bcc{i}@example.com" for i in range(5)],
+        text="Hi",
+    )
+
+def test_send_batches(email):
+    msg = get_message(email)
+    MockServer.refuse = {"bcc1@example.com", "bcc3@example.com", "bcc4@example.com"}
+    results = email.send_batches(msg, batch_size=3)
+
+    assert [res.recipients for res in results] == [
+        ["first@example.com", "second@example.com", "bcc0@example.com"],
+        ["bcc1@example.com", "bcc2@example.com", "bcc3@example.com"],
+        ["bcc4@example.com"],
+    ]
+    assert [res.ok for res in results] == [True, True, False]
+    assert results[1].refused.keys() == {"bcc1@example.com", "bcc3@example.com"}
+    assert results[1].accepted == ["bcc2@example.com"]
+    assert all(res.message_id == msg["Message-ID"] for res in results)
+
+    # Same bytes over one connection, without Bcc
+    [server] = MockServer.instances
+    datas = {data for _, _, data in server.transactions}
+    assert len(server.transactions) == 2
+    assert len(datas) == 1
+    assert b"bcc" not in datas.pop()
+    assert email.connection is None
+
+def test_send_max_recipients(email):
+    email.max_recipients = 2
+    email.send_message(get_message(email))
+
+    [server] = MockServer.instances
+    assert [rcpts for _, rcpts, _ in server.transactions] == [
+        ["first@example.com", "second@example.com"],
+        ["bcc0@example.com", "bcc1@example.com"],
+        ["bcc2@example.com", "bcc3@example.com"],
+        ["bcc4@example.com"],
+    ]
+
+def test_send_max_recipients_failure(email):
+    email.max_recipients = 2
+    MockServer.refuse = {"bcc0@example.com", "bcc1@example.com"}
+    with pytest.raises(smtplib.SMTPRecipientsRefused):
+        email.send_message(get_message(email))
+    # The rest of the batches were still sent
+    [server] = MockServer.instances
+    assert len(server.transactions) == 3
+
+def test_send_many_max_recipients(email):
+    email.max_recipients = 4
+    [result] = email.send_many([get_message(email)])
+    assert result.ok
+    assert len(result.recipients) == 7
+    assert len(MockServer.instances[0].transactions) == 2
+
+def test_invalid_batch_size(email):
+    with pytest.raises(ValueError):
+        email.send_batches(get_message(email))
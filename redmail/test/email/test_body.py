@@ -1,6 +1,7 @@
 from textwrap import dedent
 import sys
 from redmail import EmailSender
+from redmail.email.body import TemplateCache
 
 import pytest
 
@@ -281,6 +282,38 @@ def test_with_error():
     assert html.startswith('<h1>Error occurred: </h1>\n        <div>\n            <h4>Traceback (most recent call last):</h4>\n            <pre><code>  File &quot;')
     assert html.endswith(', in test_with_error\nraise RuntimeError(&quot;Deliberate failure&quot;)</code></pre>\n            <span style=3D"color: red; font-weight: bold">Deliberate failure</span>: <span>RuntimeError</span>\n        </div>\n')
 
+def test_lazy_params(monkeypatch):
+    import redmail.email.sender as sender_module
+    calls = []
+    monkeypatch.setattr(sender_module, "node", lambda: calls.append("node") or "my-host")
+
+    email = EmailSender(host=None, port=1234)
+    params = email.get_html_params(sender="me@example.com")
+    assert params["error"].get() is params["error"].get()
+
+    for _ in range(2):
+        msg = email.get_message(
+            sender="me@example.com",
+            subject="Some news",
+            text="Hi from {{ node }}",
+            html="{% if now.year > 2000 %}Sent by {{ sender.local_part }}{% endif %}",
+        )
+    assert calls == ["node"]
+    text_part, html_part = msg.get_payload()[0].get_payload()
+    assert text_part.get_payload() == "Hi from my-host\n"
+    assert html_part.get_payload() == "Sent by me\n"
+
+def test_lazy_params_custom_env():
+    import jinja2
+    email = EmailSender(host=None, port=1234)
+    email.templates_text = jinja2.Environment()
+    msg = email.get_message(
+        sender="me@example.com",
+        subject="Some news",
+        text="Sent by {{ sender.local_part }}",
+    )
+    assert msg.get_payload() == "Sent by me\n"
+
 def test_set_defaults():
     email = EmailSender(host=None, port=1234)
     email.sender = 'me@gmail.com'
@@ -334,4 +367,46 @@ def test_no_table_templates():
         'To': 'you@gmail.com', 
         'MIME-Version': '1.0', 
         'Content-Type': 'multipart/mixed',
-    }
\ No newline at end of file
+    }
+
+def test_template_cache():
+    email = EmailSender(host="localhost", port=0)
+    email.template_cache = TemplateCache(maxsize=2)
+
+    for name in ("you", "me"):
+        msg = email.get_message(
+            sender="me@example.com",
+            receivers="you@example.com",
+            subject="Some news",
+            text="Hi {{ name }}",
+            body_params={"name": name},
+        )
+        assert msg.get_payload() == f"Hi {name}\n"
+    assert email.template_cache.misses == 1
+    assert email.template_cache.hits == 1
+
+    # Bodies are cached per environment
+    email.get_message(subject="Some news", sender="me@example.com", html="Hi {{ name }}")
+    assert email.template_cache.misses == 2
+    assert len(email.template_cache) == 2
+
+    # Least recently used is dropped
+    email.get_message(subject="Some news", sender="me@example.com", text="Bye")
+    assert len(email.template_cache) == 2
+    email.get_message(subject="Some news", sender="me@example.com", text="Hi {{ name }}")
+    assert email.template_cache.misses == 4
+
+    email.template_cache.clear()
+    assert len(email.template_cache) == 0
+    assert email.template_cache.hits == 0
+
+def test_template_cache_disabled():
+    email = EmailSender(host="localhost", port=0)
+    email.template_cache = None
+    msg = email.get_message(
+        sender="me@example.com",
+        subject="Some news",
+        text="Hi {{ name }}",
+        body_params={"name": "you"},
+    )
+    assert msg.get_payload() == "Hi you\n"
@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+from redmail.email.streaming import SerializedMessage
+
+from mock_server import MockServer
+
+@pytest.fixture
+def email(email):
+    email.password = "secret"
+    return email
+
+def test_build_many(email):
+    specs = (
+        {
+            "subject": f"Report {i}",
+            "receivers": [f"user{i}@example.com"],
+            "bcc": ["boss@example.com"],
+            "html": "<p>Report number {{ n }}</p>",
+            "body_params": {"n": i},
+            "attachments": {"data.csv": b"a,b\n1,2"},
+        }
+        for i in range(6)
+    )
+    msgs = list(email.build_many(specs, max_workers=2))
+
+    assert all(isinstance(msg, SerializedMessage) for msg in msgs)
+    assert [msg.to_addrs for msg in msgs] == [[f"user{i}@example.com", "boss@example.com"] for i in range(6)]
+    assert len({msg.message_id for msg in msgs}) == 6
+    assert all(f"Report {i}".encode() in msg.data for i, msg in enumerate(msgs))
+    assert all(b"boss@example.com" not in msg.data for msg in msgs)
+    assert all(b"Report number %d" % i in msg.data for i, msg in enumerate(msgs))
+
+def test_built_in_workers(email):
+    specs = ({"subject": "Report", "receivers": ["you@example.com"], "text": "Hi"} for _ in range(2))
+    msgs = list(email.build_many(specs, max_workers=1))
+    # Message-IDs contain the pid of the creating process
+    pids = {msg.message_id.split(".")[1] for msg in msgs}
+    assert pids != {str(os.getpid())}
+
+def test_send_built(email):
+    specs = ({"subject": f"Report {i}", "receivers": ["you@example.com"], "text": "Hi"} for i in range(4))
+    results = email.send_many(email.build_many(specs, max_workers=2))
+    assert all(res.ok for res in results)
+    assert results[0].recipients == ["you@example.com"]
+    assert [b"Report %d" % i in data for i, data in enumerate(MockServer.instances[0].messages)] == [True] * 4
+
+def test_non_ascii_address(email):
+    [msg] = email.build_many([{"subject": "Report", "receivers": ["yöu@example.com"]}], max_workers=1)
+    assert msg["To"] == "yöu@example.com"
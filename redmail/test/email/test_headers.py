@@ -7,6 +7,7 @@ import re
 import pytest
 
 from redmail import EmailSender
+from redmail.email.utils import IDGenerator
 
 from convert import remove_email_content_id, prune_generated_headers
 
@@ -56,6 +57,35 @@ def test_message_id():
     message_id_2 = re.findall(r'(?<=Message-ID: )[^\r\n]+', str(msg2))[0]
     assert message_id != message_id_2
 
+def test_message_id_domain_cached(monkeypatch):
+    calls = []
+    def getfqdn():
+        calls.append(1)
+        return "host.example.com"
+    monkeypatch.setattr(socket, "getfqdn", getfqdn)
+
+    email = EmailSender(host=None, port=1234)
+    msg = email.get_message(
+        sender="me@example.com", 
+        subject="Some email", 
+        html="{{ image }}", 
+        body_images={"image": b"<svg></svg>"}
+    )
+    email.get_message(sender="me@example.com", subject="Some email")
+    assert len(calls) == 1
+    assert re.match(r'<[0-9.]+@host[.]example[.]com>$', msg["Message-ID"])
+    assert re.search(r'Content-ID: <[0-9.]+@host[.]example[.]com>', str(msg))
+
+    email.id_generator.refresh_interval = 0
+    email.get_message(sender="me@example.com", subject="Some email")
+    assert len(calls) == 2
+
+def test_id_generator():
+    make_id = IDGenerator()
+    ids = {make_id(domain="example.com") for _ in range(1000)}
+    assert len(ids) == 1000
+    assert re.match(r'<[0-9.]+[.]extra@example[.]com>$', make_id("extra", domain="example.com"))
+
 def test_cc_bcc():
     email = EmailSender(host=None, port=1234)
     if IS_PY37:
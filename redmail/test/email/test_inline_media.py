@@ -324,4 +324,114 @@ def test_styled_tables_dependency_missing():
                 body_tables={"my_table": style}
             )
     finally:
-        body.css_inline = mdl
\ No newline at end of file
+        body.css_inline = mdl
+
+def test_table_layout():
+    pd = pytest.importorskip("pandas")
+    from redmail.email.envs import get_table_layout, get_span, is_last_group_row
+
+    df = pd.DataFrame(
+        {"col": range(5)},
+        index=pd.MultiIndex.from_tuples([("a", "x"), ("a", "x"), ("a", "y"), ("b", "x"), ("a", "x")])
+    )
+    layout = get_table_layout(df)
+    assert layout.index_spans == [[3, 0, 0, 1, 1], [2, 0, 1, 1, 1]]
+    assert layout.index_last_group == [[True] * 5, [False, False, True, True, True]]
+    assert layout.index_last_row == [False, False, True, True, True]
+    assert layout.column_spans == [[1]]
+    assert layout.column_last_group == [[False]]
+    assert layout.column_last_column == [False]
+
+    # Same as scanning the axes
+    index = df.index.tolist()
+    for level in range(2):
+        assert layout.index_spans[level][1:] == [get_span(index, loc, width=level) for loc in range(1, 5)]
+        assert layout.index_last_group[level] == [is_last_group_row(loc, df.index, level=level) for loc in range(5)]
+
+def test_table_layout_missing():
+    pd = pytest.importorskip("pandas")
+    np = pytest.importorskip("numpy")
+    from redmail.email.envs import get_table_layout, get_span
+
+    # Missing values of a flat index are not merged to one cell
+    df = pd.DataFrame({"col": range(4)}, index=pd.Index(["a", np.nan, np.nan, "b"]))
+    assert get_table_layout(df).index_spans == [[1, 1, 1, 1]]
+
+    # but they are in a MultiIndex (compared as tuples)
+    df = pd.DataFrame(
+        {"col": range(5)},
+        index=pd.MultiIndex.from_tuples([("a", np.nan), ("a", np.nan), ("a", "x"), (np.nan, "x"), (np.nan, "x")])
+    )
+    layout = get_table_layout(df)
+    assert layout.index_spans == [[3, 0, 0, 2, 0], [2, 0, 1, 2, 0]]
+    assert layout.index_last_row == [False, False, True, False, True]
+    index = df.index.tolist()
+    for level in range(2):
+        assert layout.index_spans[level][1:] == [get_span(index, loc, width=level) for loc in range(1, 5)]
+
+def test_table_single_group():
+    pd = pytest.importorskip("pandas")
+    sender = EmailSender(host=None, port=1234)
+    df = pd.DataFrame(
+        {"col": [1, 2]},
+        index=pd.MultiIndex.from_tuples([("group", "x"), ("group", "y")])
+    )
+    html = sender.get_html_table_template().render(df=df)
+    assert 'rowspan="2">group</th>' in html
+
+@pytest.mark.parametrize("theme", ["modest.html", "notebook-like.html"])
+@pytest.mark.parametrize(
+    "get_df,", [
+        pytest.param(
+            lambda: pd.DataFrame(
+                [[1, 2.5, "a"], [4, 5.5, None]],
+                columns=pd.Index(["first", "second", "third"]),
+                index=pd.Index(["a", "b"], name="category")
+            ),
+            id="Mixed dataframe"
+        ),
+        pytest.param(
+            lambda: pd.DataFrame(
+                [[1, 2, 3, "a"], [4, 5, 6, "b"], [7, 8, 9, "c"], [10, 11, 12, "d"]],
+                columns=pd.MultiIndex.from_tuples([("parent a", "child a"), ("parent a", "child b"), ("parent b", "child a"), ("parent c", "child a")], names=["lvl 1", "lvl 2"]),
+                index=pd.MultiIndex.from_tuples([("row a", "sub a"), ("row a", "sub b"), ("row b", "sub a"), ("row c", "sub a")], names=["cat 1", "cat 2"]),
+            ),
+            id="Complex dataframe"
+        ),
+        pytest.param(
+            lambda: pd.DataFrame(
+                [],
+                columns=pd.Index(["first", "second", "third"]),
+            ),
+            id="Empty datafram"
+        ),
+    ]
+)
+def test_native_table_engine(get_df, theme):
+    pytest.importorskip("pandas")
+    df = get_df()
+    sender = EmailSender(host=None, port=1234)
+    sender.default_html_theme = theme
+    htmls = []
+    for engine in ("jinja", "native"):
+        sender.table_engine = engine
+        msg = sender.get_message(
+            sender="me@gmail.com",
+            receivers="you@gmail.com",
+            subject="Some news",
+            html='The table {{my_table}}',
+            body_tables={"my_table": df}
+        )
+        htmls.append(msg.get_payload()[0].get_payload()[0].get_payload())
+    assert htmls[0] == htmls[1]
+
+def test_invalid_table_engine():
+    sender = EmailSender(host=None, port=1234)
+    sender.table_engine = "not existing"
+    with pytest.raises(ValueError):
+        sender.get_message(
+            sender="me@gmail.com",
+            receivers="you@gmail.com",
+            subject="Some news",
+            html='The table',
+        )
@@ -0,0 +1,94 @@
+from pathlib import Path
+
+import pytest
+
+from redmail.email import body
+
+from mock_server import MockServer
+
+def get_html(msg):
+    part = msg.get_body(("html",))
+    return part.get_content()
+
+def test_send_merge(email, dummy_png):
+    template = {
+        "subject": "Your invoice",
+        "html": "<p>Hi {{ name }}, you owe {{ amount }} {{ currency }}.</p>{{ logo }}",
+        "text": "Hi {{ name }}",
+        "body_params": {"currency": "euros"},
+        "body_images": {"logo": Path(dummy_png)},
+        "attachments": {"terms.txt": "Pay in time"},
+    }
+    rows = [
+        {"receivers": "you@example.com", "name": "You", "amount": 10},
+        {"receivers": "they@example.com", "name": "They", "amount": 20, "subject": "Late invoice"},
+    ]
+    results = email.send_merge(template, rows)
+    assert [res.ok for res in results] == [True, True]
+
+    first, second = MockServer.instances[0].messages
+    assert first["To"] == "you@example.com"
+    assert second["To"] == "they@example.com"
+    assert first["Subject"] == "Your invoice"
+    assert second["Subject"] == "Late invoice"
+    assert "Hi You, you owe 10 euros." in get_html(first)
+    assert "Hi They, you owe 20 euros." in get_html(second)
+    assert first.get_body(("plain",)).get_content() == "Hi You\n"
+    assert first["Message-ID"] != second["Message-ID"]
+
+    # The attachment is created only once
+    [att_first] = first.iter_attachments()
+    [att_second] = second.iter_attachments()
+    assert att_first is att_second
+    assert att_first.get_payload(decode=True) == b"Pay in time"
+
+def test_images_loaded_once(email, dummy_png, monkeypatch):
+    calls = []
+    load_image = body.HTMLBody.load_image
+    def spy(img):
+        calls.append(img)
+        return load_image(img)
+    monkeypatch.setattr(body.HTMLBody, "load_image", staticmethod(spy))
+
+    msgs = list(email.get_merge_messages(
+        {"subject": "Hi", "html": "{{ logo }}", "body_images": {"logo": Path(dummy_png)}},
+        [{"receivers": f"user{i}@example.com"} for i in range(3)],
+    ))
+    assert len(msgs) == 3
+    # Loaded when preparing, the emails reuse the content
+    assert calls[0] == Path(dummy_png)
+    assert all(isinstance(img, dict) for img in calls[1:])
+    images = [msg.get_body(("related",)).get_payload()[1].get_content() for msg in msgs]
+    assert images[0] == Path(dummy_png).read_bytes()
+    assert images[0] == images[1] == images[2]
+
+def test_dataframe(email):
+    pd = pytest.importorskip("pandas")
+    df = pd.DataFrame({
+        "receivers": ["you@example.com", "they@example.com"],
+        "name": ["You", "They"],
+    })
+    results = email.send_merge({"subject": "Hi", "text": "Hi {{ name }}"}, df)
+    assert [res.recipients for res in results] == [["you@example.com"], ["they@example.com"]]
+    assert [msg.get_content() for msg in MockServer.instances[0].messages] == ["Hi You\n", "Hi They\n"]
+
+def test_lazy(email):
+    consumed = []
+    def rows():
+        for i in range(3):
+            consumed.append(i)
+            yield {"receivers": f"user{i}@example.com"}
+
+    msgs = email.get_merge_messages({"subject": "Hi", "text": "Hi"}, rows())
+    assert consumed == []
+    next(msgs)
+    assert consumed == [0]
+
+def test_send_merge_parallel(email):
+    results = email.send_merge(
+        {"subject": "Hi", "text": "Hi {{ n }}"},
+        ({"receivers": f"user{i}@example.com", "n": i} for i in range(6)),
+        n_connections=2,
+    )
+    assert [res.recipients for res in results] == [[f"user{i}@example.com"] for i in range(6)]
+    assert all(res.ok for res in results)
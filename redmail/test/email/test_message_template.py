@@ -0,0 +1,81 @@
+from email.parser import BytesParser
+from email.policy import default
+from pathlib import Path
+
+import pytest
+
+from redmail.email.message import MessageTemplate
+from redmail.email.streaming import SerializedMessage
+
+from mock_server import MockServer
+
+def parse(data):
+    return BytesParser(policy=default).parsebytes(data)
+
+def test_serialize(email):
+    template = email.get_message_template(
+        subject="Alert",
+        receivers=["ops@example.com"],
+        html="<h1>Alert</h1>",
+        text="Alert",
+        attachments={"log.txt": "An error occurred"},
+    )
+    assert isinstance(template, MessageTemplate)
+
+    first = template.serialize()
+    second = template.serialize(receivers=["dev@example.com"], bcc=["boss@example.com"], subject="FYI: Alert")
+    assert isinstance(first, SerializedMessage)
+    assert first.to_addrs == ["ops@example.com"]
+    assert second.to_addrs == ["dev@example.com", "boss@example.com"]
+    assert first.message_id != second.message_id
+
+    msg = parse(second.data)
+    assert msg["To"] == "dev@example.com"
+    assert msg["Subject"] == "FYI: Alert"
+    assert msg["From"] == "me@example.com"
+    assert msg["Message-ID"] == second.message_id
+    assert msg["Date"] is not None
+    assert "Bcc" not in msg
+    assert msg.get_body(("html",)).get_content() == "<h1>Alert</h1>\r\n"
+    [att] = msg.iter_attachments()
+    assert att.get_content() == b"An error occurred"
+
+    # The body is reused as is
+    assert first.data.split(b"\r\n\r\n", 1)[1] == second.data.split(b"\r\n\r\n", 1)[1]
+
+def test_same_as_message(email):
+    kwargs = dict(subject="Alert", receivers=["ops@example.com"], text="Alert", attachments={"log.txt": "Error"})
+    data = email.get_message_template(**kwargs).serialize().data
+    msg = parse(data)
+    orig = parse(email.get_message(**kwargs).as_bytes())
+    assert sorted(msg.keys()) == sorted(orig.keys())
+    assert msg.get_body(("plain",)).get_content() == orig.get_body(("plain",)).get_content()
+
+def test_get_message(email):
+    template = email.get_message_template(subject="Alert", receivers=["ops@example.com"], text="Alert")
+    msg = template.get_message(cc=["dev@example.com"])
+    assert msg["To"] == "ops@example.com"
+    assert msg["Cc"] == "dev@example.com"
+    assert msg.get_content() == "Alert\n"
+    # Template is not modified
+    assert "Cc" not in template.get_message()
+    assert msg["Message-ID"] != template.get_message()["Message-ID"]
+
+def test_send(email):
+    template = email.get_message_template(subject="Alert", receivers=["ops@example.com"], text="Alert")
+    with email:
+        template.send()
+        template.send(receivers=["dev@example.com"])
+    [server] = MockServer.instances
+    assert [to_addrs for _, to_addrs, _ in server.transactions] == [["ops@example.com"], ["dev@example.com"]]
+
+def test_file_attachment(email, tmpdir):
+    path = Path(tmpdir) / "data.txt"
+    path.write_text("Some data")
+    template = email.get_message_template(subject="Alert", receivers=["ops@example.com"], attachments=[path])
+    # Files are not kept in memory
+    msg = template.serialize(receivers=["dev@example.com"])
+    assert not isinstance(msg, SerializedMessage)
+    assert msg["To"] == "dev@example.com"
+    [att] = msg.iter_attachments()
+    assert att.get_payload(decode=True) == b"Some data"
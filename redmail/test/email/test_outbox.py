@@ -0,0 +1,134 @@
+import smtplib
+import threading
+import time
+
+import pytest
+
+from redmail.email.outbox import Outbox
+from redmail.email.retry import RetryPolicy
+
+from mock_server import MockServer
+
+@pytest.fixture(autouse=True)
+def configure_server():
+    MockServer.fail_subjects = {
+        "temporary": smtplib.SMTPSenderRefused(451, b"Try again later", "me@example.com"),
+        "permanent": smtplib.SMTPRecipientsRefused({"you@example.com": (550, b"No such user")}),
+    }
+
+@pytest.fixture
+def email(email):
+    email.receivers = ["you@example.com"]
+    return email
+
+def test_drain(tmpdir, email):
+    outbox = Outbox(tmpdir / "outbox.db")
+    msg = email.get_message(subject="An example", bcc=["secret@example.com"], text="Hi")
+    outbox.put(msg)
+    outbox.put(email.get_message(subject="Another"))
+    assert len(outbox) == 2
+
+    results = outbox.drain(email)
+    assert [res.ok for res in results] == [True, True]
+    assert results[0].message_id == msg["Message-ID"]
+    assert results[0].recipients == ["you@example.com", "secret@example.com"]
+    assert len(outbox) == 0
+
+    # Sent over one connection
+    assert len(MockServer.instances) == 1
+    sent = MockServer.instances[0].messages
+    assert [msg["Subject"] for msg in sent] == ["An example", "Another"]
+    assert sent[0].as_bytes() == msg.as_bytes()
+
+def test_retry(tmpdir, email):
+    outbox = Outbox(tmpdir / "outbox.db", retry=RetryPolicy(max_attempts=3, delay=0.1, jitter=0))
+    outbox.put(email.get_message(subject="temporary"))
+
+    assert not outbox.drain(email)[0].ok
+    assert len(outbox) == 1
+    # Not yet due
+    assert outbox.drain(email) == []
+
+    time.sleep(0.1)
+    assert len(outbox.drain(email)) == 1
+    time.sleep(0.2)
+    assert len(outbox.drain(email)) == 1
+
+    # Gave up
+    assert len(outbox) == 0
+    [(msg, error)] = outbox.get_failed()
+    assert msg["Subject"] == "temporary"
+    assert "451" in error
+
+def test_permanent_error(tmpdir, email):
+    outbox = Outbox(tmpdir / "outbox.db")
+    outbox.put(email.get_message(subject="permanent"))
+    outbox.put(email.get_message(subject="An example"))
+
+    results = outbox.drain(email)
+    assert [res.ok for res in results] == [False, True]
+    assert len(outbox) == 0
+    assert len(outbox.get_failed()) == 1
+
+def test_server_down(tmpdir, email):
+    outbox = Outbox(tmpdir / "outbox.db")
+    for _ in range(3):
+        outbox.put(email.get_message(subject="An example"))
+
+    MockServer.down = {"localhost"}
+    results = outbox.drain(email)
+    # Stopped after the connection failed
+    assert len(results) == 1
+    assert isinstance(results[0].error, ConnectionRefusedError)
+    assert len(outbox) == 3
+
+def test_persistent(tmpdir, email):
+    outbox = Outbox(tmpdir / "outbox.db")
+    outbox.put(email.get_message(subject="An example"))
+    outbox.close()
+
+    outbox = Outbox(tmpdir / "outbox.db")
+    assert len(outbox) == 1
+    assert outbox.drain(email)[0].ok
+
+def test_set_outbox(tmpdir, email):
+    outbox = email.set_outbox(tmpdir / "outbox.db")
+    email.send(subject="An example")
+
+    start = time.time()
+    while len(outbox) and time.time() - start < 5:
+        time.sleep(0.01)
+    outbox.close()
+
+    assert len(outbox.path.read_bytes()) > 0
+    assert [msg["Subject"] for msg in MockServer.instances[0].messages] == ["An example"]
+    assert email.connection is None
+
+def wait_sent(outbox, timeout=5):
+    start = time.time()
+    while len(outbox) and time.time() - start < timeout:
+        time.sleep(0.01)
+
+def test_set_outbox_live_settings(tmpdir, email):
+    outbox = email.set_outbox(tmpdir / "outbox.db")
+    # Set after starting the outbox
+    email.set_pool(max_size=1)
+    email.send(subject="An example")
+    wait_sent(outbox)
+    assert len(outbox) == 0
+    outbox.close()
+
+    assert email.pool.size == 1
+    email.pool.close()
+
+def test_set_outbox_error(tmpdir, email, monkeypatch):
+    outbox = Outbox(tmpdir / "outbox.db")
+    failed = threading.Event()
+    def drain(sender):
+        failed.set()
+        raise RuntimeError("Database is locked")
+    monkeypatch.setattr(outbox, "drain", drain)
+    with pytest.warns(RuntimeWarning, match="Database is locked"):
+        outbox.start(email, interval=10)
+        assert failed.wait(5)
+        outbox.stop()
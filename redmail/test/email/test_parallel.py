@@ -0,0 +1,72 @@
+import smtplib
+
+import pytest
+
+from mock_server import MockServer
+
+@pytest.fixture
+def email(email):
+    MockServer.delay = 0.01
+    MockServer.fail_subjects = {"fail": smtplib.SMTPSenderRefused(550, b"Rejected", "me@example.com")}
+    email.receivers = ["you@example.com"]
+    return email
+
+def test_send_parallel(email):
+    results = email.send_parallel(
+        ({"subject": f"Email {i}"} for i in range(20)),
+        n_connections=4
+    )
+    assert len(results) == 20
+    assert all(res.ok for res in results)
+
+    # Same order as given
+    sent = {msg["Message-ID"]: msg["Subject"] for server in MockServer.instances for msg in server.messages}
+    assert [sent[res.message_id] for res in results] == [f"Email {i}" for i in range(20)]
+
+    assert len(MockServer.instances) == 4
+    assert MockServer.max_active == 4
+    assert all(server.is_closed for server in MockServer.instances)
+    assert email.connection is None
+
+def test_in_flight(email):
+    consumed = []
+    def messages():
+        for i in range(10):
+            consumed.append(i)
+            # Workers (2) + queue (1) + the one being put
+            assert len(consumed) - len(get_sent()) <= 4
+            yield {"subject": f"Email {i}"}
+
+    def get_sent():
+        return [msg for server in MockServer.instances for msg in server.messages]
+
+    results = email.send_parallel(messages(), n_connections=2, max_in_flight=1)
+    assert len(results) == 10
+
+def test_error_budget(email):
+    consumed = []
+    def messages():
+        for i in range(100):
+            consumed.append(i)
+            yield {"subject": "fail" if i >= 5 else "ok"}
+
+    results = email.send_parallel(messages(), n_connections=2, max_errors=3)
+    assert [res.ok for res in results[:5]] == [True] * 5
+    assert sum(isinstance(res.error, smtplib.SMTPSenderRefused) for res in results) >= 4
+    # Stopped consuming
+    assert len(consumed) < 100
+    assert all(
+        isinstance(res.error, (smtplib.SMTPSenderRefused, RuntimeError))
+        for res in results[5:]
+    )
+
+def test_with_pool(email):
+    email.set_pool(max_size=2)
+    results = email.send_parallel(({"subject": f"Email {i}"} for i in range(10)), n_connections=4)
+    assert all(res.ok for res in results)
+    assert len(MockServer.instances) <= 2
+    email.pool.close()
+
+def test_invalid(email):
+    with pytest.raises(ValueError):
+        email.send_parallel([], n_connections=0)
@@ -0,0 +1,112 @@
+import smtplib
+import threading
+import time
+
+import pytest
+
+from redmail import EmailSender
+from redmail.email.pool import ConnectionPool
+
+from mock_server import MockServer
+
+def test_reuse():
+    email = EmailSender(host="localhost", port=0, cls_smtp=MockServer)
+    email.set_pool(max_size=2)
+    for _ in range(3):
+        email.send(subject="An example", receivers=['me@example.com'])
+
+    assert len(MockServer.instances) == 1
+    assert len(MockServer.instances[0].messages) == 3
+    assert email.connection is None
+    assert email.pool.size == 1
+    assert email.pool.n_idle == 1
+
+    email.pool.close()
+    assert MockServer.instances[0].is_closed
+    assert email.pool.size == 0
+
+def test_max_messages():
+    email = EmailSender(host="localhost", port=0, cls_smtp=MockServer)
+    email.set_pool(max_messages=2)
+    for _ in range(5):
+        email.send(subject="An example", receivers=['me@example.com'])
+
+    assert [len(server.messages) for server in MockServer.instances] == [2, 2, 1]
+    assert [server.is_closed for server in MockServer.instances] == [True, True, False]
+
+def test_idle_timeout():
+    pool = ConnectionPool(lambda: MockServer("localhost", 0), idle_timeout=0.01)
+    with pool.connection():
+        pass
+    time.sleep(0.02)
+    with pool.connection():
+        pass
+    assert len(MockServer.instances) == 2
+    assert MockServer.instances[0].is_closed
+
+def test_prune():
+    pool = ConnectionPool(lambda: MockServer("localhost", 0), idle_timeout=0.01)
+    with pool.connection():
+        pass
+    time.sleep(0.02)
+    pool.prune()
+    assert pool.size == 0
+    assert MockServer.instances[0].is_closed
+
+def test_health_check():
+    pool = ConnectionPool(lambda: MockServer("localhost", 0), health_check=0)
+    with pool.connection():
+        pass
+    MockServer.instances[0].is_broken = True
+    with pool.connection() as server:
+        assert server is MockServer.instances[1]
+    assert pool.size == 1
+
+def test_broken_connection_discarded():
+    pool = ConnectionPool(lambda: MockServer("localhost", 0))
+    with pytest.raises(smtplib.SMTPServerDisconnected):
+        with pool.connection() as server:
+            server.is_broken = True
+            server.send_message(None)
+    assert pool.size == 0
+    assert pool.n_idle == 0
+
+@pytest.mark.parametrize("code,is_discarded", [(550, False), (421, True)])
+def test_refused_connection(code, is_discarded):
+    pool = ConnectionPool(lambda: MockServer("localhost", 0))
+    with pytest.raises(smtplib.SMTPRecipientsRefused):
+        with pool.connection() as server:
+            raise smtplib.SMTPRecipientsRefused({"you@example.com": (code, b"Refused")})
+    assert pool.size == (0 if is_discarded else 1)
+
+def test_timeout():
+    pool = ConnectionPool(lambda: MockServer("localhost", 0), max_size=1, timeout=0.01)
+    conn = pool.acquire()
+    with pytest.raises(TimeoutError):
+        pool.acquire()
+    pool.release(conn)
+    assert pool.acquire() is conn
+
+def test_closed():
+    pool = ConnectionPool(lambda: MockServer("localhost", 0))
+    pool.close()
+    with pytest.raises(RuntimeError):
+        pool.acquire()
+
+def test_threads():
+    email = EmailSender(host="localhost", port=0, cls_smtp=MockServer)
+    email.set_pool(max_size=3)
+
+    def send():
+        for _ in range(10):
+            email.send(subject="An example", receivers=['me@example.com'])
+
+    threads = [threading.Thread(target=send) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(MockServer.instances) <= 3
+    assert sum(len(server.messages) for server in MockServer.instances) == 60
+    assert email.pool.size == email.pool.n_idle
@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from redmail import EmailSender
+from redmail.email import ratelimit
+from redmail.email.ratelimit import RateLimit, TokenBucket
+
+from mock_server import MockServer
+
+@pytest.fixture(autouse=True)
+def clear_shared(monkeypatch):
+    monkeypatch.setattr(ratelimit, "_shared", {})
+
+@pytest.fixture
+def clock(monkeypatch):
+    "Fake monotonic clock that sleeping advances"
+    clock = {"now": 0.0, "sleeps": []}
+    def sleep(secs):
+        clock["sleeps"].append(secs)
+        clock["now"] += secs
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: clock["now"])
+    monkeypatch.setattr(ratelimit.time, "sleep", sleep)
+    return clock
+
+def test_bucket(clock):
+    bucket = TokenBucket(rate=2, burst=3)
+    assert [bucket.reserve() for _ in range(3)] == [0, 0, 0]
+    # Empty, tokens are added 2 per second
+    assert bucket.reserve() == 0.5
+    assert bucket.reserve() == 1.0
+
+    clock["now"] += 10
+    # Refilled up to the burst
+    assert bucket.reserve(3) == 0
+    assert bucket.reserve(2) == 1.0
+
+def test_rate_limit(clock):
+    limit = RateLimit(messages_per_second=10, recipients_per_second=2, burst=4)
+    assert limit.reserve(n_recipients=4) == 0
+    # Recipients are the bottleneck
+    assert limit.reserve(n_recipients=1) == 0.5
+    limit.wait(n_recipients=1)
+    assert clock["sleeps"] == [1.0]
+
+def test_shared():
+    first = EmailSender(host="smtp.example.com", port=0, username="me")
+    second = EmailSender(host="smtp.example.com", port=0, username="me")
+    other = EmailSender(host="smtp.example.com", port=0, username="you")
+
+    limit = first.set_rate_limit(messages_per_second=5)
+    assert second.set_rate_limit(messages_per_second=5) is limit
+    assert other.set_rate_limit(messages_per_second=5) is not limit
+
+    # Reconfiguring applies to all of the senders
+    second.set_rate_limit(messages_per_second=1)
+    assert first.rate_limit is limit
+    assert limit.messages.rate == 1
+
+def test_send(clock):
+    email = EmailSender(host="localhost", port=0, cls_smtp=MockServer)
+    email.set_rate_limit(recipients_per_second=2, burst=2)
+    with email:
+        for _ in range(3):
+            email.send(
+                subject="An example",
+                sender="me@example.com",
+                receivers=["you@example.com"],
+                bcc=["secret@example.com"],
+            )
+        assert len(email.connection.messages) == 3
+    assert clock["sleeps"] == [1.0, 1.0]
+
+def test_wait_async(clock, monkeypatch):
+    sleeps = []
+    async def sleep(secs):
+        sleeps.append(secs)
+    monkeypatch.setattr(ratelimit.asyncio, "sleep", sleep)
+
+    limit = RateLimit(messages_per_second=1, burst=1)
+    async def main():
+        await limit.wait_async()
+        await limit.wait_async()
+    asyncio.run(main())
+    assert sleeps == [1.0]
+    # The event loop was not blocked
+    assert clock["sleeps"] == []
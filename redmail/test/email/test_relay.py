@@ -0,0 +1,180 @@
+import smtplib
+
+import pytest
+
+from redmail.email import relay as relay_module
+from redmail.email.relay import Relay, RelayGroup
+from redmail.email.retry import RetryPolicy
+
+from mock_server import MockServer
+
+@pytest.fixture(autouse=True)
+def configure_server():
+    MockServer.fail_subjects = {"rejected": smtplib.SMTPSenderRefused(550, b"Rejected", "me@example.com")}
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = {"now": 0.0}
+    monkeypatch.setattr(relay_module.time, "monotonic", lambda: clock["now"])
+    return clock
+
+@pytest.fixture
+def email(email):
+    email.username = "me"
+    email.receivers = ["you@example.com"]
+    return email
+
+def send(email, n, **kwargs):
+    for _ in range(n):
+        email.send(subject="An example", **kwargs)
+    return [server.host for server in MockServer.instances]
+
+def test_round_robin(email):
+    email.set_relays([
+        {"host": "first", "port": 0, "weight": 2},
+        {"host": "second", "port": 0, "username": "other"},
+    ])
+    assert send(email, 6) == ["first", "second", "first", "first", "second", "first"]
+    assert MockServer.instances[0].user == "me"
+    assert MockServer.instances[1].user == "other"
+
+def test_least_loaded():
+    group = RelayGroup([Relay("first", 0), Relay("second", 0, weight=2)], strategy="least_loaded")
+    first, second = group.relays
+    conns = [MockServer("localhost", 0) for _ in range(3)]
+    group.register(conns[0], second)
+    # Second has capacity for two
+    assert group.choose() is first
+    group.register(conns[1], first)
+    assert group.choose() is second
+    group.register(conns[2], second)
+    assert group.choose() is first
+
+    group.unregister(conns[1])
+    assert first.n_connections == 0
+    assert group.choose() is first
+
+def test_least_loaded_connections(email):
+    email.set_relays([
+        {"host": "first", "port": 0},
+        {"host": "second", "port": 0},
+    ], strategy="least_loaded")
+    first, second = email.relays.relays
+    email.set_pool(max_size=2)
+    servers = [email.pool.acquire(), email.pool.acquire()]
+    assert [conn.server.host for conn in servers] == ["first", "second"]
+    assert [first.n_connections, second.n_connections] == [1, 1]
+
+    email.pool.close()
+    for conn in servers:
+        email.pool.release(conn)
+    assert [first.n_connections, second.n_connections] == [0, 0]
+
+    with email:
+        assert email.connection.host == "first"
+        assert first.n_connections == 1
+    assert first.n_connections == 0
+
+def test_priority(email):
+    email.set_relays([
+        {"host": "backup", "port": 0, "priority": 1},
+        {"host": "primary", "port": 0},
+    ])
+    assert send(email, 2) == ["primary", "primary"]
+
+def test_failover(email, clock):
+    email.set_relays([
+        {"host": "first", "port": 0},
+        {"host": "second", "port": 0},
+    ], failure_threshold=2, recovery_timeout=30)
+    first, second = email.relays.relays
+    MockServer.down = {"first"}
+
+    assert send(email, 4) == ["second"] * 4
+    # Ejected after two failed connects
+    assert first.is_open
+    assert email.relays.healthy == [second]
+
+    # Probed after the recovery timeout
+    MockServer.down = set()
+    clock["now"] += 30
+    send(email, 1)
+    assert MockServer.instances[-1].host == "first"
+    assert not first.is_open
+    assert [relay.n_active for relay in email.relays.relays] == [0, 0]
+
+def test_failed_probe(email, clock):
+    email.set_relays([{"host": "first", "port": 0}, {"host": "second", "port": 0}], failure_threshold=1)
+    first, _ = email.relays.relays
+    MockServer.down = {"first"}
+    send(email, 1)
+    assert first.is_open
+
+    clock["now"] += 30
+    send(email, 1)
+    # Probe failed thus ejected again
+    assert first.is_open
+    assert first.opened_at == 30
+
+def test_failed_login(email):
+    email.set_relays([
+        {"host": "first", "port": 0, "username": "locked"},
+        {"host": "second", "port": 0},
+    ], failure_threshold=2)
+    first, second = email.relays.relays
+    MockServer.bad_logins = {"locked"}
+
+    send(email, 4)
+    assert [server.host for server in MockServer.instances if server.messages] == ["second"] * 4
+    # Ejected after two failed logins
+    assert first.is_open
+    assert email.relays.healthy == [second]
+    assert MockServer.instances[0].is_closed
+
+def test_interrupted_probe(clock):
+    group = RelayGroup([Relay("first", 0)], failure_threshold=1)
+    first, = group.relays
+    group.record_failure(first)
+    clock["now"] += 30
+    assert group.choose() is first
+    assert group.choose() is None
+
+    with pytest.raises(KeyboardInterrupt):
+        with group.sending(first):
+            raise KeyboardInterrupt
+    # Can be probed again
+    assert first.is_open
+    assert group.choose() is first
+
+def test_all_down(email):
+    email.set_relays([{"host": "first", "port": 0}, {"host": "second", "port": 0}], failure_threshold=1)
+    MockServer.down = {"first", "second"}
+    with pytest.raises(ConnectionRefusedError):
+        email.send(subject="An example")
+    with pytest.raises(ConnectionError, match="No healthy SMTP relays"):
+        email.send(subject="An example")
+
+def test_send_failure(email):
+    email.set_relays([{"host": "first", "port": 0}, {"host": "second", "port": 0}], failure_threshold=1)
+    email.retry = RetryPolicy(max_attempts=2, jitter=0)
+    email.retry.sleep = lambda delay: None
+    first, second = email.relays.relays
+    MockServer.busy = {"first"}
+
+    # Retried on the other relay
+    email.send(subject="An example")
+    assert first.is_open
+    assert [len(server.messages) for server in MockServer.instances] == [0, 1]
+
+    # Rejecting an email is not a failure of the relay
+    with pytest.raises(smtplib.SMTPSenderRefused):
+        email.send(subject="rejected")
+    assert not second.is_open
+
+def test_invalid():
+    with pytest.raises(ValueError):
+        RelayGroup([])
+    with pytest.raises(ValueError):
+        RelayGroup([Relay("first", 0)], strategy="random")
+    with pytest.raises(ValueError):
+        Relay("first", 0, weight=0)
@@ -0,0 +1,102 @@
+import smtplib
+
+import pytest
+
+from redmail.email.retry import RetryPolicy
+from redmail.email.utils import is_disconnect
+
+from mock_server import MockServer
+
+@pytest.fixture
+def email(email):
+    email.receivers = ["you@example.com"]
+    email.bcc = ["secret@example.com"]
+    email.retry = RetryPolicy(max_attempts=3, delay=1, jitter=0)
+    email.retry.sleep = lambda delay: None
+    return email
+
+def test_retry(email):
+    MockServer.failures = [
+        smtplib.SMTPServerDisconnected("Connection unexpectedly closed"),
+        smtplib.SMTPSenderRefused(451, b"Try again later", "me@example.com"),
+    ]
+    delays = []
+    email.retry.sleep = delays.append
+    msg = email.send(subject="An example")
+
+    assert len(MockServer.instances) == 3
+    assert all(server.is_closed for server in MockServer.instances)
+    sent = MockServer.instances[-1].messages
+    # Resent as bytes flattened once
+    assert len(sent) == 1
+    assert isinstance(sent[0], bytes)
+    assert msg["Message-ID"].encode() in sent[0]
+    assert b"secret@example.com" not in sent[0]
+    assert delays == [1, 2]
+
+def test_retry_gives_up(email):
+    MockServer.failures = [smtplib.SMTPResponseException(421, b"Busy")] * 3
+    with pytest.raises(smtplib.SMTPResponseException):
+        email.send(subject="An example")
+    assert len(MockServer.instances) == 3
+
+def test_no_retry_permanent(email):
+    MockServer.failures = [smtplib.SMTPRecipientsRefused({"you@example.com": (550, b"No such user")})]
+    with pytest.raises(smtplib.SMTPRecipientsRefused):
+        email.send(subject="An example")
+    assert len(MockServer.instances) == 1
+
+def test_retry_in_context(email):
+    MockServer.failures = [smtplib.SMTPServerDisconnected("Connection unexpectedly closed")]
+    with email:
+        email.send(subject="An example")
+        # Reconnected and kept open
+        assert email.is_alive
+        assert len(MockServer.instances) == 2
+        email.send(subject="Another")
+    assert len(MockServer.instances) == 2
+    assert len(MockServer.instances[1].messages) == 2
+
+def test_retry_recipients_disconnect(email):
+    email.retry = RetryPolicy(max_attempts=2, delay=1, jitter=0)
+    email.retry.sleep = lambda delay: None
+    # smtplib has closed the connection when RCPT got 421
+    MockServer.failures = [smtplib.SMTPRecipientsRefused({"you@example.com": (421, b"Closing connection")})]
+    with email:
+        email.send(subject="An example")
+        assert len(MockServer.instances) == 2
+        assert MockServer.instances[0].is_closed
+        assert len(MockServer.instances[1].messages) == 1
+
+def test_stale_connection_cleared(email):
+    email.retry = None
+    MockServer.failures = [smtplib.SMTPServerDisconnected("Connection unexpectedly closed")]
+    with email:
+        with pytest.raises(smtplib.SMTPServerDisconnected):
+            email.send(subject="An example")
+        assert not email.is_alive
+        assert email.connection is None
+
+def test_send_many_retry(email):
+    MockServer.failures = [smtplib.SMTPResponseException(421, b"Busy")]
+    results = email.send_many([{"subject": "An example"}, {"subject": "Another"}])
+    assert [res.ok for res in results] == [True, True]
+    assert len(MockServer.instances) == 2
+
+def test_delay():
+    retry = RetryPolicy(delay=1, backoff_factor=2, max_delay=5, jitter=0.1)
+    assert 0.9 <= retry.get_delay(1) <= 1.1
+    assert 3.6 <= retry.get_delay(3) <= 4.4
+    assert 4.5 <= retry.get_delay(10) <= 5.5
+
+@pytest.mark.parametrize("exc,expected", [
+    (smtplib.SMTPServerDisconnected("Connection unexpectedly closed"), True),
+    (ConnectionRefusedError("Connection refused"), True),
+    (smtplib.SMTPSenderRefused(421, b"Closing connection", "me@example.com"), True),
+    (smtplib.SMTPRecipientsRefused({"you@example.com": (421, b"Closing connection")}), True),
+    (smtplib.SMTPRecipientsRefused({"you@example.com": (550, b"No such user")}), False),
+    (smtplib.SMTPSenderRefused(451, b"Try again later", "me@example.com"), False),
+    (ValueError("Invalid"), False),
+])
+def test_is_disconnect(exc, expected):
+    assert is_disconnect(exc) is expected
@@ -1,30 +1,11 @@
 
 from email.message import EmailMessage
+import time
 import pytest
 
 from redmail import EmailSender, send_email
 
-class MockServer:
-
-    def __init__(self, host, port):
-        self.host = host
-        self.port = port
-        self.is_login = False
-
-    def starttls(self):
-        return
-
-    def login(self, user=None, password=None):
-        self.is_login = True
-        self.user = user
-        self.password = password
-        return
-
-    def send_message(self, msg):
-        return
-
-    def quit(self):
-        return
+from mock_server import MockServer
 
 def test_send():
     email = EmailSender(host="localhost", port=0, cls_smtp=MockServer)
@@ -78,4 +59,30 @@ def test_send_multi():
 def test_send_function():
     # This should fail but we test everything else goes through
     with pytest.raises(ConnectionRefusedError):
-        send_email(host="localhost", port=0, subject="An example")
\ No newline at end of file
+        send_email(host="localhost", port=0, subject="An example")
+
+def test_is_alive_probe(monkeypatch):
+    email = EmailSender(host="localhost", port=0, cls_smtp=MockServer)
+    email.noop_interval = 10
+
+    now = [0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    with email:
+        server = email.connection
+        # Recently used, not probed
+        email.send(subject="An example", receivers=['me@example.com'])
+        assert email.is_alive
+        assert server.n_noops == 0
+
+        now[0] = 20
+        assert email.is_alive
+        assert server.n_noops == 1
+
+        # Server closed the idle connection
+        now[0] = 40
+        server.is_broken = True
+        email.send(subject="An example", receivers=['me@example.com'])
+        assert len(MockServer.instances) == 2
+        assert email.connection is MockServer.instances[1]
+        assert len(email.connection.messages) == 1
+    assert email.connection is None
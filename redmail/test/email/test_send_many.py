@@ -0,0 +1,93 @@
+import smtplib
+
+import pytest
+
+from redmail import EmailSender
+
+from mock_server import MockServer
+
+@pytest.fixture(autouse=True)
+def configure_server():
+    MockServer.refuse = {"refused@example.com", "partly@example.com"}
+    MockServer.fail_subjects = {"disconnect": smtplib.SMTPServerDisconnected("Connection unexpectedly closed")}
+
+def test_send_many():
+    email = EmailSender(host="localhost", port=0, cls_smtp=MockServer)
+    email.sender = "me@example.com"
+    results = email.send_many(
+        {"subject": "An example", "receivers": [rcpt]}
+        for rcpt in ["you@example.com", "refused@example.com", "he@example.com"]
+    )
+    assert [res.ok for res in results] == [True, False, True]
+
+    assert len(MockServer.instances) == 1
+    server = MockServer.instances[0]
+    assert server.is_closed
+    assert len(server.messages) == 2
+    assert email.connection is None
+
+    ok = results[0]
+    assert ok.code is None
+    assert ok.accepted == ["you@example.com"]
+    assert ok.refused == {}
+    assert ok.message_id == server.messages[0]["Message-ID"]
+    assert ok.elapsed >= 0
+
+    failed = results[1]
+    assert isinstance(failed.error, smtplib.SMTPRecipientsRefused)
+    assert failed.accepted == []
+    assert failed.refused == {"refused@example.com": (550, b"No such user")}
+
+def test_send_many_partly_refused():
+    email = EmailSender(host="localhost", port=0, cls_smtp=MockServer)
+    msg = email.get_message(
+        sender="me@example.com",
+        subject="An example",
+        receivers=["you@example.com", "partly@example.com"],
+    )
+    results = email.send_many([msg])
+    assert results[0].ok
+    assert results[0].accepted == ["you@example.com"]
+    assert results[0].refused == {"partly@example.com": (550, b"No such user")}
+
+def test_send_many_reconnect():
+    email = EmailSender(host="localhost", port=0, cls_smtp=MockServer)
+    results = email.send_many(
+        {"sender": "me@example.com", "subject": subject, "receivers": ["you@example.com"]}
+        for subject in ["An example", "disconnect", "Another"]
+    )
+    assert [res.ok for res in results] == [True, False, True]
+    assert isinstance(results[1].error, smtplib.SMTPServerDisconnected)
+    assert len(MockServer.instances) == 2
+    assert all(server.is_closed for server in MockServer.instances)
+
+def test_send_many_invalid_message():
+    email = EmailSender(host="localhost", port=0, cls_smtp=MockServer)
+    results = email.send_many([
+        {"receivers": ["you@example.com"]},
+        {"sender": "me@example.com", "subject": "An example", "receivers": ["you@example.com"]},
+    ])
+    assert isinstance(results[0].error, ValueError)
+    assert results[0].message_id is None
+    assert results[1].ok
+
+def test_send_many_existing_connection():
+    email = EmailSender(host="localhost", port=0, cls_smtp=MockServer)
+    with email:
+        email.send_many([
+            {"sender": "me@example.com", "subject": "An example", "receivers": ["you@example.com"]},
+        ])
+        assert email.is_alive
+        assert not MockServer.instances[0].is_closed
+    assert MockServer.instances[0].is_closed
+
+def test_send_many_pool():
+    email = EmailSender(host="localhost", port=0, cls_smtp=MockServer)
+    email.set_pool(max_size=2)
+    results = email.send_many(
+        {"sender": "me@example.com", "subject": "An example", "receivers": ["you@example.com"]}
+        for _ in range(3)
+    )
+    assert all(res.ok for res in results)
+    assert len(MockServer.instances) == 1
+    assert email.pool.n_idle == 1
@@ -0,0 +1,148 @@
+import os
+import smtplib
+from email.generator import BytesGenerator
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+
+from redmail import EmailSender
+from redmail.email.attachment import FileAttachment
+from redmail.email.streaming import is_ascii_envelope, iter_message_bytes, send_streaming
+
+from mock_server import MockServer
+
+def flatten(msg):
+    buffer = BytesIO()
+    BytesGenerator(buffer).flatten(msg, linesep="\r\n")
+    return buffer.getvalue()
+
+@pytest.fixture
+def big_file(tmpdir):
+    path = tmpdir.join("data.bin")
+    path.write_binary(os.urandom(200_000))
+    return str(path)
+
+def test_file_attachment_payload(big_file):
+    part = FileAttachment(big_file)
+    assert part['Content-Transfer-Encoding'] == 'base64'
+    with open(big_file, "rb") as f:
+        assert part.get_payload(decode=True) == f.read()
+
+    chunks = list(part.iter_encoded())
+    assert len(chunks) > 1
+    assert b"".join(chunks) == part.get_payload().replace("\n", "\r\n").encode()
+
+def test_iter_message_bytes(big_file):
+    email = EmailSender(host=None, port=1234)
+    msg = email.get_message(
+        sender="me@example.com",
+        receivers=["you@example.com"],
+        subject="Some news",
+        html="<h1>Hi,</h1>",
+        attachments={"data.bin": Path(big_file), "data.txt": "Some content"},
+    )
+    assert b"".join(iter_message_bytes(msg)) == flatten(msg)
+
+def test_send_streaming(big_file):
+    email = EmailSender(host=None, port=1234)
+    msg = email.get_message(
+        sender="me@example.com",
+        receivers=["you@example.com", "refused@example.com"],
+        bcc=["secret@example.com"],
+        subject="Some news",
+        text=".starts with a period\n.and this too",
+        attachments=[big_file],
+    )
+    # Set the boundaries
+    flatten(msg)
+
+    MockServer.refuse = {"refused@example.com"}
+    server = MockServer()
+    refused = send_streaming(server, msg)
+    assert refused == {"refused@example.com": (550, b"No such user")}
+    assert server.commands == [
+        ("mail", "me@example.com"),
+        ("rcpt", "you@example.com"),
+        ("rcpt", "refused@example.com"),
+        ("rcpt", "secret@example.com"),
+        ("data",),
+    ]
+
+    # Same data as smtplib would send
+    del msg["Bcc"]
+    expected = smtplib._quote_periods(flatten(msg)) + b".\r\n"
+    assert server.data == expected
+    assert b"secret@example.com" not in server.data
+
+def test_send_file_not_read_in_full(big_file, monkeypatch):
+    read_bytes = Path.read_bytes
+    def guarded(self):
+        if str(self) == big_file:
+            raise AssertionError("Attachment was read in full")
+        return read_bytes(self)
+    monkeypatch.setattr(Path, "read_bytes", guarded)
+
+    email = EmailSender(host=None, port=1234, cls_smtp=MockServer)
+    server = MockServer()
+    email.connection = server
+    email.noop_interval = None
+    msg = email.get_message(
+        sender="me@example.com",
+        receivers=["you@example.com"],
+        subject="Some news",
+        attachments=[big_file],
+    )
+    list(msg.walk())
+    email.send_message(msg)
+    assert server.commands[-1] == ("data",)
+    assert server.messages == []
+    assert server.data.endswith(b"\r\n.\r\n")
+    assert len(server.data) > 200_000
+
+@pytest.mark.parametrize("from_addr,to_addrs,expected", [
+    ("me@example.com", ["you@example.com"], True),
+    ("me@example.com", ["you@example.com", "jäger@example.com"], False),
+    ("mé@example.com", [], False),
+])
+def test_is_ascii_envelope(from_addr, to_addrs, expected):
+    assert is_ascii_envelope(from_addr, to_addrs) is expected
+
+def test_send_streaming_all_refused(big_file):
+    email = EmailSender(host=None, port=1234)
+    msg = email.get_message(
+        sender="me@example.com",
+        receivers=["refused@example.com"],
+        subject="Some news",
+        attachments=[big_file],
+    )
+    MockServer.refuse = {"refused@example.com"}
+    server = MockServer()
+    with pytest.raises(smtplib.SMTPRecipientsRefused):
+        send_streaming(server, msg)
+    assert server.commands[-1] == ("rset",)
+    assert server.data == b""
+
+def test_send_uses_streaming(big_file):
+    servers = []
+    def create_server(host, port):
+        server = MockServer()
+        servers.append(server)
+        return server
+
+    email = EmailSender(host="localhost", port=0, cls_smtp=create_server)
+    email.send(
+        sender="me@example.com",
+        receivers=["you@example.com"],
+        subject="Some news",
+        attachments=[big_file],
+    )
+    email.send(
+        sender="me@example.com",
+        receivers=["you@example.com"],
+        subject="Some news",
+        attachments={"data.txt": "Some content"},
+    )
+    assert servers[0].data.endswith(b"\r\n.\r\n")
+    assert servers[0].messages == []
+    assert len(servers[1].messages) == 1
@@ -0,0 +1,96 @@
+import asyncio
+import base64
+
+class AsyncSMTPServer:
+    """Minimal asyncio SMTP server for testing
+
+    Supports EHLO, AUTH PLAIN, MAIL, RCPT, DATA, RSET, NOOP and QUIT.
+    Recipients starting with "refused" are rejected and messages
+    with the subject "slow" are answered after ``delay`` seconds."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.messages = []
+        self.logins = []
+        self.n_connections = 0
+        self.n_active = 0
+        self.max_active = 0
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(self, reader, writer):
+        self.n_connections += 1
+        self.n_active += 1
+        self.max_active = max(self.n_active, self.max_active)
+
+        def reply(line):
+            writer.write(line.encode() + b"\r\n")
+
+        reply("220 localhost ESMTP test")
+        envelope = {"rcpt": []}
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                cmd = line.decode().strip()
+                verb = cmd.split(" ")[0].upper()
+                if verb in ("EHLO", "HELO"):
+                    reply("250-localhost")
+                    reply("250 AUTH PLAIN")
+                elif verb == "AUTH":
+                    creds = base64.b64decode(cmd.split(" ")[2]).split(b"\0")
+                    self.logins.append((creds[1].decode(), creds[2].decode()))
+                    reply("235 Authentication successful")
+                elif verb == "MAIL":
+                    envelope = {"from": cmd[10:].strip("<>"), "rcpt": []}
+                    reply("250 OK")
+                elif verb == "RCPT":
+                    rcpt = cmd[8:].strip("<>")
+                    if rcpt.startswith("refused"):
+                        reply("550 No such user")
+                    elif rcpt.startswith("closing"):
+                        reply("421 Closing connection")
+                        await writer.drain()
+                        break
+                    else:
+                        envelope["rcpt"].append(rcpt)
+                        reply("250 OK")
+                elif verb == "DATA":
+                    reply("354 End data with <CR><LF>.<CR><LF>")
+                    data = b""
+                    while True:
+                        data_line = await reader.readline()
+                        if data_line == b".\r\n":
+                            break
+                        data += data_line
+                    envelope["data"] = data
+                    if b"Subject: slow" in data:
+                        await asyncio.sleep(self.delay)
+                    self.messages.append(envelope)
+                    reply("250 Message accepted")
+                elif verb == "RSET":
+                    envelope = {"rcpt": []}
+                    reply("250 OK")
+                elif verb == "NOOP":
+                    reply("250 OK")
+                elif verb == "QUIT":
+                    reply("221 Bye")
+                    await writer.drain()
+                    break
+                else:
+                    reply("502 Command not implemented")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # Client disconnected or the test ended
+            pass
+        finally:
+            self.n_active -= 1
+            writer.close()
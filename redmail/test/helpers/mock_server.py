@@ -0,0 +1,167 @@
+import smtplib
+import threading
+import time
+from email.parser import BytesHeaderParser
+
+from redmail.email.streaming import get_envelope
+
+class MockServer:
+    """Mock of smtplib.SMTP
+
+    The sent emails are stored to ``messages`` (the
+    message if sent with ``send_message`` and bytes if
+    with ``sendmail``) and the envelopes to ``transactions``.
+    Streamed emails are stored to ``commands`` and ``data``.
+
+    The behaviour is configured with the class attributes
+    (reset before each test):
+
+    - ``down``: hosts refusing the connection
+    - ``busy``: hosts replying 421 to the sender
+    - ``refuse``: recipients replied 550
+    - ``bad_logins``: users whose login is refused
+    - ``fail_subjects``: errors raised by sending emails with the subject
+    - ``failures``: errors raised by the next sends
+    - ``delay``: seconds each send takes
+    """
+
+    instances = []
+    down = set()
+    busy = set()
+    refuse = set()
+    bad_logins = set()
+    fail_subjects = {}
+    failures = []
+    delay = 0
+
+    # Concurrent sends
+    n_active = 0
+    max_active = 0
+    lock = threading.Lock()
+
+    def __init__(self, host=None, port=None):
+        if host in self.down:
+            raise ConnectionRefusedError("Connection refused")
+        self.host = host
+        self.port = port
+        self.user = None
+        self.password = None
+        self.n_noops = 0
+        self.messages = []
+        self.transactions = []
+        self.is_closed = False
+        self.is_broken = False
+        # Event the sends wait for (if set)
+        self.gate = None
+
+        self.commands = []
+        self.data = b""
+        self._replies = []
+        with self.lock:
+            self.instances.append(self)
+
+    @classmethod
+    def reset(cls):
+        cls.instances = []
+        cls.down = set()
+        cls.busy = set()
+        cls.refuse = set()
+        cls.bad_logins = set()
+        cls.fail_subjects = {}
+        cls.failures = []
+        cls.delay = 0
+        cls.n_active = 0
+        cls.max_active = 0
+
+    def starttls(self):
+        return
+
+    def login(self, user=None, password=None):
+        if user in self.bad_logins:
+            raise smtplib.SMTPAuthenticationError(535, b"Authentication failed")
+        self.user = user
+        self.password = password
+
+    def noop(self):
+        self.n_noops += 1
+        self._check_broken()
+        return 250, b"OK"
+
+    def send_message(self, msg, from_addr=None, to_addrs=None):
+        self._check_broken()
+        default_from, default_to = get_envelope(msg)
+        from_addr = default_from if from_addr is None else from_addr
+        to_addrs = default_to if to_addrs is None else to_addrs
+        return self._send(from_addr, to_addrs, msg, subject=msg["Subject"])
+
+    def sendmail(self, from_addr, to_addrs, data):
+        self._check_broken()
+        subject = BytesHeaderParser().parsebytes(data)["Subject"]
+        return self._send(from_addr, to_addrs, data, subject=subject)
+
+    def quit(self):
+        self.is_closed = True
+
+    def close(self):
+        self.is_closed = True
+
+    def _check_broken(self):
+        if self.is_broken:
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+
+    def _send(self, from_addr, to_addrs, content, subject):
+        cls = type(self)
+        if self.gate is not None:
+            self.gate.wait()
+        with self.lock:
+            cls.n_active += 1
+            cls.max_active = max(cls.max_active, cls.n_active)
+        try:
+            if self.delay:
+                time.sleep(self.delay)
+            if self.failures:
+                raise self.failures.pop(0)
+            if self.host in self.busy:
+                raise smtplib.SMTPSenderRefused(421, b"Service not available", from_addr)
+            if subject in self.fail_subjects:
+                raise self.fail_subjects[subject]
+            refused = {addr: (550, b"No such user") for addr in to_addrs if addr in self.refuse}
+            if to_addrs and len(refused) == len(to_addrs):
+                raise smtplib.SMTPRecipientsRefused(refused)
+            self.messages.append(content)
+            self.transactions.append((from_addr, list(to_addrs), content))
+            return refused
+        finally:
+            with self.lock:
+                cls.n_active -= 1
+
+    # Commands used when streaming
+
+    def ehlo_or_helo_if_needed(self):
+        return
+
+    def mail(self, sender):
+        self.commands.append(("mail", sender))
+        return 250, b"OK"
+
+    def rcpt(self, rcpt):
+        self.commands.append(("rcpt", rcpt))
+        if rcpt in self.refuse:
+            return 550, b"No such user"
+        return 250, b"OK"
+
+    def rset(self):
+        self.commands.append(("rset",))
+        return 250, b"OK"
+
+    def putcmd(self, cmd):
+        self.commands.append((cmd,))
+        self._replies.append((354, b"Go ahead"))
+
+    def send(self, data):
+        self.data += data
+        if self.data.endswith(b"\r\n.\r\n"):
+            self._replies.append((250, b"Accepted"))
+
+    def getreply(self):
+        return self._replies.pop(0)
@@ -6,4 +6,7 @@ import pytest
 def logger():
     logger = logging.getLogger("_test")
     logger.handlers = []
-    return logger
\ No newline at end of file
+    yield logger
+    for hdlr in logger.handlers[:]:
+        logger.removeHandler(hdlr)
+        hdlr.close()
\ No newline at end of file
@@ -178,3 +178,68 @@ def test_emit(logger, kwargs, exp_headers, exp_payload):
 
     structure = payloads_to_dict(msg)
     assert structure == exp_payload
+
+def _create_throttled(msgs, **kwargs):
+    hdlr = EmailHandler(
+        email=EmailSender(host="localhost", port=0),
+        subject="Log: {record.levelname}",
+        receivers=["he@example.com"],
+        **kwargs
+    )
+    hdlr.email.send_message = _create_dummy_send(msgs)
+    return hdlr
+
+def test_dedup(logger):
+    msgs = []
+    hdlr = _create_throttled(msgs, dedup_window=60)
+    logger.addHandler(hdlr)
+    logger.setLevel(logging.INFO)
+
+    for i in range(5):
+        logger.error("Failed: %s", i)
+    logger.warning("Failed: %s", 0)
+    assert [msg.get_payload() for msg in msgs] == ["Failed: 0\n", "Failed: 0\n"]
+
+    hdlr.close()
+    assert len(msgs) == 3
+    assert msgs[2]["Subject"] == "Log: ERROR"
+    assert msgs[2].get_payload() == "Suppressed log records:\n[4x] Failed: 4\n"
+
+def test_dedup_window_ends(logger):
+    msgs = []
+    hdlr = _create_throttled(msgs, dedup_window=0.1)
+    logger.addHandler(hdlr)
+
+    for _ in range(2):
+        logger.error("Failed")
+    hdlr._timer.join()
+    assert [msg.get_payload() for msg in msgs] == ["Failed\n", "Suppressed log records:\n[1x] Failed\n"]
+
+    # Window has ended
+    for _ in range(1):
+        logger.error("Failed")
+    assert len(msgs) == 3
+
+def test_dedup_exceptions(logger):
+    msgs = []
+    hdlr = _create_throttled(msgs, dedup_window=60)
+    logger.addHandler(hdlr)
+
+    for exc in (ValueError, ValueError, TypeError):
+        try:
+            raise exc("Oops")
+        except Exception:
+            logger.exception("Failed")
+    assert len(msgs) == 2
+
+def test_max_per_minute(logger):
+    msgs = []
+    hdlr = _create_throttled(msgs, max_per_minute=2)
+    logger.addHandler(hdlr)
+
+    for i in (0, 1, 2, 3, 3):
+        logger.error(f"Failed {i}")
+    assert [msg.get_payload() for msg in msgs] == ["Failed 0\n", "Failed 1\n"]
+
+    hdlr.close()
+    assert msgs[2].get_payload() == "Suppressed log records:\n[2x] Failed 3\n[1x] Failed 2\n"
@@ -0,0 +1,135 @@
+import logging
+import smtplib
+import threading
+
+import pytest
+
+from redmail import EmailHandler, MultiEmailHandler, log
+from redmail.log import EmailDispatcher
+
+from mock_server import MockServer
+
+@pytest.fixture(autouse=True)
+def configure_server():
+    MockServer.fail_subjects = {"disconnect": smtplib.SMTPServerDisconnected("Connection unexpectedly closed")}
+
+def get_messages():
+    return [msg for server in MockServer.instances for msg in server.messages]
+
+def test_emit_async(logger):
+    hdlr = EmailHandler(
+        host="localhost", port=0, cls_smtp=MockServer,
+        sender="me@example.com", receivers=["you@example.com"],
+        subject="Record: {record.levelname}",
+        asynchronous=True,
+    )
+    logger.addHandler(hdlr)
+
+    logger.warning("first")
+    logger.error("second")
+    hdlr.dispatcher.join()
+
+    # Same connection is reused
+    assert len(MockServer.instances) == 1
+    assert not MockServer.instances[0].is_closed
+    assert [msg["Subject"] for msg in get_messages()] == ["Record: WARNING", "Record: ERROR"]
+    assert get_messages()[1].get_payload() == "second\n"
+
+    hdlr.close()
+    assert MockServer.instances[0].is_closed
+    assert hdlr.dispatcher._thread is None
+
+def test_emit_async_error(logger, monkeypatch):
+    errors = []
+    hdlr = EmailHandler(
+        host="localhost", port=0, cls_smtp=MockServer,
+        sender="me@example.com", receivers=["you@example.com"],
+        subject="{record.msg}",
+        asynchronous=True,
+    )
+    monkeypatch.setattr(hdlr, "handleError", errors.append)
+    logger.addHandler(hdlr)
+
+    logger.warning("disconnect")
+    logger.warning("after")
+    hdlr.close()
+
+    assert [rec.msg for rec in errors] == ["disconnect"]
+    assert [msg["Subject"] for msg in get_messages()] == ["after"]
+    assert len(MockServer.instances) == 2
+
+@pytest.mark.parametrize("overflow,expected", [
+    pytest.param("drop_oldest", ["first", "fourth"], id="drop oldest"),
+    pytest.param("drop_newest", ["first", "second"], id="drop newest"),
+])
+def test_overflow(logger, overflow, expected):
+    hdlr = EmailHandler(
+        host="localhost", port=0, cls_smtp=MockServer,
+        sender="me@example.com", receivers=["you@example.com"],
+        subject="{record.msg}",
+    )
+    hdlr.set_async(queue_size=1, overflow=overflow)
+    logger.addHandler(hdlr)
+
+    gate = threading.Event()
+    hdlr.email.connect()
+    hdlr.email.connection.gate = gate
+
+    logger.warning("first")
+    # Wait until the worker is sending the first
+    while hdlr.dispatcher.queue.qsize():
+        pass
+    logger.warning("second")
+    logger.warning("third")
+    logger.warning("fourth")
+    gate.set()
+    hdlr.close()
+
+    assert [msg["Subject"] for msg in get_messages()] == expected
+    assert hdlr.dispatcher.n_dropped == 2
+
+def test_invalid_overflow():
+    hdlr = EmailHandler(host="localhost", port=0, receivers=["you@example.com"], subject="A log record")
+    with pytest.raises(ValueError):
+        hdlr.set_async(overflow="explode")
+
+def test_flush_async(logger):
+    hdlr = MultiEmailHandler(
+        host="localhost", port=0, cls_smtp=MockServer,
+        sender="me@example.com", receivers=["you@example.com"],
+        subject="Logs: {min_level_name} - {max_level_name}",
+        capacity=2,
+        asynchronous=True,
+    )
+    logger.addHandler(hdlr)
+    logger.setLevel(logging.WARNING)
+    logger.warning("first")
+    logger.error("second")
+    logger.info("third")
+    assert hdlr.buffer == []
+    hdlr.dispatcher.join()
+    assert [msg["Subject"] for msg in get_messages()] == ["Logs: WARNING - ERROR"]
+
+    # Closing flushes the rest
+    logger.setLevel(logging.INFO)
+    logger.info("fourth")
+    hdlr.close()
+    assert [msg["Subject"] for msg in get_messages()] == ["Logs: WARNING - ERROR", "Logs: INFO - INFO"]
+    assert isinstance(hdlr.dispatcher, EmailDispatcher)
+
+def test_exit_timeout(logger):
+    MockServer.delay = 0.2
+    hdlr = EmailHandler(
+        host="localhost", port=0, cls_smtp=MockServer,
+        sender="me@example.com", receivers=["you@example.com"],
+        subject="{record.msg}",
+        asynchronous=True,
+    )
+    hdlr.dispatcher.exit_timeout = 0.05
+    logger.addHandler(hdlr)
+
+    for i in range(3):
+        logger.warning(f"Record {i}")
+    # The stalled server does not block the exit
+    with pytest.warns(RuntimeWarning, match="log emails were not sent"):
+        log._close_dispatchers()
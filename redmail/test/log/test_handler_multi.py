@@ -1,4 +1,5 @@
 
+import threading
 import pytest
 from redmail import EmailSender
 from redmail import MultiEmailHandler
@@ -228,7 +229,7 @@ def test_flush_multiple(logger):
 
     assert text == "Records: \nINFO - an info\nDEBUG - a debug\n"
 
-def test_flush_none():
+def test_flush_none(logger):
     msgs = []
     hdlr = MultiEmailHandler(
         email=EmailSender(host="localhost", port=0),
@@ -238,7 +239,6 @@ def test_flush_none():
     )
     hdlr.email.send_message = _create_dummy_send(msgs)
     
-    logger = logging.getLogger("_test")
     logger.addHandler(hdlr)
     logger.setLevel(logging.DEBUG)
     
@@ -262,4 +262,192 @@ def test_flush_none():
         'MIME-Version': '1.0',
     }
 
-    assert text == "Records: \n"
\ No newline at end of file
+    assert text == "Records: \n"
+
+def test_flush_interval(logger):
+    msgs = []
+    hdlr = MultiEmailHandler(
+        email=EmailSender(host="localhost", port=0),
+        subject="Logs: {min_level_name} - {max_level_name}", 
+        receivers=["he@example.com"],
+        flush_interval=0.2,
+    )
+    hdlr.email.send_message = _create_dummy_send(msgs)
+
+    logger.addHandler(hdlr)
+    logger.setLevel(logging.DEBUG)
+
+    logger.info("first")
+    logger.warning("second")
+    assert msgs == []
+    timer = hdlr._timer
+    timer.join()
+    assert [msg["Subject"] for msg in msgs] == ["Logs: INFO - WARNING"]
+    assert hdlr.buffer == []
+    assert hdlr._timer is None
+
+    # Next record starts a new interval
+    logger.error("third")
+    hdlr._timer.join()
+    assert [msg["Subject"] for msg in msgs] == ["Logs: INFO - WARNING", "Logs: ERROR - ERROR"]
+
+def test_flush_interval_capacity(logger):
+    msgs = []
+    hdlr = MultiEmailHandler(
+        email=EmailSender(host="localhost", port=0),
+        subject="Logs: {min_level_name} - {max_level_name}", 
+        receivers=["he@example.com"],
+        capacity=2,
+        flush_interval=60,
+    )
+    hdlr.email.send_message = _create_dummy_send(msgs)
+
+    logger.addHandler(hdlr)
+    logger.setLevel(logging.DEBUG)
+
+    logger.info("first")
+    timer = hdlr._timer
+    logger.warning("second")
+
+    # Capacity reached before the interval
+    assert [msg["Subject"] for msg in msgs] == ["Logs: INFO - WARNING"]
+    assert hdlr._timer is None
+    timer.join(1)
+    assert not timer.is_alive()
+
+def test_flush_not_blocking(logger):
+    msgs = []
+    logged = []
+    hdlr = MultiEmailHandler(
+        email=EmailSender(host="localhost", port=0),
+        subject="Logs: {min_level_name} - {max_level_name}", 
+        receivers=["he@example.com"],
+    )
+
+    logger.addHandler(hdlr)
+    logger.setLevel(logging.DEBUG)
+
+    def send_message(msg):
+        # Logging from another thread is not blocked by sending
+        thread = threading.Thread(target=lambda: logged.append(logger.info("during sending")))
+        thread.start()
+        thread.join(5)
+        assert not thread.is_alive()
+        msgs.append(msg)
+    hdlr.email.send_message = send_message
+
+    logger.info("first")
+    hdlr.flush()
+    assert len(msgs) == 1
+    assert [rec.msg for rec in hdlr.buffer] == ["during sending"]
+
+def test_flush_failure_keeps_records(logger):
+    hdlr = MultiEmailHandler(
+        email=EmailSender(host="localhost", port=0),
+        subject="Logs: {min_level_name} - {max_level_name}", 
+        receivers=["he@example.com"],
+    )
+    def send_message(msg):
+        raise ConnectionError("Server down")
+    hdlr.email.send_message = send_message
+
+    logger.addHandler(hdlr)
+    logger.setLevel(logging.DEBUG)
+
+    logger.info("first")
+    with pytest.raises(ConnectionError):
+        hdlr.flush()
+    assert [rec.msg for rec in hdlr.buffer] == ["first"]
+
+    # Sent by the next flush
+    msgs = []
+    hdlr.email.send_message = _create_dummy_send(msgs)
+    hdlr.flush()
+    assert [msg["Subject"] for msg in msgs] == ["Logs: INFO - INFO"]
+    assert hdlr.buffer == []
+
+def test_flush_level(logger):
+    msgs = []
+    hdlr = MultiEmailHandler(
+        email=EmailSender(host="localhost", port=0),
+        subject="Logs: {min_level_name} - {max_level_name}", 
+        receivers=["he@example.com"],
+        capacity=10,
+        flush_level=logging.ERROR,
+    )
+    hdlr.email.send_message = _create_dummy_send(msgs)
+
+    logger.addHandler(hdlr)
+    logger.setLevel(logging.DEBUG)
+
+    logger.info("context")
+    logger.warning("more context")
+    assert msgs == []
+    logger.critical("failure")
+    assert [msg["Subject"] for msg in msgs] == ["Logs: INFO - CRITICAL"]
+    assert hdlr.buffer == []
+
+def _create_lock_checking_send(lock, msgs:list):
+    def send_message(msg):
+        # Logging from another thread is not blocked by sending
+        thread = threading.Thread(target=lambda: (lock.acquire(), lock.release()))
+        thread.start()
+        thread.join(5)
+        assert not thread.is_alive()
+        msgs.append(msg)
+    return send_message
+
+def test_flush_capacity_not_blocking(logger):
+    msgs = []
+    hdlr = MultiEmailHandler(
+        email=EmailSender(host="localhost", port=0),
+        subject="Logs: {min_level_name} - {max_level_name}", 
+        receivers=["he@example.com"],
+        capacity=2,
+    )
+    hdlr.email.send_message = _create_lock_checking_send(hdlr.lock, msgs)
+
+    logger.addHandler(hdlr)
+    logger.setLevel(logging.DEBUG)
+
+    logger.info("first")
+    logger.warning("second")
+    assert [msg["Subject"] for msg in msgs] == ["Logs: INFO - WARNING"]
+    assert hdlr.buffer == []
+
+def test_flush_interval_not_blocking(logger):
+    msgs = []
+    hdlr = MultiEmailHandler(
+        email=EmailSender(host="localhost", port=0),
+        subject="Logs: {min_level_name} - {max_level_name}", 
+        receivers=["he@example.com"],
+        flush_interval=0.1,
+    )
+    hdlr.email.send_message = _create_lock_checking_send(hdlr.lock, msgs)
+
+    logger.addHandler(hdlr)
+    logger.setLevel(logging.DEBUG)
+
+    logger.info("first")
+    hdlr._timer.join(5)
+    assert [msg["Subject"] for msg in msgs] == ["Logs: INFO - INFO"]
+    assert hdlr.buffer == []
+
+def test_emit_directly():
+    msgs = []
+    hdlr = MultiEmailHandler(
+        email=EmailSender(host="localhost", port=0),
+        subject="Logs: {min_level_name} - {max_level_name}", 
+        receivers=["he@example.com"],
+        capacity=2,
+    )
+    hdlr.email.send_message = _create_dummy_send(msgs)
+
+    record = logging.LogRecord("_test", logging.INFO, __file__, 1, "first", None, None)
+    hdlr.emit(record)
+    record = logging.LogRecord("_test", logging.WARNING, __file__, 2, "second", None, None)
+    hdlr.emit(record)
+    hdlr.close()
+    assert [msg["Subject"] for msg in msgs] == ["Logs: INFO - WARNING"]
+    assert "first" in msgs[0].get_payload()
+    assert hdlr.buffer == []
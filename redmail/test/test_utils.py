@@ -1,6 +1,9 @@
-
+import pathlib
+import subprocess
+import sys
 import pytest
-from redmail.utils import import_from_string
+import redmail
+from redmail.utils import import_from_string, LazyModule
 
 def test_import_from_string():
     my_pkg = import_from_string("pathlib", if_missing="ignore")
@@ -14,3 +17,34 @@ def test_import_from_string_ignore():
 def test_import_from_string_raise():
     with pytest.raises(ImportError):
         my_pkg = import_from_string("non_existent_package", if_missing="raise")
+
+def test_lazy_module():
+    mdl = LazyModule("pathlib")
+    assert not mdl._is_loaded
+    assert mdl
+    assert mdl.Path is pathlib.Path
+    assert mdl.owns(pathlib.Path("."))
+    assert not mdl.owns("a string")
+
+def test_lazy_module_missing():
+    mdl = LazyModule("non_existent_package")
+    assert not mdl
+    assert not mdl.owns("a string")
+    with pytest.raises(ImportError):
+        mdl.something
+
+def test_lazy_module_not_imported():
+    mdl = LazyModule("non_existent_package.sub")
+    # Checking ownership should not import
+    mdl.owns(1)
+    assert not mdl._is_loaded
+
+def test_import_light():
+    code = (
+        "import sys, redmail; "
+        "print(sorted(mdl for mdl in ('asyncio', 'sqlite3', 'concurrent.futures', 'pandas', 'aiosmtplib') if mdl in sys.modules))"
+    )
+    # Run from the directory of the package to import this copy
+    root = pathlib.Path(redmail.__file__).parent.parent
+    output = subprocess.check_output([sys.executable, "-c", code], cwd=str(root))
+    assert output.decode().strip() == "[]"
@@ -13,3 +13,55 @@ def import_from_string(imp_str, if_missing="raise"):
 
 def is_bytes(value):
     return isinstance(value, (bytes, bytearray))
+
+class LazyModule:
+    """Proxy of a module that is imported on first use
+
+    Heavy optional dependencies (Pandas, Matplotlib etc.)
+    are wrapped with this so that importing Red Mail does
+    not import them. The proxy is falsy if the module
+    is not installed.
+
+    Parameters
+    ----------
+    imp_str : str
+        Import string of the module, ie. ``matplotlib.pyplot``.
+    """
+
+    def __init__(self, imp_str:str):
+        self._imp_str = imp_str
+        self._module = None
+        self._is_loaded = False
+
+    def _load(self):
+        if not self._is_loaded:
+            self._module = import_from_string(self._imp_str, if_missing="ignore")
+            self._is_loaded = True
+        return self._module
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        module = self._load()
+        if module is None:
+            raise ImportError(f"Missing package '{self._imp_str}'")
+        return getattr(module, name)
+
+    def __bool__(self):
+        return self._load() is not None
+
+    def __repr__(self):
+        return f"LazyModule({self._imp_str!r})"
+
+    def owns(self, obj) -> bool:
+        """Check whether the type of the object is defined in the package of the module
+        
+        This does not import the module thus it can be used to
+        check whether an isinstance check against the module's 
+        classes is worth doing."""
+        pkg = self._imp_str.split(".")[0]
+        for cls in type(obj).__mro__:
+            cls_pkg = getattr(cls, "__module__", None) or ""
+            if cls_pkg.split(".")[0] == pkg:
+                return True
+        return False